@@ -1,19 +1,24 @@
 import os
+import sys
 import json
 import requests
 import fitz  # PyMuPDF
 import io
 import time
 from PIL import Image
-import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import concurrent.futures
+from collections import deque
 from tqdm import tqdm
 
+# OCR goes through the shared service of the extraction package (tesseract kept loaded in worker processes)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction.ocr import ocr_image
+
 class PDFProcessor:
     def __init__(self, llm_api_url=None, output_dir="editable_pdfs"):
         """
@@ -79,6 +84,43 @@ class PDFProcessor:
             # Fallback to PyMuPDF method
             return self.extract_images_from_pdf(pdf_path)
     
+    def iter_pdf_images(self, pdf_path, dpi=300):
+        """
+        Rasterize a PDF one page at a time, so only the pages being worked on are held in memory.
+        
+        Args:
+            pdf_path (str): Path to the PDF file.
+            dpi (int): DPI for image conversion quality.
+            
+        Yields:
+            tuple: (page_num, PIL.Image), page_num starting at 0.
+        """
+        try:
+            pdf_document = fitz.open(pdf_path)
+        except Exception as e:
+            print(f"Error opening PDF with PyMuPDF: {e}")
+            # Fallback to pdf2image, one page range at a time
+            for page_num in range(pdfinfo_from_path(pdf_path)['Pages']):
+                yield page_num, convert_from_path(pdf_path, dpi=dpi, first_page=page_num + 1,
+                                                  last_page=page_num + 1)[0]
+            return
+        
+        try:
+            zoom = fitz.Matrix(dpi / 72, dpi / 72)
+            for page_num in range(len(pdf_document)):
+                pix = pdf_document[page_num].get_pixmap(matrix=zoom, alpha=False)
+                yield page_num, Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        finally:
+            pdf_document.close()
+    
+    def count_pages(self, pdf_path):
+        """Number of pages of a PDF, without rendering it"""
+        try:
+            with fitz.open(pdf_path) as pdf_document:
+                return len(pdf_document)
+        except Exception:
+            return pdfinfo_from_path(pdf_path)['Pages']
+    
     def extract_text_with_ocr(self, image):
         """
         Extract text from an image using Tesseract OCR.
@@ -90,8 +132,7 @@ class PDFProcessor:
             str: Extracted text.
         """
         try:
-            text = pytesseract.image_to_string(image)
-            return text
+            return ocr_image(image).text
         except Exception as e:
             print(f"OCR Error: {e}")
             return ""
@@ -165,16 +206,17 @@ class PDFProcessor:
             print(f"LLM API Error: {e}")
             return self.extract_text_with_ocr(image)
     
-    def create_editable_pdf(self, texts, output_path):
+    def start_editable_pdf(self, output_path):
         """
-        Create an editable PDF from extracted texts with page numbers.
+        Open the canvas of an editable PDF that pages are written to as they are ready.
         
         Args:
-            texts (list): List of extracted text strings, one per page.
             output_path (str): Path to save the output PDF.
+            
+        Returns:
+            tuple: (canvas, font_name)
         """
         c = canvas.Canvas(output_path, pagesize=letter)
-        width, height = letter
         
         # Register a default font that supports a wide range of characters
         try:
@@ -184,32 +226,56 @@ class PDFProcessor:
             font_name = 'Helvetica'  # Fallback to built-in font
         
         c.setFont(font_name, 10)
+        return c, font_name
+    
+    def write_editable_page(self, c, font_name, page_num, text):
+        """
+        Append the text of one source page to an editable PDF, with its page number.
         
-        for page_num, text in enumerate(texts, 1):
-            # Add text to the PDF
-            y_position = height - 40  # Start from top with margin
-            x_position = 40  # Left margin
-            
-            # Split text into lines and add to PDF
-            for line in text.split('\n'):
-                if y_position < 50:  # Bottom margin with space for page number
-                    c.showPage()
-                    page_num += 1
-                    y_position = height - 40
-                
-                # Add line to PDF
-                c.drawString(x_position, y_position, line)
-                y_position -= 12  # Line spacing
-            
-            # Add page number at the bottom center
-            c.saveState()
-            c.setFont(font_name, 10)
-            page_text = f"Page {page_num}"
-            page_width = c.stringWidth(page_text, font_name, 10)
-            c.drawString((width - page_width) / 2, 30, page_text)
-            c.restoreState()
+        Args:
+            c (canvas.Canvas): Canvas from start_editable_pdf.
+            font_name (str): Font from start_editable_pdf.
+            page_num (int): Page number, starting at 1.
+            text (str): Extracted text of the page.
+        """
+        width, height = letter
+        
+        # Add text to the PDF
+        y_position = height - 40  # Start from top with margin
+        x_position = 40  # Left margin
+        
+        # Split text into lines and add to PDF
+        for line in text.split('\n'):
+            if y_position < 50:  # Bottom margin with space for page number
+                c.showPage()
+                page_num += 1
+                y_position = height - 40
             
-            c.showPage()  # Move to next page
+            # Add line to PDF
+            c.drawString(x_position, y_position, line)
+            y_position -= 12  # Line spacing
+        
+        # Add page number at the bottom center
+        c.saveState()
+        c.setFont(font_name, 10)
+        page_text = f"Page {page_num}"
+        page_width = c.stringWidth(page_text, font_name, 10)
+        c.drawString((width - page_width) / 2, 30, page_text)
+        c.restoreState()
+        
+        c.showPage()  # Move to next page
+    
+    def create_editable_pdf(self, texts, output_path):
+        """
+        Create an editable PDF from extracted texts with page numbers.
+        
+        Args:
+            texts (list): List of extracted text strings, one per page.
+            output_path (str): Path to save the output PDF.
+        """
+        c, font_name = self.start_editable_pdf(output_path)
+        for page_num, text in enumerate(texts, 1):
+            self.write_editable_page(c, font_name, page_num, text)
         
         c.save()
         print(f"Created editable PDF: {output_path}")
@@ -237,15 +303,19 @@ class PDFProcessor:
             print(f"Error processing page {page_num}: {e}")
             return page_num, f"[Error extracting text: {str(e)}]"
     
-    def process_pdf(self, pdf_path, use_llm=True, max_workers=10):
+    def process_pdf(self, pdf_path, use_llm=True, max_workers=10, dpi=300):
         """
         Process a PDF file: extract images, extract text, create editable PDF.
-        Uses parallel processing to handle multiple pages concurrently.
+        Pages are rasterized one at a time while earlier pages are processed
+        concurrently, and each page's text is written out as soon as it and the
+        pages before it are done, so at most about 2 * max_workers page images
+        are in memory whatever the length of the document.
         
         Args:
             pdf_path (str): Path to the PDF file.
             use_llm (bool): Whether to use LLM for text extraction.
             max_workers (int): Maximum number of concurrent workers.
+            dpi (int): DPI for image conversion quality.
             
         Returns:
             str: Path to the created editable PDF.
@@ -255,46 +325,42 @@ class PDFProcessor:
         file_name = os.path.splitext(base_name)[0]
         output_path = os.path.join(self.output_dir, f"{file_name}_editable.pdf")
         
-        # Convert PDF to images
-        images = self.convert_pdf_to_images(pdf_path)
-        total_pages = len(images)
+        total_pages = self.count_pages(pdf_path)
+        queue_size = 2 * max_workers  # pages rasterized but not yet written
+        
+        print(f"Starting streaming processing of {total_pages} pages at {dpi} DPI with {max_workers} workers")
         
-        print(f"Starting parallel processing of {total_pages} pages with {max_workers} workers")
+        c, font_name = self.start_editable_pdf(output_path)
+        pending = deque()  # (page_num, future) in page order
         
-        # Prepare arguments for parallel processing
-        process_args = [(i, image, use_llm) for i, image in enumerate(images)]
+        def write_next():
+            page_num, future = pending.popleft()
+            try:
+                _, text = future.result()
+            except Exception as e:
+                print(f"Error processing page {page_num}: {e}")
+                text = f"[Error extracting text: {str(e)}]"
+            self.write_editable_page(c, font_name, page_num + 1, text)
+            pbar.update(1)
         
-        # Process pages in parallel
-        results = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_page = {
-                executor.submit(self.process_page, arg): arg[0] for arg in process_args
-            }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=total_pages, desc="Processing pages") as pbar:
+            # The next page is only rasterized when there is room for it
+            for page_num, image in self.iter_pdf_images(pdf_path, dpi):
+                pending.append((page_num, executor.submit(self.process_page, (page_num, image, use_llm))))
+                del image
+                while pending and (len(pending) >= queue_size or pending[0][1].done()):
+                    write_next()
             
-            # Process results as they complete with a progress bar
-            with tqdm(total=total_pages, desc="Processing pages") as pbar:
-                for future in concurrent.futures.as_completed(future_to_page):
-                    page_num = future_to_page[future]
-                    try:
-                        page_num, text = future.result()
-                        results.append((page_num, text))
-                        pbar.update(1)
-                    except Exception as e:
-                        print(f"Error processing page {page_num}: {e}")
-                        results.append((page_num, f"[Error extracting text: {str(e)}]"))
-                        pbar.update(1)
-        
-        # Sort results by page number to maintain correct sequence
-        results.sort(key=lambda x: x[0])
-        texts = [text for _, text in results]
-        
-        # Create editable PDF
-        self.create_editable_pdf(texts, output_path)
+            while pending:
+                write_next()
+        
+        c.save()
+        print(f"Created editable PDF: {output_path}")
         
         return output_path
     
-    def process_directory(self, directory_path, use_llm=True, max_workers=10):
+    def process_directory(self, directory_path, use_llm=True, max_workers=10, dpi=300):
         """
         Process all PDF files in a directory.
         
@@ -302,6 +368,7 @@ class PDFProcessor:
             directory_path (str): Path to directory containing PDF files.
             use_llm (bool): Whether to use LLM for text extraction.
             max_workers (int): Maximum number of concurrent workers for page processing.
+            dpi (int): DPI for image conversion quality.
             
         Returns:
             list: Paths to all created editable PDFs.
@@ -311,7 +378,7 @@ class PDFProcessor:
         for filename in os.listdir(directory_path):
             if filename.lower().endswith('.pdf'):
                 pdf_path = os.path.join(directory_path, filename)
-                output_path = self.process_pdf(pdf_path, use_llm, max_workers=max_workers)
+                output_path = self.process_pdf(pdf_path, use_llm, max_workers=max_workers, dpi=dpi)
                 output_paths.append(output_path)
         
         return output_paths
@@ -341,7 +408,8 @@ if __name__ == "__main__":
     if os.path.isfile(args.input) and args.input.lower().endswith('.pdf'):
         # Process a single PDF file
         print(f"Processing single PDF: {args.input}")
-        editable_pdf = processor.process_pdf(args.input, use_llm=not args.no_llm, max_workers=args.workers)
+        editable_pdf = processor.process_pdf(args.input, use_llm=not args.no_llm, max_workers=args.workers,
+                                             dpi=args.dpi)
         print(f"Editable PDF created: {editable_pdf}")
     elif os.path.isdir(args.input):
         # Process all PDFs in a directory
@@ -356,7 +424,8 @@ if __name__ == "__main__":
             for pdf_file in pdf_files:
                 pdf_path = os.path.join(args.input, pdf_file)
                 print(f"\nProcessing: {pdf_file}")
-                editable_pdf = processor.process_pdf(pdf_path, use_llm=not args.no_llm, max_workers=args.workers)
+                editable_pdf = processor.process_pdf(pdf_path, use_llm=not args.no_llm, max_workers=args.workers,
+                                                     dpi=args.dpi)
                 print(f"Editable PDF created: {editable_pdf}")
     else:
         print(f"Error: Input '{args.input}' is not a valid PDF file or directory.")
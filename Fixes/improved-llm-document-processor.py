@@ -1,5 +1,6 @@
 import sys
 import os
+import itertools
 import pandas as pd
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QTableView, QHeaderView,
@@ -10,31 +11,89 @@ from PyQt6.QtGui import QColor, QFont, QPalette, QIcon
 from PyQt6.QtPdf import QPdfDocument
 from PyQt6.QtPdfWidgets import QPdfView
 
-# Assuming you have a module for handling LLM API calls
-# Replace this with your actual LLM interaction code
+# Answers come from the shared model server (python -m extraction.model_server) when it
+# is running; otherwise the placeholder results below are shown
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from extraction.model_server import ModelClient
+    from extraction.pages import extract_pdf_pages
+    from extraction.retrieval import ContextRetriever
+except ImportError:
+    ModelClient = None
+
+# Follow-up exchanges repeated in a follow-up prompt. With the document context and answers of
+# up to 256 tokens each this stays inside the model server's 4096 token window
+MAX_FOLLOW_UPS = 4
+
 class LLMProcessor:
     def __init__(self):
         self.uploaded_docs = []
         self.conversation_ids = {}  # Store conversation IDs for follow-ups
+        self.conversations = {}  # conversation ID -> {"query": first prompt and answer, "follow_ups": [...]}
+        self.conversation_numbers = itertools.count(1)
+        self.page_texts = {}  # file path -> [(page number, text)]
+        self.client = ModelClient.connect_if_running() if ModelClient is not None else None
+        self.retriever = ContextRetriever() if self.client is not None else None
+        if self.client is not None:
+            print(f"Using model server: {self.client.info()}")
 
     def add_document(self, file_path):
         self.uploaded_docs.append(file_path)
         return True
 
+    def resolve_document(self, file_path):
+        if os.path.exists(file_path):
+            return file_path
+        name = os.path.basename(file_path)
+        return next((doc for doc in self.uploaded_docs if os.path.basename(doc) == name), file_path)
+
+    def get_pages(self, file_path):
+        if file_path not in self.page_texts:
+            self.page_texts[file_path] = [(number, text) for number, text, _ in extract_pdf_pages(file_path)]
+        return self.page_texts[file_path]
+
     def process_query(self, data_element, procedure, file_path):
         """
-        Replace this with your actual LLM API code
-        This should return the result and page number where info was found
+        Ask the model server for data_element, following procedure, in the document.
+        Returns the result and the first page that contains it.
         """
-        # This is a placeholder - replace with your actual LLM API call
+        if self.client is None:
+            return self.placeholder_query(data_element, procedure, file_path)
+        try:
+            pages = self.get_pages(self.resolve_document(file_path))
+            document_text = '\n'.join(text for _, text in pages)
+            context = self.retriever.select(document_text, f"{data_element} {procedure}")
+            prompt = (f"Find the data element \"{data_element}\" in the document below.\n"
+                      f"Procedure: {procedure}\n\nDOCUMENT TEXT:\n{context}\n\n"
+                      f"Answer with the value only, or \"Not found\".")
+            result = self.client.generate_batch([prompt])[0]
+            
+            answer = result.strip().lower()
+            page_number = next((number for number, text in pages if answer and answer in text.lower()), None)
+            
+            conversation_id = self.new_conversation_id(data_element, procedure, file_path)
+            self.conversations[conversation_id] = {"query": f"{prompt}\n\n{result}", "follow_ups": []}
+            
+            return {"result": result, "page": page_number, "conversation_id": conversation_id}
+        except Exception as e:
+            print(f"Error processing query: {e}")
+            return {"result": "Error", "page": None, "conversation_id": None}
+
+    def new_conversation_id(self, data_element, procedure, file_path):
+        """Unique per query, so asking for the same element in another document keeps both histories"""
+        conversation_id = (f"conv_{next(self.conversation_numbers)}_{os.path.basename(file_path)}_"
+                           f"{data_element}_{procedure}").replace(" ", "_")
+        self.conversation_ids[(data_element, procedure, file_path)] = conversation_id
+        return conversation_id
+
+    def placeholder_query(self, data_element, procedure, file_path):
+        """Used when no model server is running"""
         try:
             # Simulate finding information in a document
             result = f"Result for {data_element} using {procedure}"
             page_number = 2  # Example page number
             
-            # Generate a conversation ID (in a real app, this would come from your LLM API)
-            conversation_id = f"conv_{data_element}_{procedure}".replace(" ", "_")
-            self.conversation_ids[(data_element, procedure, file_path)] = conversation_id
+            conversation_id = self.new_conversation_id(data_element, procedure, file_path)
             
             return {"result": result, "page": page_number, "conversation_id": conversation_id}
         except Exception as e:
@@ -44,12 +103,19 @@ class LLMProcessor:
     def follow_up_query(self, question, conversation_id):
         """
         Process a follow-up question using the existing conversation context
-        Replace with your actual follow-up API call
         """
-        # This is a placeholder - replace with your actual follow-up API call
         try:
-            # Simulate a follow-up response
-            response = f"Follow-up answer to: {question}"
+            history = self.conversations.get(conversation_id)
+            if self.client is None or history is None:
+                # Simulate a follow-up response
+                response = f"Follow-up answer to: {question}"
+            else:
+                # The first query carries the document context; only the latest follow-ups are repeated
+                follow_ups = history["follow_ups"][-MAX_FOLLOW_UPS:]
+                prompt = "\n\n".join([history["query"], *follow_ups, f"Follow-up question: {question}"])
+                response = self.client.generate_batch([prompt])[0]
+                follow_ups.append(f"Follow-up question: {question}\n\n{response}")
+                history["follow_ups"] = follow_ups[-MAX_FOLLOW_UPS:]
             return {"response": response, "conversation_id": conversation_id}
         except Exception as e:
             print(f"Error processing follow-up: {e}")
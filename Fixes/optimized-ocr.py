@@ -1,22 +1,34 @@
+import logging
 import multiprocessing
+import os
+import sys
 from functools import partial
 import cv2
 import numpy as np
 
+# OCR front-end of the extraction package, at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction.ocr import analyze, ocr_pdf_page, prepare, recognize, to_gray
+
+logger = logging.getLogger(__name__)
+
 def preprocess_image(image, resize=False):
-    """Preprocess image for better OCR performance"""
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Apply threshold
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    """
+    Preprocess image for better OCR performance: deskew, crop to the text and binarize.
+    Returns the image and the tesseract page segmentation mode for its layout, (None, None) for blank pages
+    """
+    gray = to_gray(image)
+    layout = analyze(gray)
+    if layout.blank:
+        return None, None
+    thresh = prepare(gray, layout)
     
     # Optional: Resize if image is too large
-    if resize and (image.shape[0] > 2000 or image.shape[1] > 2000):
-        scale_factor = min(2000/image.shape[0], 2000/image.shape[1])
+    if resize and (thresh.shape[0] > 2000 or thresh.shape[1] > 2000):
+        scale_factor = min(2000/thresh.shape[0], 2000/thresh.shape[1])
         thresh = cv2.resize(thresh, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_AREA)
     
-    return thresh
+    return thresh, layout.psm
 
 def process_page_ocr(page, lang='eng'):
     """Process a single page with OCR"""
@@ -25,18 +37,13 @@ def process_page_ocr(page, lang='eng'):
         page_np = np.array(page)
         
         # Preprocess image
-        preprocessed = preprocess_image(page_np, resize=True)
-        
-        # Convert back to PIL for pytesseract
-        pil_img = Image.fromarray(preprocessed)
+        preprocessed, psm = preprocess_image(page_np, resize=True)
+        if preprocessed is None:
+            return ""
         
-        # Apply OCR with improved configuration
-        text = pytesseract.image_to_string(
-            pil_img, 
-            lang=lang,
-            config='--oem 3 --psm 6'  # Improved OCR engine mode and page segmentation mode
-        )
-        return text
+        # Segmentation mode picked from the page layout; runs on a tesseract kept loaded
+        # instead of starting one per page
+        return recognize(preprocessed, psm, lang).text
     except Exception as e:
         logger.error(f"OCR processing error: {e}")
         return ""
@@ -44,20 +51,21 @@ def process_page_ocr(page, lang='eng'):
 def optimized_ocr_pdf(file_path: str, max_workers=None) -> str:
     """Optimized OCR processing with multiprocessing"""
     try:
-        from pdf2image import convert_from_path
+        from pdf2image import pdfinfo_from_path
         
         # Determine max workers based on CPU cores
         if max_workers is None:
             max_workers = max(1, multiprocessing.cpu_count() - 2)
         
-        # Convert PDF with lower DPI
-        pages = convert_from_path(file_path, 200)  # Reduced DPI
+        # Each worker renders its page at the DPI the page's text height needs, skipping blank pages,
+        # instead of rendering every page at a fixed DPI up front
+        page_numbers = range(1, pdfinfo_from_path(file_path)['Pages'] + 1)
         
         # Use multiprocessing for parallel OCR
         with multiprocessing.Pool(processes=max_workers) as pool:
-            text_results = pool.map(process_page_ocr, pages)
+            text_results = pool.map(partial(ocr_pdf_page, file_path), page_numbers)
         
-        return '\n'.join(text_results)
+        return '\n'.join(result.text for result in text_results)
     except Exception as e:
         logger.error(f"Optimized OCR error for {file_path}: {e}")
         return ""
@@ -9,9 +9,10 @@ from pathlib import Path
 # Document processing libraries
 import docx
 import pdfplumber
-import pytesseract
 import cv2
-from PIL import Image
+
+from extraction.file_index import FileIndex
+from extraction.ocr import ocr_image, ocr_pdf_page
 
 # For local LLM integration
 import torch
@@ -71,15 +72,10 @@ class DocumentProcessor:
     def ocr_pdf(file_path: str) -> str:
         """Apply OCR to a PDF file"""
         try:
-            # Convert PDF to images and apply OCR
-            from pdf2image import convert_from_path
-            
-            pages = convert_from_path(file_path, 300)
-            text_results = []
-            
-            for i, page in enumerate(pages):
-                text = pytesseract.image_to_string(page)
-                text_results.append(text)
+            # Each page is rendered at the DPI its text height needs, blank pages are skipped
+            with pdfplumber.open(file_path) as pdf:
+                page_count = len(pdf.pages)
+            text_results = [ocr_pdf_page(file_path, page_number).text for page_number in range(1, page_count + 1)]
                 
             return '\n'.join(text_results)
         except Exception as e:
@@ -90,23 +86,12 @@ class DocumentProcessor:
     def extract_from_image(file_path: str) -> str:
         """Extract text from an image file using OCR"""
         try:
-            # Load image and preprocess for better OCR results
             image = cv2.imread(file_path)
             if image is None:
                 raise ValueError(f"Could not load image from {file_path}")
-                
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Apply threshold to get black and white image
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-            
-            # Convert the OpenCV image to PIL format for pytesseract
-            pil_img = Image.fromarray(thresh)
-            
-            # Apply OCR
-            text = pytesseract.image_to_string(pil_img)
-            return text
+            # Skips blank images, scales up small text, deskews, crops and picks the segmentation mode
+            return ocr_image(image).text
         except Exception as e:
             logger.error(f"Error extracting text from image {file_path}: {str(e)}")
             return ""
@@ -348,6 +333,9 @@ class DataProcessor:
     def __init__(self, llm_processor: LocalLLMProcessor):
         self.document_processor = DocumentProcessor()
         self.extractor = ElementExtractor(llm_processor)
+        self.file_indexes: Dict[str, FileIndex] = {}
+        self.ambiguous_documents: Dict[str, List[str]] = {}
+        self.unresolved_documents: Dict[str, List[str]] = {}
         
     def process_excel(self, excel_path: str) -> Dict[str, Any]:
         """Process the Excel file and extract elements from documents"""
@@ -357,6 +345,9 @@ class DataProcessor:
             
             # Get the directory of the Excel file to use as the base path
             excel_dir = os.path.dirname(os.path.abspath(excel_path))
+            self.file_indexes = {}
+            self.ambiguous_documents = {}
+            self.unresolved_documents = {}
             
             # Check if required columns exist
             required_columns = ['Element name', 'Instructions', 'Documents list']
@@ -379,10 +370,21 @@ class DataProcessor:
                 
                 element_result = self.process_element(element_name, instructions, doc_list)
                 results.append(element_result)
+            
+            if self.ambiguous_documents:
+                logger.warning(f"{len(self.ambiguous_documents)} document names matched several files: "
+                               + "; ".join(f"{name} -> {', '.join(paths)}"
+                                           for name, paths in self.ambiguous_documents.items()))
+            if self.unresolved_documents:
+                logger.warning(f"{len(self.unresolved_documents)} document names were not found: "
+                               + "; ".join(f"{name} (similar: {', '.join(paths) or 'none'})"
+                                           for name, paths in self.unresolved_documents.items()))
                 
             return {
                 "success": True,
-                "results": results
+                "results": results,
+                "ambiguous_documents": self.ambiguous_documents,
+                "unresolved_documents": self.unresolved_documents
             }
             
         except Exception as e:
@@ -392,6 +394,12 @@ class DataProcessor:
                 "error": str(e)
             }
     
+    def file_index(self, base_dir: str) -> FileIndex:
+        """Index of the files under base_dir, brought up to date once per run"""
+        if base_dir not in self.file_indexes:
+            self.file_indexes[base_dir] = FileIndex(base_dir).refresh()
+        return self.file_indexes[base_dir]
+    
     def resolve_document_paths(self, doc_list: List[str], base_dir: str) -> List[str]:
         """Resolve document paths by searching in the base directory and its subdirectories"""
         resolved_paths = []
@@ -413,18 +421,26 @@ class DataProcessor:
                 continue
                 
             # Search in subdirectories
-            found = False
-            for root, dirs, files in os.walk(base_dir):
-                if doc_name in files:
-                    full_path = os.path.join(root, doc_name)
-                    resolved_paths.append(full_path)
-                    found = True
+            paths, match = self.file_index(base_dir).find(doc_name)
+            if paths:
+                full_path = paths[0]
+                resolved_paths.append(full_path)
+                if match == 'exact':
                     logger.info(f"Found document '{doc_name}' at: {full_path}")
-                    break
-                    
-            if not found:
-                logger.warning(f"Could not find document: {doc_name}")
-                # Add the unresolved path - the document processor will handle the error
+                else:
+                    logger.warning(f"Found document '{doc_name}' by {match} name match at: {full_path}")
+                if len(paths) > 1:
+                    self.ambiguous_documents[doc_name] = paths
+                    logger.warning(f"Document '{doc_name}' matches {len(paths)} files, using: {full_path}")
+            else:
+                # Similar names are only reported: invoice_2023.pdf is not invoice_2024.pdf
+                suggestions = self.file_index(base_dir).suggest(doc_name)
+                self.unresolved_documents[doc_name] = suggestions
+                if suggestions:
+                    logger.warning(f"Could not find document: {doc_name}, similar files: {', '.join(suggestions)}")
+                else:
+                    logger.warning(f"Could not find document: {doc_name}")
+                # Add the unresolved path - process_element reports it with the suggestions
                 resolved_paths.append(doc_name)
                 
         return resolved_paths
@@ -434,6 +450,16 @@ class DataProcessor:
         document_results = []
         
         for doc_path in document_list:
+            if doc_path in self.unresolved_documents:
+                suggestions = self.unresolved_documents[doc_path]
+                document_results.append({
+                    "document_path": doc_path,
+                    "success": False,
+                    "error": "Document not found"
+                             + (f", similar files: {', '.join(suggestions)}" if suggestions else "")
+                })
+                continue
+            
             # Extract text from document
             logger.info(f"Processing document: {doc_path} for element: {element_name}")
             document_text = self.document_processor.process_document(doc_path)
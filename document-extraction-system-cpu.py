@@ -2,28 +2,57 @@ import os
 import pandas as pd
 import re
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from pathlib import Path
+from concurrent.futures import Future
 
 # Document processing libraries
 import docx
-import pdfplumber
-import pytesseract
 import cv2
-from PIL import Image
 
-# For local LLM integration
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from extraction.pages import OCR_DPI, MIN_TEXT_CHARS, extract_pdf_text, shutdown_page_pool
+from extraction.ocr import TARGET_TEXT_HEIGHT, ocr_image
+from extraction.ocr_service import shutdown_ocr_service
+from extraction.cache import DEFAULT_CACHE_PATH, ExtractionCache, cache_key, file_digest
+from extraction.batching import BATCH_SIZE, BatchScheduler
+from extraction.retrieval import ContextRetriever, approximate_tokens
+from extraction.checkpoint import CheckpointStore, checkpoint_path_for
+from extraction.pipeline import Pipeline, Stage, parse_stage_workers
+from extraction.model_server import ModelClient, load_backend, parse_address
+from extraction.rules import DEFAULT_RULES, RuleEngine
+
+# torch and transformers are imported where the model is loaded, so that the
+# page extraction worker processes, and runs using the model server, do not pay
+# for importing them
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+MAX_NEW_TOKENS = 256        # the answers are a few short FOUND/VALUE/EXPLANATION lines
+EXTRACTION_THREADS = 32     # element/document pairs in flight, their prompts are batched together
+
+# Worker threads per pipeline stage of DataProcessor.process_excel
+STAGE_WORKERS = {
+    'resolve': 2,               # hashing files for the text cache
+    'extract': 2,               # documents extracted at once, their PDF pages share the page process pool
+    'retrieve': 1,
+    'llm': EXTRACTION_THREADS,
+    'assemble': 1,
+}
+
 class DocumentProcessor:
     """Handles extraction of text from different document formats"""
     
+    # Bump when a change to the extractors changes their output, so cached text is not reused
+    EXTRACTOR_VERSION = "3"
+    
+    @staticmethod
+    def settings() -> Dict[str, Any]:
+        """Settings that affect extracted text, part of the cache key"""
+        return {'ocr_dpi': OCR_DPI, 'ocr_text_height': TARGET_TEXT_HEIGHT, 'min_text_chars': MIN_TEXT_CHARS}
+    
     @staticmethod
     def extract_from_docx(file_path: str) -> str:
         """Extract text from a DOCX file"""
@@ -48,40 +77,18 @@ class DocumentProcessor:
 
     @staticmethod
     def extract_from_pdf(file_path: str) -> str:
-        """Extract text from a PDF file"""
+        """Extract text from a PDF file, page by page in parallel, OCRing pages without a text layer"""
         try:
-            text = []
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text.append(extracted)
-            
-            # If text extraction failed (possibly a scanned PDF), apply OCR
-            if not ''.join(text).strip():
-                logger.info(f"No text found in PDF {file_path}, attempting OCR")
-                return DocumentProcessor.ocr_pdf(file_path)
-                
-            return '\n'.join(text)
+            return extract_pdf_text(file_path)
         except Exception as e:
             logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
             return ""
 
     @staticmethod
     def ocr_pdf(file_path: str) -> str:
-        """Apply OCR to a PDF file"""
+        """Apply OCR to every page of a PDF file"""
         try:
-            # Convert PDF to images and apply OCR
-            from pdf2image import convert_from_path
-            
-            pages = convert_from_path(file_path, 300)
-            text_results = []
-            
-            for i, page in enumerate(pages):
-                text = pytesseract.image_to_string(page)
-                text_results.append(text)
-                
-            return '\n'.join(text_results)
+            return extract_pdf_text(file_path, force_ocr=True)
         except Exception as e:
             logger.error(f"Error performing OCR on PDF {file_path}: {str(e)}")
             return ""
@@ -90,23 +97,12 @@ class DocumentProcessor:
     def extract_from_image(file_path: str) -> str:
         """Extract text from an image file using OCR"""
         try:
-            # Load image and preprocess for better OCR results
             image = cv2.imread(file_path)
             if image is None:
                 raise ValueError(f"Could not load image from {file_path}")
-                
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply threshold to get black and white image
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
-            
-            # Convert the OpenCV image to PIL format for pytesseract
-            pil_img = Image.fromarray(thresh)
             
-            # Apply OCR
-            text = pytesseract.image_to_string(pil_img)
-            return text
+            # Skips blank images, scales up small text, deskews, crops and picks the segmentation mode
+            return ocr_image(image).text
         except Exception as e:
             logger.error(f"Error extracting text from image {file_path}: {str(e)}")
             return ""
@@ -133,39 +129,29 @@ class DocumentProcessor:
 
 
 class LocalLLMProcessor:
-    """Handles processing using a local LLM"""
+    """Handles processing using a local LLM, loaded in this process or shared through the model server"""
     
-    def __init__(self, model_name: str = "mistralai/Mistral-7B-Instruct-v0.2", use_cpu: bool = True):
-        """Initialize the LLM processor with a specified model"""
+    def __init__(self, model_name: str = "mistralai/Mistral-7B-Instruct-v0.2", use_cpu: bool = True,
+                 batch_size: int = BATCH_SIZE, max_new_tokens: int = MAX_NEW_TOKENS, quantize: bool = True,
+                 gguf_path: str = None, server: Tuple[str, int] = None):
+        """
+        Initialize the LLM processor. With server, prompts go to a running model server;
+        otherwise the model is loaded here, int8 quantized on CPU unless quantize is False.
+        """
         try:
-            logger.info(f"Loading model: {model_name}")
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            
-            # Load model with settings appropriate for CPU or GPU
-            if use_cpu:
-                logger.info("Loading model in CPU mode")
-                # Simple CPU configuration without quantization
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    device_map="auto",
-                    torch_dtype=torch.float32  # Use float32 for CPU
-                )
+            if server is not None:
+                logger.info(f"Connecting to model server at {server[0]}:{server[1]}")
+                self.backend = ModelClient(server)
+                logger.info(f"Using model server: {self.backend.info()}")
             else:
-                # Original GPU configuration with quantization
-                logger.info("Loading model in GPU mode with quantization")
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float16,
-                    device_map="auto",
-                    load_in_8bit=True  # Quantize model for memory efficiency
-                )
+                self.backend = load_backend(model_name, gguf_path, use_cpu, quantize, max_new_tokens)
             
-            self.pipe = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_length=2048,
-                do_sample=False
+            self.count_tokens = getattr(self.backend, 'count_tokens', approximate_tokens)
+            self.scheduler = BatchScheduler(
+                self.backend.generate_batch,
+                batch_size=batch_size,
+                prompt_length=self.count_tokens,
+                count_tokens=self.count_tokens
             )
             
             logger.info("Model loaded successfully")
@@ -173,30 +159,34 @@ class LocalLLMProcessor:
             logger.error(f"Error loading LLM model: {str(e)}")
             raise
 
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt for batched generation"""
+        return self.scheduler.submit(prompt)
+
     def get_completion(self, prompt: str) -> str:
         """Get a completion from the local LLM"""
         try:
-            # Format prompt for instruction-tuned models
-            formatted_prompt = f"<s>[INST] {prompt} [/INST]"
-            
-            # Generate response
-            response = self.pipe(formatted_prompt)[0]['generated_text']
-            
-            # Extract the actual response (after the instruction)
-            response = response.split('[/INST]')[-1].strip()
-            
-            return response
+            return self.submit(prompt).result()
         except Exception as e:
             logger.error(f"Error generating LLM completion: {str(e)}")
             return ""
 
+    def close(self):
+        self.scheduler.close()
+        logger.info(f"LLM batching: {self.scheduler.stats()}")
+        if isinstance(self.backend, ModelClient):
+            self.backend.close()
+
 
 class ElementExtractor:
     """Handles the extraction of elements based on instructions"""
     
-    def __init__(self, llm_processor: LocalLLMProcessor):
-        """Initialize with a LocalLLMProcessor"""
+    def __init__(self, llm_processor: LocalLLMProcessor, rules: RuleEngine = None):
+        """Initialize with a LocalLLMProcessor and the rules tried before it"""
         self.llm = llm_processor
+        self.rules = rules or RuleEngine(DEFAULT_RULES)
+        # Selects the relevant chunks of long documents instead of truncating them
+        self.retriever = ContextRetriever(count_tokens=getattr(llm_processor, 'count_tokens', None))
         self.element_handlers = {
             'account_id': self.extract_account_id,
             'residency': self.extract_residency,
@@ -208,6 +198,11 @@ class ElementExtractor:
         # Clean element name (lowercase, remove spaces)
         clean_element = element_name.lower().replace(' ', '_')
         
+        # Rules are cheap, the LLM only runs when they miss
+        rule_result = self.rules.extract(clean_element, document_text)
+        if rule_result is not None:
+            return rule_result
+        
         # If there's a specific handler for this element type, use it
         if clean_element in self.element_handlers:
             return self.element_handlers[clean_element](instructions, document_text)
@@ -217,6 +212,8 @@ class ElementExtractor:
     
     def generic_extract(self, element_name: str, instructions: str, document_text: str) -> Dict[str, Any]:
         """Generic extraction using LLM"""
+        context = self.retriever.select(document_text, f"{element_name.replace('_', ' ')} {instructions}")
+        
         # Prepare prompt for the LLM
         prompt = f"""
         I need to extract the '{element_name}' from the following document based on these instructions:
@@ -224,7 +221,7 @@ class ElementExtractor:
         INSTRUCTIONS: {instructions}
         
         DOCUMENT TEXT:
-        {document_text[:1000]}...  # Truncated for LLM context limit
+        {context}
         
         Please extract the '{element_name}' value. If multiple values are found, list them all.
         If you cannot find the value, explain why.
@@ -256,37 +253,21 @@ class ElementExtractor:
         
     def extract_account_id(self, instructions: str, document_text: str) -> Dict[str, Any]:
         """Extract account ID based on instructions"""
-        # First try regex patterns for common account ID formats
-        common_patterns = [
-            r'(?:account|acct)(?:\s+|\:|\.|\#)?\s*(?:number|num|no|id|code)?(?:\s+|\:|\.|\#)?\s*(\d[\d\-]{5,})',
-            r'(?:a/c|a/n)(?:\s+|\:|\.|\#)?\s*(\d[\d\-]{5,})',
-            r'(?<=\s|^)(\d{5,})(?=\s|$)'  # Any 5+ digit number that stands alone
-        ]
-        
-        # Check each pattern
-        for pattern in common_patterns:
-            matches = re.findall(pattern, document_text, re.IGNORECASE)
-            if matches:
-                # Clean up the first match (remove spaces, dashes, etc.)
-                clean_id = re.sub(r'[^\d]', '', matches[0])
-                if len(clean_id) >= 5:  # Assuming account IDs are at least 5 digits
-                    return {
-                        "found": True,
-                        "value": clean_id,
-                        "explanation": "Found using pattern matching for account ID format"
-                    }
-        
-        # If regex fails, fall back to LLM
+        # The regex patterns for common account ID formats are built-in rules and already missed,
+        # fall back to LLM
         return self.generic_extract("account_id", instructions, document_text)
         
     def extract_residency(self, instructions: str, document_text: str) -> Dict[str, Any]:
         """Extract residency based on entity type and instructions"""
         # First determine the entity type
+        entity_context = self.retriever.select(
+            document_text, "entity type bank fund corporation company LLC partnership individual"
+        )
         entity_type_prompt = f"""
         Based on the following document, determine the entity type (e.g., bank, fund, corporation, LLC, individual):
         
         DOCUMENT TEXT:
-        {document_text[:1000]}...
+        {entity_context}
         
         Please respond with only the entity type.
         """
@@ -294,13 +275,17 @@ class ElementExtractor:
         entity_type = self.llm.get_completion(entity_type_prompt).strip().lower()
         
         # Now extract residency based on entity type and instructions
+        residency_context = self.retriever.select(
+            document_text,
+            f"residency resident domicile incorporated registered headquarters address country jurisdiction {instructions}"
+        )
         residency_prompt = f"""
         I need to determine the residency of a {entity_type} from this document based on these instructions:
         
         INSTRUCTIONS: {instructions}
         
         DOCUMENT TEXT:
-        {document_text[:1000]}...
+        {residency_context}
         
         For a {entity_type}, residency is typically determined by:
         - If it's a bank: location of headquarters or incorporation
@@ -345,34 +330,91 @@ class ElementExtractor:
 class DataProcessor:
     """Main class to process the Excel data and coordinate extraction"""
     
-    def __init__(self, llm_processor: LocalLLMProcessor):
+    def __init__(self, llm_processor: Optional[LocalLLMProcessor], text_cache: ExtractionCache = None,
+                 stage_workers: Dict[str, int] = None, checkpoint: CheckpointStore = None):
+        """llm_processor may be None when the checkpoint already holds every result"""
+        self.llm_processor = llm_processor
         self.document_processor = DocumentProcessor()
         self.extractor = ElementExtractor(llm_processor)
+        self.text_cache = text_cache
+        self.stage_workers = dict(STAGE_WORKERS, **(stage_workers or {}))
+        self.checkpoint = checkpoint
+    
+    @staticmethod
+    def read_rows(excel_path: str) -> List[Tuple[str, str, List[str]]]:
+        """(element name, instructions, document paths) of each row of the instructions workbook"""
+        df = pd.read_excel(excel_path)
+        
+        # Check if required columns exist
+        required_columns = ['Element name', 'Instructions', 'Documents list']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        
+        if missing_columns:
+            raise ValueError(f"Excel file missing required columns: {missing_columns}")
+        
+        # Split document lists (assuming comma-separated)
+        return [
+            (row['Element name'], row['Instructions'], [doc.strip() for doc in str(row['Documents list']).split(',')])
+            for _, row in df.iterrows()
+        ]
+        
+    def lookup_cached_text(self, doc_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """(cache key, cached text) of a document; the key is None if its text is not cacheable"""
+        path = doc_path.strip()
+        if self.text_cache is None or not os.path.isfile(path):
+            return None, None
+        
+        key = cache_key(file_digest(path), DocumentProcessor.EXTRACTOR_VERSION, DocumentProcessor.settings())
+        text = self.text_cache.get(key)
+        if text is not None:
+            logger.info(f"Using cached text for document: {doc_path}")
+        return key, text
+        
+    def extract_document_text(self, doc_path: str, key: Optional[str] = None) -> str:
+        """Extract text from a document and cache it under key"""
+        text = self.document_processor.process_document(doc_path)
+        if text and key is not None:
+            # Failures are not cached, they may be transient
+            self.text_cache.put(key, text)
+        return text
+        
+    def get_document_text(self, doc_path: str) -> str:
+        """Extract text from a document, reusing cached text of identical content"""
+        key, text = self.lookup_cached_text(doc_path)
+        return text if text is not None else self.extract_document_text(doc_path, key)
         
     def process_excel(self, excel_path: str) -> Dict[str, Any]:
         """Process the Excel file and extract elements from documents"""
         try:
-            # Read Excel file
-            df = pd.read_excel(excel_path)
+            rows = self.read_rows(excel_path)
             
-            # Check if required columns exist
-            required_columns = ['Element name', 'Instructions', 'Documents list']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            # Built-in rules plus the optional Rules sheet of the same workbook
+            self.extractor = ElementExtractor(self.llm_processor, RuleEngine.from_excel(excel_path))
             
-            if missing_columns:
-                raise ValueError(f"Excel file missing required columns: {missing_columns}")
+            results = self.empty_results(rows)
             
-            # Process each row
-            results = []
-            for idx, row in df.iterrows():
-                element_name = row['Element name']
-                instructions = row['Instructions']
-                
-                # Split document list (assuming comma-separated)
-                doc_list = [doc.strip() for doc in str(row['Documents list']).split(',')]
-                
-                element_result = self.process_element(element_name, instructions, doc_list)
-                results.append(element_result)
+            # Every unique document is extracted once, however many elements refer to it
+            pairs_by_doc = {}
+            for row_index, (element_name, instructions, doc_list) in enumerate(rows):
+                for doc_index, doc_path in enumerate(doc_list):
+                    # Pairs finished by an earlier, interrupted run are not extracted again
+                    done = self.checkpoint.get(element_name, instructions, doc_path) if self.checkpoint else None
+                    if done is not None:
+                        results[row_index]["document_results"][doc_index] = done
+                    else:
+                        pairs_by_doc.setdefault(doc_path, []).append((row_index, doc_index))
+            if self.checkpoint is not None:
+                logger.info(f"Reusing {self.checkpoint.reused} results from checkpoint {self.checkpoint.path}")
+            logger.info(f"Extracting text from {len(pairs_by_doc)} unique documents for {len(rows)} elements")
+            
+            pipeline = self.build_pipeline(rows, pairs_by_doc, results)
+            pipeline.run(pairs_by_doc)
+            for stats in pipeline.stats():
+                logger.info("Stage {stage}: {items} items in {wall_seconds}s ({items_per_second}/s), "
+                            "{workers} workers {utilization} busy, blocked {blocked_seconds}s".format(**stats))
+            
+            rules = self.extractor.rules
+            logger.info(f"Rules resolved {rules.hits} of {rules.attempts} element extractions without the LLM")
                 
             return {
                 "success": True,
@@ -386,37 +428,155 @@ class DataProcessor:
                 "error": str(e)
             }
     
-    def process_element(self, element_name: str, instructions: str, document_list: List[str]) -> Dict[str, Any]:
-        """Process a single element across multiple documents"""
-        document_results = []
-        
-        for doc_path in document_list:
-            # Extract text from document
-            logger.info(f"Processing document: {doc_path} for element: {element_name}")
-            document_text = self.document_processor.process_document(doc_path)
-            
-            if not document_text:
-                document_results.append({
-                    "document_path": doc_path,
-                    "success": False,
-                    "error": "Failed to extract text from document"
-                })
-                continue
-                
-            # Extract element from document text
-            extraction_result = self.extractor.extract_element(element_name, instructions, document_text)
-            
-            document_results.append({
-                "document_path": doc_path,
+    @staticmethod
+    def empty_results(rows: List[Tuple[str, str, List[str]]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "element_name": element_name,
+                "instructions": instructions,
+                "document_results": [None] * len(doc_list)
+            }
+            for element_name, instructions, doc_list in rows
+        ]
+    
+    def partial_results(self, excel_path: str) -> Dict[str, Any]:
+        """Results recorded in the checkpoint so far, unfinished pairs marked as such"""
+        try:
+            rows = self.read_rows(excel_path)
+            results = self.empty_results(rows)
+            for element_result, (element_name, instructions, doc_list) in zip(results, rows):
+                for doc_index, doc_path in enumerate(doc_list):
+                    element_result["document_results"][doc_index] = self.checkpoint.get(
+                        element_name, instructions, doc_path
+                    ) or {
+                        "document_path": doc_path,
+                        "success": False,
+                        "error": "Not processed yet"
+                    }
+            logger.info(f"{self.checkpoint.reused} results found in checkpoint {self.checkpoint.path}")
+            return {
                 "success": True,
-                "extraction": extraction_result
-            })
+                "results": results
+            }
+        except Exception as e:
+            logger.error(f"Error reading checkpoint: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def build_pipeline(self, rows: List[Tuple[str, str, List[str]]], pairs_by_doc: Dict[str, List[Tuple[int, int]]],
+                       results: List[Dict[str, Any]]) -> Pipeline:
+        """
+        Stages of process_excel, fed with unique document paths:
+        resolve (cache lookup) -> extract (text/OCR, PDF pages on the page process pool)
+        -> retrieve (index the text, one item per element using the document)
+        -> llm (rules, then prompts batched by the scheduler)
+        -> assemble (results in row order, recorded in the checkpoint)
+        
+        A failure is contained to its document: the stage catches it and passes an
+        error on, so every element of that document gets a failed result and the
+        rest of the run goes on.
+        """
+        def failed(doc_path, error):
+            return {"document_path": doc_path, "success": False, "error": error}
+        
+        def resolve(doc_path):
+            try:
+                key, text = self.lookup_cached_text(doc_path)
+            except Exception as e:
+                logger.error(f"Error looking up document {doc_path}: {str(e)}")
+                return [(doc_path, None, None, f"Failed to read document: {str(e)}")]
+            return [(doc_path, key, text, None)]
+        
+        def extract(item):
+            doc_path, key, text, error = item
+            if error is None and text is None:
+                try:
+                    text = self.extract_document_text(doc_path, key)
+                except Exception as e:
+                    logger.error(f"Error extracting text from document {doc_path}: {str(e)}")
+                    error = f"Failed to extract text from document: {str(e)}"
+            return [(doc_path, text, error)]
+        
+        def retrieve(item):
+            doc_path, text, error = item
+            if error is None and text:
+                try:
+                    self.extractor.retriever.prepare(text)
+                except Exception as e:
+                    # select() builds the index again when each element needs it
+                    logger.warning(f"Error indexing document {doc_path}: {str(e)}")
+            return [(row_index, doc_index, doc_path, text, error) for row_index, doc_index in pairs_by_doc[doc_path]]
+        
+        def extract_element(item):
+            row_index, doc_index, doc_path, text, error = item
+            element_name, instructions, _ = rows[row_index]
+            if error is not None:
+                return [(row_index, doc_index, failed(doc_path, error))]
+            try:
+                result = self.process_document_element(element_name, instructions, doc_path, {doc_path: text})
+            except Exception as e:
+                logger.error(f"Error extracting {element_name} from document {doc_path}: {str(e)}")
+                result = failed(doc_path, f"Failed to extract element: {str(e)}")
+            return [(row_index, doc_index, result)]
+        
+        def assemble(item):
+            row_index, doc_index, result = item
+            results[row_index]["document_results"][doc_index] = result
+            if self.checkpoint is not None and result["success"]:
+                # Failed extractions are retried by the next run
+                element_name, instructions, doc_list = rows[row_index]
+                try:
+                    self.checkpoint.put(element_name, instructions, doc_list[doc_index], result)
+                except Exception as e:
+                    # The result is still exported, a resumed run only has to redo it
+                    logger.warning(f"Could not checkpoint result of {element_name} for {doc_list[doc_index]}: "
+                                   f"{str(e)}")
+        
+        stages = [('resolve', resolve), ('extract', extract), ('retrieve', retrieve),
+                  ('llm', extract_element), ('assemble', assemble)]
+        return Pipeline([Stage(name, func, self.stage_workers[name]) for name, func in stages])
+    
+    def process_element(self, element_name: str, instructions: str, document_list: List[str],
+                        document_texts: Dict[str, str] = None) -> Dict[str, Any]:
+        """Process a single element across multiple documents"""
+        document_results = [
+            self.process_document_element(element_name, instructions, doc_path, document_texts)
+            for doc_path in document_list
+        ]
             
         return {
             "element_name": element_name,
             "instructions": instructions,
             "document_results": document_results
         }
+    
+    def process_document_element(self, element_name: str, instructions: str, doc_path: str,
+                                 document_texts: Dict[str, str] = None) -> Dict[str, Any]:
+        """Process a single element in a single document"""
+        # Extract text from document, unless process_excel already did
+        logger.info(f"Processing document: {doc_path} for element: {element_name}")
+        if document_texts is not None and doc_path in document_texts:
+            document_text = document_texts[doc_path]
+        else:
+            document_text = self.get_document_text(doc_path)
+        
+        if not document_text:
+            return {
+                "document_path": doc_path,
+                "success": False,
+                "error": "Failed to extract text from document"
+            }
+            
+        # Extract element from document text
+        extraction_result = self.extractor.extract_element(element_name, instructions, document_text)
+        
+        return {
+            "document_path": doc_path,
+            "success": True,
+            "extraction": extraction_result
+        }
 
 
 class ResultsExporter:
@@ -488,29 +648,84 @@ def main():
         parser.add_argument('--model', '-m', default="mistralai/Mistral-7B-Instruct-v0.2", 
                             help='Name of the HuggingFace model to use')
         parser.add_argument('--cpu', action='store_true', help='Force CPU mode (no CUDA/quantization)')
+        parser.add_argument('--no-quantize', action='store_true', help='Keep the model in float32 in CPU mode')
+        parser.add_argument('--gguf', help='Path of a GGUF model to run with llama.cpp instead of --model')
+        parser.add_argument('--server', type=parse_address,
+                            help='host:port of a running model server (python -m extraction.model_server)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Prompts generated per LLM batch')
+        parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Path of the extracted text cache')
+        parser.add_argument('--cache-size-mb', type=int, default=1024, help='Maximum size of the extracted text cache')
+        parser.add_argument('--no-cache', action='store_true', help='Always extract documents from scratch')
+        parser.add_argument('--stage-workers', type=parse_stage_workers, default={},
+                            help='Workers per pipeline stage, e.g. extract=4,llm=16 '
+                                 f'(stages: {", ".join(STAGE_WORKERS)})')
+        parser.add_argument('--checkpoint', help='Path of the checkpoint of finished results '
+                                                 '(default: next to the output file)')
+        parser.add_argument('--resume', action='store_true', help='Skip results already in the checkpoint')
+        parser.add_argument('--no-checkpoint', action='store_true', help='Do not record results as they finish')
+        parser.add_argument('--export-partial', action='store_true',
+                            help='Write the results recorded in the checkpoint so far to the output file and exit')
         
         args = parser.parse_args()
-        
-        # Check if CUDA is available
-        cuda_available = torch.cuda.is_available()
-        use_cpu = args.cpu or not cuda_available
-        
-        if use_cpu:
-            logger.info("Running in CPU mode (no CUDA/quantization)")
+        unknown_stages = set(args.stage_workers) - set(STAGE_WORKERS)
+        if unknown_stages:
+            parser.error(f"Unknown pipeline stages: {', '.join(sorted(unknown_stages))}")
+        
+        checkpoint_path = args.checkpoint or checkpoint_path_for(args.output)
+        if args.export_partial:
+            logger.info(f"Exporting partial results from checkpoint: {checkpoint_path}")
+            results = DataProcessor(None, checkpoint=CheckpointStore(checkpoint_path)).partial_results(args.input)
+            if not results["success"] or not ResultsExporter.export_to_excel(results, args.output):
+                logger.error("Failed to export partial results")
+                return 1
+            return 0
+        
+        llm_processor = None
+        if args.server is not None:
+            llm_processor = LocalLLMProcessor(batch_size=args.batch_size, server=args.server)
+            model_name = llm_processor.backend.name
         else:
-            logger.info("CUDA is available, running with GPU acceleration")
-        
-        # Initialize LLM processor
-        logger.info(f"Initializing LLM processor with model: {args.model}")
-        llm_processor = LocalLLMProcessor(model_name=args.model, use_cpu=use_cpu)
+            model_name = args.gguf or args.model
+        
+        checkpoint = None
+        if not args.no_checkpoint:
+            settings = {'model': model_name, 'extractor_version': DocumentProcessor.EXTRACTOR_VERSION}
+            checkpoint = CheckpointStore(checkpoint_path, settings, resume=args.resume)
+            logger.info(f"Recording finished results in checkpoint: {checkpoint_path}")
+        
+        if llm_processor is None and checkpoint is not None and not checkpoint.missing(DataProcessor.read_rows(args.input)):
+            logger.info("All results are in the checkpoint, not loading the model")
+        elif llm_processor is None:
+            # Check if CUDA is available
+            import torch
+            cuda_available = torch.cuda.is_available()
+            use_cpu = args.cpu or not cuda_available
+            
+            if use_cpu:
+                logger.info("Running in CPU mode (no CUDA)")
+            else:
+                logger.info("CUDA is available, running with GPU acceleration")
+            
+            # Initialize LLM processor
+            logger.info(f"Initializing LLM processor with model: {model_name}")
+            llm_processor = LocalLLMProcessor(model_name=args.model, use_cpu=use_cpu, batch_size=args.batch_size,
+                                              quantize=not args.no_quantize, gguf_path=args.gguf)
         
         # Initialize data processor
         logger.info("Initializing data processor")
-        processor = DataProcessor(llm_processor)
+        text_cache = None if args.no_cache else ExtractionCache(args.cache, args.cache_size_mb * 1024 * 1024)
+        processor = DataProcessor(llm_processor, text_cache, args.stage_workers, checkpoint)
         
         # Process Excel file
         logger.info(f"Processing Excel file: {args.input}")
         results = processor.process_excel(args.input)
+        if llm_processor is not None:
+            llm_processor.close()
+        if text_cache is not None:
+            logger.info(f"Extraction cache: {text_cache.hits} hits, {text_cache.misses} misses")
+        if checkpoint is not None:
+            logger.info(f"Checkpoint: {checkpoint.reused} results reused, {checkpoint.recorded} recorded")
+            checkpoint.close()
         
         if not results["success"]:
             logger.error(f"Failed to process Excel file: {results.get('error', 'Unknown error')}")
@@ -527,9 +742,16 @@ def main():
         logger.info("Processing completed successfully")
         return 0
         
+    except KeyboardInterrupt:
+        logger.warning("Interrupted. Finished results are kept in the checkpoint, rerun with --resume "
+                       "to continue or --export-partial to write them out")
+        return 130
     except Exception as e:
         logger.error(f"Unhandled exception in main: {str(e)}")
         return 1
+    finally:
+        shutdown_page_pool()
+        shutdown_ocr_service()
 
 
 if __name__ == "__main__":
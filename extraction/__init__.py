@@ -0,0 +1 @@
+"""Building blocks of the document extraction system (document-extraction-system-cpu.py)"""
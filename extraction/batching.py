@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 8
+MAX_WAIT_SECONDS = 0.05     # how long a batch waits for more prompts before it runs
+MAX_REMEMBERED_RESULTS = 1024
+
+
+class BatchScheduler:
+    """
+    Collects prompts from any number of threads and generates them in batches.
+
+    submit() returns a Future. A single scheduler thread takes all waiting prompts,
+    sorts them by length so each padded batch holds prompts of similar size, and
+    runs them batch_size at a time. Identical prompts are coalesced: a prompt that is
+    already waiting, running or recently answered shares that result, since
+    generation is deterministic.
+    """
+
+    def __init__(self, generate_batch: Callable[[List[str]], List[str]], batch_size: int = BATCH_SIZE,
+                 max_wait: float = MAX_WAIT_SECONDS, prompt_length: Callable[[str], int] = len,
+                 count_tokens: Callable[[str], int] = None):
+        self.generate_batch = generate_batch
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.prompt_length = prompt_length
+        self.count_tokens = count_tokens
+
+        self.condition = threading.Condition()
+        self.pending: "OrderedDict[str, Future]" = OrderedDict()
+        self.running: Dict[str, Future] = {}
+        self.results: "OrderedDict[str, str]" = OrderedDict()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='llm-batch-scheduler', daemon=True)
+        self.thread.start()
+
+        self.prompts = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+
+    def submit(self, prompt: str) -> Future:
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Scheduler is closed")
+            self.prompts += 1
+
+            if prompt in self.results:
+                self.coalesced += 1
+                self.results.move_to_end(prompt)
+                future = Future()
+                future.set_result(self.results[prompt])
+                return future
+
+            future = self.pending.get(prompt) or self.running.get(prompt)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            future = Future()
+            self.pending[prompt] = future
+            self.condition.notify()
+            return future
+
+    def _take_pending(self) -> List[str]:
+        """Wait for prompts, then give other threads max_wait to add more unless a batch is full"""
+        with self.condition:
+            while not self.pending and not self.closed:
+                self.condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self.pending) < self.batch_size and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            prompts = list(self.pending)
+            self.running.update(self.pending)
+            self.pending.clear()
+            return prompts
+
+    def _run(self):
+        while True:
+            prompts = self._take_pending()
+            if not prompts:
+                return  # closed and drained
+
+            prompts.sort(key=self.prompt_length)
+            for start in range(0, len(prompts), self.batch_size):
+                self._run_batch(prompts[start:start + self.batch_size])
+
+    def _run_batch(self, batch: List[str]):
+        started = time.perf_counter()
+        try:
+            outputs = self.generate_batch(batch)
+            error = None
+        except Exception as e:
+            outputs = None
+            error = e
+        elapsed = time.perf_counter() - started
+
+        with self.condition:
+            self.batches += 1
+            self.generation_seconds += elapsed
+            futures = [self.running.pop(prompt) for prompt in batch]
+            if error is None:
+                for prompt, output in zip(batch, outputs):
+                    self.results[prompt] = output
+                while len(self.results) > MAX_REMEMBERED_RESULTS:
+                    self.results.popitem(last=False)
+
+        if error is not None:
+            for future in futures:
+                future.set_exception(error)
+            return
+
+        if self.count_tokens is not None:
+            tokens = sum(self.count_tokens(output) for output in outputs)
+            with self.condition:
+                self.generated_tokens += tokens
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                'prompts': self.prompts,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'generated_tokens': self.generated_tokens,
+                'generation_seconds': round(self.generation_seconds, 2),
+                'tokens_per_second': (round(self.generated_tokens / self.generation_seconds, 1)
+                                      if self.generation_seconds and self.count_tokens else None),
+            }
+
+    def close(self):
+        """Finish waiting prompts and stop the scheduler thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
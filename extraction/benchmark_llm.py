@@ -0,0 +1,74 @@
+"""
+Tokens/sec benchmark of batched versus one-at-a-time generation on CPU.
+
+    python -m extraction.benchmark_llm --model HuggingFaceTB/SmolLM2-135M-Instruct --prompts 32
+
+The same prompts go through a BatchScheduler with batch size 1 (the old
+behaviour, one pipeline call per prompt) and with the requested batch size.
+"""
+import argparse
+import time
+
+from extraction.batching import BatchScheduler
+
+DOCUMENT = ("This agreement is made between Northwind Capital Fund LP, a limited partnership registered "
+            "in the Cayman Islands, and its administrator. Account number 4021 7733 19. ")
+
+
+def build_prompts(count):
+    prompts = []
+    for i in range(count):
+        text = DOCUMENT * (1 + i % 4)
+        prompts.append(f"Extract element {i} from the following document.\n\nDOCUMENT TEXT:\n{text}\n\n"
+                       f"Format your response as:\nFOUND: Yes/No\nVALUE: [value]")
+    return prompts
+
+
+def run(pipe, tokenizer, prompts, batch_size):
+    def generate_batch(batch):
+        outputs = pipe(batch, batch_size=len(batch))
+        return [output[0]['generated_text'] for output in outputs]
+
+    def count_tokens(text):
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    scheduler = BatchScheduler(generate_batch, batch_size=batch_size, prompt_length=count_tokens,
+                               count_tokens=count_tokens)
+    started = time.perf_counter()
+    futures = [scheduler.submit(prompt) for prompt in prompts]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - started
+    scheduler.close()
+
+    stats = scheduler.stats()
+    print(f"batch size {batch_size:>3}: {elapsed:7.2f}s wall, {stats['batches']:>3} batches, "
+          f"{stats['generated_tokens']} tokens, {stats['generated_tokens'] / elapsed:7.1f} tokens/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='HuggingFaceTB/SmolLM2-135M-Instruct')
+    parser.add_argument('--prompts', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-new-tokens', type=int, default=48)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    pipe = pipeline("text-generation", model=model, tokenizer=tokenizer, device="cpu",
+                    max_new_tokens=args.max_new_tokens, return_full_text=False, do_sample=False)
+
+    prompts = build_prompts(args.prompts)
+    run(pipe, tokenizer, prompts, 1)
+    run(pipe, tokenizer, prompts, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
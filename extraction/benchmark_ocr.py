@@ -0,0 +1,140 @@
+"""
+Accuracy and speed of adaptive OCR against fixed-DPI OCR on a generated scanned PDF.
+
+    python -m extraction.benchmark_ocr --pages-per-kind 5
+
+The corpus is fixed (seeded): small, normal and large text, skewed pages, two
+columns, sparse form-like pages and blank pages, all as images without a text
+layer. Each page is OCRed the previous way (rendered at a fixed DPI and passed
+to tesseract as is) and through extraction.ocr, and compared to its known text.
+"""
+import argparse
+import difflib
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from extraction.ocr import ocr_pdf_page
+
+SCAN_DPI = 200
+WORDS = ("account number resident Luxembourg fund partnership registered office capital "
+         "administrator custodian investor domicile trust limited company agreement").split()
+
+# kind -> (font size in points, columns, skew in degrees, sparse)
+KINDS = {
+    'small': (7, 1, 0, False),
+    'normal': (11, 1, 0, False),
+    'large': (20, 1, 0, False),
+    'skewed': (11, 1, 2.5, False),
+    'columns': (10, 2, 0, False),
+    'sparse': (11, 1, 0, True),
+    'blank': None,
+}
+
+
+def page_lines(rng, count, words_per_line):
+    return [' '.join(rng.choice(WORDS) for _ in range(words_per_line)) + f" {rng.randint(10000, 99999)}"
+            for _ in range(count)]
+
+
+def render_page(kind, rng):
+    """Page image and its expected text"""
+    width, height = int(8.27 * SCAN_DPI), int(11.69 * SCAN_DPI)
+    image = Image.new('L', (width, height), 255)
+    if KINDS[kind] is None:
+        return image, ''
+
+    size, columns, skew, sparse = KINDS[kind]
+    pixels = int(size * SCAN_DPI / 72)
+    font = ImageFont.load_default(size=pixels)
+    draw = ImageDraw.Draw(image)
+    spacing = int(pixels * (4 if sparse else 1.5))
+    margin = SCAN_DPI // 2
+    column_width = (width - 2 * margin) // columns
+    words_per_line = max(2, column_width // (pixels * 6)) if not sparse else 2
+    count = (height - 2 * margin) // spacing
+
+    expected = []
+    for column in range(columns):
+        lines = page_lines(rng, count, words_per_line)
+        for i, line in enumerate(lines):
+            draw.text((margin + column * column_width, margin + i * spacing), line, fill=0, font=font)
+        expected.extend(lines)
+    if skew:
+        image = image.rotate(skew, fillcolor=255)
+    return image, '\n'.join(expected)
+
+
+def generate_corpus(path, pages_per_kind, seed=0):
+    rng = random.Random(seed)
+    pdf = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    pages = []
+    for kind in KINDS:
+        for _ in range(pages_per_kind):
+            image, expected = render_page(kind, rng)
+            pdf.drawImage(ImageReader(image), 0, 0, width, height)
+            pdf.showPage()
+            pages.append((kind, expected))
+    pdf.save()
+    return pages
+
+
+def fixed_dpi_ocr(file_path, page_number, dpi):
+    """The previous path: render at a fixed DPI, tesseract with default settings"""
+    from pdf2image import convert_from_path
+
+    image = convert_from_path(file_path, dpi, first_page=page_number, last_page=page_number)[0]
+    return pytesseract.image_to_string(image)
+
+
+def accuracy(expected, text):
+    """Character similarity of whitespace-normalized texts, 1.0 for correctly empty pages"""
+    expected, text = ' '.join(expected.split()), ' '.join(text.split())
+    if not expected:
+        return 1.0 if not text else 0.0
+    return difflib.SequenceMatcher(None, expected, text, autojunk=False).ratio()
+
+
+def run(label, ocr, path, pages):
+    by_kind = defaultdict(list)
+    started = time.perf_counter()
+    for page_number, (kind, expected) in enumerate(pages, start=1):
+        page_started = time.perf_counter()
+        text = ocr(path, page_number)
+        by_kind[kind].append((accuracy(expected, text), time.perf_counter() - page_started))
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{label}: {elapsed:.1f}s for {len(pages)} pages")
+    for kind, results in by_kind.items():
+        scores, seconds = zip(*results)
+        print(f"  {kind:<8} accuracy {sum(scores) / len(scores):6.3f}   {sum(seconds) / len(seconds):6.2f}s/page")
+    scores = [score for results in by_kind.values() for score, _ in results]
+    print(f"  {'all':<8} accuracy {sum(scores) / len(scores):6.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages-per-kind', type=int, default=5)
+    parser.add_argument('--fixed-dpi', type=int, nargs='+', default=[300, 200],
+                        help='Fixed DPIs of the previous paths to compare against')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'corpus.pdf')
+        pages = generate_corpus(path, args.pages_per_kind)
+        for dpi in args.fixed_dpi:
+            run(f"fixed {dpi} DPI", lambda file_path, page, dpi=dpi: fixed_dpi_ocr(file_path, page, dpi), path, pages)
+        run("adaptive", lambda file_path, page: ocr_pdf_page(file_path, page).text, path, pages)
+
+
+if __name__ == '__main__':
+    main()
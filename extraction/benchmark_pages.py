@@ -0,0 +1,83 @@
+"""
+Benchmark of page-parallel PDF extraction on a generated mixed PDF.
+
+    python -m extraction.benchmark_pages --pages 200 --scanned-every 4
+
+Every n-th page is an image without a text layer (a "scanned" page), the others
+carry native text. The same file is extracted serially and with the process
+pool, and both results are compared.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from extraction.pages import PAGE_WORKERS, extract_pdf_pages
+
+LINES_PER_PAGE = 40
+
+
+def page_lines(page_number):
+    return [f"Page {page_number} line {line}: account 12345{line:03d} resident of Luxembourg"
+            for line in range(LINES_PER_PAGE)]
+
+
+def scanned_page_image(lines, dpi=150):
+    """Render lines as a bitmap, like a page that went through a scanner"""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((dpi // 2, dpi // 2 + i * 24), line, fill=0)
+    return image
+
+
+def generate_pdf(path, pages, scanned_every):
+    pdf = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    for page_number in range(1, pages + 1):
+        lines = page_lines(page_number)
+        if scanned_every and page_number % scanned_every == 0:
+            pdf.drawImage(ImageReader(scanned_page_image(lines)), 0, 0, width, height)
+        else:
+            text = pdf.beginText(40, height - 40)
+            for line in lines:
+                text.textLine(line)
+            pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<32} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--scanned-every', type=int, default=4, help='Every n-th page is scanned, 0 for none')
+    parser.add_argument('--workers', type=int, default=PAGE_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'benchmark.pdf')
+        timed(f"generate {args.pages} pages", generate_pdf, path, args.pages, args.scanned_every)
+
+        serial = timed("serial (1 process)", extract_pdf_pages, path, workers=1)
+        parallel = timed(f"parallel ({args.workers} processes)", extract_pdf_pages, path, workers=args.workers)
+
+    ocr_pages = sum(1 for _, _, method in parallel if method == 'ocr')
+    empty_pages = sum(1 for _, text, _ in parallel if not text.strip())
+    print(f"pages: {len(parallel)}, OCR: {ocr_pages}, empty: {empty_pages}, identical: {serial == parallel}")
+
+
+if __name__ == '__main__':
+    main()
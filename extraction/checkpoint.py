@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Rows = List[Tuple[str, str, List[str]]]
+
+
+def checkpoint_path_for(output_path: str) -> str:
+    """Default checkpoint location, next to the output Excel file"""
+    return output_path + '.checkpoint.db'
+
+
+def document_fingerprint(doc_path: str) -> Optional[List[int]]:
+    """Size and mtime of a document, so results of edited documents are not reused"""
+    try:
+        stat = os.stat(doc_path.strip())
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def result_key(element_name: str, instructions: str, doc_path: str) -> str:
+    payload = json.dumps([str(element_name), str(instructions), doc_path, document_fingerprint(doc_path)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Results of finished (element, document) pairs, written to SQLite as each one
+    completes, so an interrupted run can be resumed or exported.
+
+    The settings of the run (model, extractor version) are stored with the
+    results. A new run, or a resumed run with different settings, starts from
+    an empty checkpoint.
+    """
+
+    def __init__(self, path: str, settings: Optional[Dict[str, Any]] = None, resume: bool = True):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                element_name TEXT,
+                document_path TEXT,
+                result TEXT NOT NULL,
+                completed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.reused = 0
+        self.recorded = 0
+
+        if settings is not None:
+            stored = self.conn.execute("SELECT value FROM settings WHERE name = 'run'").fetchone()
+            current = json.dumps(settings, sort_keys=True)
+            if not resume or stored is None or stored[0] != current:
+                if resume and stored is not None:
+                    logger.warning(f"Checkpoint {path} was made with other settings, starting over")
+                self.clear()
+                self.conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('run', ?)", (current,))
+                self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM results")
+            self.conn.commit()
+
+    def get(self, element_name: str, instructions: str, doc_path: str) -> Optional[Dict[str, Any]]:
+        key = result_key(element_name, instructions, doc_path)
+        with self.lock:
+            row = self.conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.reused += 1
+        return json.loads(row[0])
+
+    def put(self, element_name: str, instructions: str, doc_path: str, result: Dict[str, Any]):
+        key = result_key(element_name, instructions, doc_path)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, element_name, document_path, result, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, str(element_name), doc_path, json.dumps(result), time.time())
+            )
+            self.conn.commit()
+            self.recorded += 1
+
+    def missing(self, rows: Rows) -> int:
+        """
+        Number of (element, document) pairs of rows that still need the model: no
+        checkpointed result and a document that exists
+        """
+        keys = {result_key(element_name, instructions, doc_path)
+                for element_name, instructions, doc_list in rows for doc_path in doc_list
+                if document_fingerprint(doc_path) is not None}
+        with self.lock:
+            found = sum(
+                self.conn.execute("SELECT COUNT(*) FROM results WHERE key = ?", (key,)).fetchone()[0]
+                for key in keys
+            )
+        return len(keys) - found
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,180 @@
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'document-extraction', 'file_index')
+INDEX_VERSION = 1
+FUZZY_CUTOFF = 0.85
+SEPARATORS = re.compile(r'[\s_\-.]+')
+
+
+def loose_name(name: str) -> str:
+    """File name without case, whitespace or _ - . separators, for matching names typed differently"""
+    return SEPARATORS.sub('', name.casefold())
+
+
+class FileIndex:
+    """
+    File name -> paths of every file under root, for resolving document names
+    without walking the tree once per name.
+
+    The directory listings are saved with each directory's mtime. refresh() stats
+    every directory but only lists again those whose mtime changed, since adding,
+    removing or renaming an entry changes the mtime of its directory.
+    """
+
+    def __init__(self, root: str, index_folder: Optional[str] = DEFAULT_INDEX_FOLDER):
+        self.root = os.path.abspath(root)
+        self.index_path = None
+        if index_folder:
+            name = hashlib.sha1(self.root.encode('utf-8')).hexdigest() + '.json'
+            self.index_path = os.path.join(index_folder, name)
+
+        # relative directory -> (mtime_ns, file names, subdirectory names)
+        self.directories: Dict[str, Tuple[int, List[str], List[str]]] = self._load()
+        self.by_name: Dict[str, List[str]] = {}
+        self.by_folded_name: Dict[str, List[str]] = {}
+        self.by_loose_name: Dict[str, List[str]] = {}
+
+    def _load(self) -> Dict[str, Tuple[int, List[str], List[str]]]:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('version') != INDEX_VERSION or saved.get('root') != self.root:
+                return {}
+            return {directory: tuple(entry) for directory, entry in saved['directories'].items()}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable file index {self.index_path}: {str(e)}")
+            return {}
+
+    def _save(self):
+        if not self.index_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'root': self.root, 'directories': self.directories}, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not save file index {self.index_path}: {str(e)}")
+
+    def refresh(self) -> 'FileIndex':
+        """Bring the index up to date with the file system"""
+        started = time.perf_counter()
+        directories = {}
+        listed = 0
+        pending = ['']
+        while pending:
+            relative = pending.pop()
+            path = os.path.join(self.root, relative) if relative else self.root
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = self.directories.get(relative)
+            if cached is not None and cached[0] == mtime:
+                files, subdirectories = cached[1], cached[2]
+            else:
+                files, subdirectories = [], []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirectories.append(entry.name)
+                                elif entry.is_file():
+                                    files.append(entry.name)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+                listed += 1
+
+            directories[relative] = (mtime, files, subdirectories)
+            pending.extend(os.path.join(relative, name) if relative else name for name in subdirectories)
+
+        changed = listed > 0 or len(directories) != len(self.directories)
+        self.directories = directories
+        self._build_lookups()
+        if changed:
+            self._save()
+
+        logger.info(f"Indexed {len(self.by_name)} file names in {len(directories)} folders under {self.root} "
+                    f"({listed} folders listed) in {time.perf_counter() - started:.2f}s")
+        return self
+
+    def _build_lookups(self):
+        by_name = {}
+        for relative, (_, files, _) in self.directories.items():
+            folder = os.path.join(self.root, relative) if relative else self.root
+            for name in files:
+                by_name.setdefault(name, []).append(os.path.join(folder, name))
+
+        # Closest to the root first, then alphabetical, so the choice between duplicates is stable
+        for paths in by_name.values():
+            paths.sort(key=lambda path: (path.count(os.sep), path))
+        by_folded_name = {}
+        by_loose_name = {}
+        for name, paths in by_name.items():
+            by_folded_name.setdefault(name.casefold(), []).extend(paths)
+            by_loose_name.setdefault(loose_name(name), []).extend(paths)
+
+        self.by_name = by_name
+        self.by_folded_name = by_folded_name
+        self.by_loose_name = by_loose_name
+
+    def find(self, name: str) -> Tuple[List[str], str]:
+        """
+        Candidate paths for a document name and how they matched: 'exact',
+        'case-insensitive', 'separators' (differs only in case, whitespace and
+        _ - . separators) or 'none'. Names with folders only match paths ending
+        in those folders. Names that are merely similar never match, see suggest().
+        """
+        normalized = os.path.normpath(name)
+        basename = os.path.basename(normalized)
+
+        def under_folders(paths):
+            if basename == normalized:
+                return paths
+            suffix = os.sep + normalized
+            return [path for path in paths if path.endswith(suffix)]
+
+        paths = under_folders(self.by_name.get(basename, []))
+        if paths:
+            return paths, 'exact'
+
+        folded = basename.casefold()
+        suffix = (os.sep + normalized).casefold()
+        paths = [path for path in self.by_folded_name.get(folded, [])
+                 if basename == normalized or path.casefold().endswith(suffix)]
+        if paths:
+            return paths, 'case-insensitive'
+
+        folders = os.path.dirname(normalized).casefold()
+        paths = [path for path in self.by_loose_name.get(loose_name(basename), [])
+                 if not folders or os.path.dirname(path).casefold().endswith(os.sep + folders)]
+        if paths:
+            return paths, 'separators'
+
+        return [], 'none'
+
+    def suggest(self, name: str, count: int = 3) -> List[str]:
+        """
+        Paths of files with names similar to name, for reporting a name that
+        find() could not resolve. These often differ in a year or version number,
+        so they are never used in its place.
+        """
+        folded = os.path.basename(os.path.normpath(name)).casefold()
+        close = difflib.get_close_matches(folded, list(self.by_folded_name), n=count, cutoff=FUZZY_CUTOFF)
+        return [path for match in close for path in self.by_folded_name[match]]
@@ -0,0 +1,322 @@
+"""
+Long-lived local model server shared by extraction runs and the Qt document processor.
+
+    python -m extraction.model_server --model mistralai/Mistral-7B-Instruct-v0.2
+    python -m extraction.model_server --gguf models/mistral-7b-instruct-v0.2.Q4_K_M.gguf
+
+The model is loaded once, int8 dynamically quantized for CPU (or through
+llama.cpp for GGUF files). Clients connect with ModelClient, whose
+generate_batch() matches the in-process backends, so LocalLLMProcessor can use
+either. Prompts of all connected clients go through one BatchScheduler.
+
+Requests are pickled, so only clients holding the server's key may connect: the
+key is EXTRACTION_MODEL_AUTHKEY if set, otherwise a random key the server writes
+to a file only its user can read (AUTHKEY_PATH), which clients of the same user
+read. Listening on a non-loopback address requires EXTRACTION_MODEL_AUTHKEY.
+"""
+import argparse
+import ipaddress
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from typing import List, Dict, Any, Optional, Tuple
+
+from extraction.batching import BATCH_SIZE, BatchScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6070)
+AUTHKEY_ENV = 'EXTRACTION_MODEL_AUTHKEY'
+AUTHKEY_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'document-extraction', 'model_server.key')
+MAX_NEW_TOKENS = 256
+
+
+def authkey_from_env() -> Optional[bytes]:
+    value = os.environ.get(AUTHKEY_ENV)
+    return value.encode() if value else None
+
+
+def load_authkey(create: bool = False, path: str = AUTHKEY_PATH) -> Optional[bytes]:
+    """
+    Key shared by the server and its clients: EXTRACTION_MODEL_AUTHKEY, else the key
+    file of this user, generated when create is set. None if there is neither.
+    """
+    key = authkey_from_env()
+    if key is not None:
+        return key
+
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # another server created it first
+        else:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+            logger.info(f"Generated model server key in {path}")
+
+    try:
+        with open(path, 'rb') as f:
+            if os.name == 'posix' and os.fstat(f.fileno()).st_mode & 0o077:
+                raise PermissionError(f"Model server key {path} is readable by other users, "
+                                      f"restrict it with chmod 600 or delete it")
+            key = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return key or None
+
+
+def is_loopback(host: str) -> bool:
+    """Whether every address host resolves to is a loopback address"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        return bool(addresses) and all(ipaddress.ip_address(address).is_loopback for address in addresses)
+    except (socket.gaierror, ValueError):
+        return False
+
+
+def format_prompt(prompt: str) -> str:
+    """Format prompt for instruction-tuned models"""
+    return f"<s>[INST] {prompt} [/INST]"
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB, None without psutil"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+
+
+class TransformersBackend:
+    """
+    Hugging Face causal LM. On CPU its Linear layers are dynamically quantized to
+    int8, which roughly quarters their memory and speeds up matrix multiplies.
+    """
+
+    def __init__(self, model_name: str, use_cpu: bool = True, quantize: bool = True,
+                 max_new_tokens: int = MAX_NEW_TOKENS):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+
+        started = time.perf_counter()
+        self.name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        # Batched generation with a decoder-only model needs left padding
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        if use_cpu:
+            logger.info(f"Loading model {model_name} in CPU mode" + (" with int8 dynamic quantization" if quantize else ""))
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                torch_dtype=torch.float32,
+                low_cpu_mem_usage=True
+            )
+            if quantize:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            model.eval()
+        else:
+            logger.info(f"Loading model {model_name} in GPU mode with quantization")
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                torch_dtype=torch.float16,
+                device_map="auto",
+                load_in_8bit=True  # Quantize model for memory efficiency
+            )
+
+        self.pipe = pipeline(
+            "text-generation",
+            model=model,
+            tokenizer=self.tokenizer,
+            max_new_tokens=max_new_tokens,
+            return_full_text=False,
+            do_sample=False
+        )
+        self.load_seconds = round(time.perf_counter() - started, 1)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Generate completions for prompts of similar length as one padded batch"""
+        outputs = self.pipe([format_prompt(prompt) for prompt in prompts], batch_size=len(prompts))
+        return [output[0]['generated_text'].strip() for output in outputs]
+
+
+class LlamaCppBackend:
+    """Quantized GGUF model through llama.cpp, which generates one prompt at a time"""
+
+    def __init__(self, model_path: str, max_new_tokens: int = MAX_NEW_TOKENS, context_tokens: int = 4096):
+        from llama_cpp import Llama
+
+        started = time.perf_counter()
+        self.name = os.path.basename(model_path)
+        self.max_new_tokens = max_new_tokens
+        self.llm = Llama(model_path=model_path, n_ctx=context_tokens, n_threads=os.cpu_count(), verbose=False)
+        self.load_seconds = round(time.perf_counter() - started, 1)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode('utf-8'), add_bos=False))
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        # Prompts are already formatted by the model's chat template, llama.cpp adds BOS itself
+        return [
+            self.llm(f"[INST] {prompt} [/INST]", max_tokens=self.max_new_tokens, temperature=0)['choices'][0]['text'].strip()
+            for prompt in prompts
+        ]
+
+
+def load_backend(model_name: str = None, gguf_path: str = None, use_cpu: bool = True, quantize: bool = True,
+                 max_new_tokens: int = MAX_NEW_TOKENS):
+    """Load a model backend and log its load time and memory use"""
+    if gguf_path:
+        backend = LlamaCppBackend(gguf_path, max_new_tokens)
+    else:
+        backend = TransformersBackend(model_name, use_cpu, quantize, max_new_tokens)
+    logger.info(f"Model {backend.name} loaded in {backend.load_seconds}s, RSS {current_rss_mb()} MB")
+    return backend
+
+
+class ModelServer:
+    """Serves one backend to any number of local clients, one thread per connection"""
+
+    def __init__(self, backend, address: Tuple[str, int] = DEFAULT_ADDRESS, authkey: Optional[bytes] = None,
+                 batch_size: int = BATCH_SIZE):
+        """authkey None uses EXTRACTION_MODEL_AUTHKEY, or the generated key of this user on loopback addresses"""
+        explicit = authkey is not None or authkey_from_env() is not None
+        if not explicit and not is_loopback(address[0]):
+            raise ValueError(f"Refusing to listen on {address[0]} without a key: anyone who can connect could run "
+                             f"code as this user. Set {AUTHKEY_ENV} on the server and its clients")
+        self.backend = backend
+        self.address = address
+        self.authkey = authkey or load_authkey(create=True)
+        self.scheduler = BatchScheduler(
+            backend.generate_batch,
+            batch_size=batch_size,
+            prompt_length=backend.count_tokens,
+            count_tokens=backend.count_tokens
+        )
+        self.started_at = time.time()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'model': self.backend.name,
+            'backend': type(self.backend).__name__,
+            'load_seconds': self.backend.load_seconds,
+            'rss_mb': current_rss_mb(),
+            'uptime_seconds': round(time.time() - self.started_at),
+            'generation': self.scheduler.stats(),
+        }
+
+    def handle(self, request):
+        command = request[0]
+        if command == 'generate':
+            futures = [self.scheduler.submit(prompt) for prompt in request[1]]
+            return [future.result() for future in futures]
+        if command == 'info':
+            return self.info()
+        raise ValueError(f"Unknown command: {command}")
+
+    def serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    conn.send(('ok', self.handle(request)))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info(f"Model server listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, AuthenticationError) as e:
+                    logger.warning(f"Rejected connection: {str(e)}")
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+
+class ModelClient:
+    """
+    Connection to a ModelServer with the generate_batch() interface of the in-process
+    backends. It has no tokenizer, callers count tokens approximately.
+    """
+
+    def __init__(self, address: Tuple[str, int] = DEFAULT_ADDRESS, authkey: Optional[bytes] = None):
+        authkey = authkey or load_authkey()
+        if authkey is None:
+            raise FileNotFoundError(f"No model server key: set {AUTHKEY_ENV}, or start the server as this user "
+                                    f"so it writes {AUTHKEY_PATH}")
+        self.conn = Client(address, authkey=authkey)
+        self.lock = threading.Lock()
+        info = self.info()
+        self.name = info['model']
+        self.load_seconds = info['load_seconds']
+
+    @classmethod
+    def connect_if_running(cls, address: Tuple[str, int] = DEFAULT_ADDRESS,
+                           authkey: Optional[bytes] = None) -> Optional['ModelClient']:
+        try:
+            return cls(address, authkey)
+        except (OSError, AuthenticationError):
+            return None
+
+    def _call(self, *request):
+        with self.lock:
+            self.conn.send(request)
+            status, result = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Model server error: {result}")
+        return result
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        return self._call('generate', list(prompts))
+
+    def info(self) -> Dict[str, Any]:
+        return self._call('info')
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(':')
+    return host or DEFAULT_ADDRESS[0], int(port)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', '-m', default="mistralai/Mistral-7B-Instruct-v0.2",
+                        help='Name of the HuggingFace model to use')
+    parser.add_argument('--gguf', help='Path of a GGUF model to run with llama.cpp instead')
+    parser.add_argument('--no-quantize', action='store_true', help='Keep the model in float32 on CPU')
+    parser.add_argument('--address', type=parse_address, default=DEFAULT_ADDRESS, help='host:port to listen on')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Prompts generated per batch')
+    parser.add_argument('--max-new-tokens', type=int, default=MAX_NEW_TOKENS)
+    args = parser.parse_args()
+
+    if authkey_from_env() is None and not is_loopback(args.address[0]):
+        parser.error(f"--address {args.address[0]} is not a loopback address, set {AUTHKEY_ENV} to listen on it")
+
+    backend = load_backend(args.model, args.gguf, quantize=not args.no_quantize, max_new_tokens=args.max_new_tokens)
+    ModelServer(backend, args.address, batch_size=args.batch_size).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+OCR front-end shared by PDF pages and image files.
+
+Each page is looked at once at a low resolution to decide how to OCR it:
+blank pages are skipped from their histogram, the DPI is chosen so text comes
+out about TARGET_TEXT_HEIGHT pixels high, and the tesseract page segmentation
+mode follows the layout. The page is then deskewed, cropped to its ink and
+binarized with whole-array OpenCV operations before tesseract sees it.
+Recognition runs on engines kept loaded by extraction.ocr_service.
+"""
+import logging
+from collections import namedtuple
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from extraction import ocr_service
+from extraction.ocr_service import EMPTY_RESULT, OcrResult
+
+logger = logging.getLogger(__name__)
+
+PROBE_DPI = 100             # resolution used to look at a page before rendering it for OCR
+TARGET_TEXT_HEIGHT = 20     # median glyph height in pixels, about the x-height; puts capitals near the
+                            # 30px at which tesseract is most accurate
+MIN_DPI = 150
+MAX_DPI = 400
+DPI_STEP = 25
+BLANK_INK_FRACTION = 0.001  # pages with fewer dark pixels than this are blank
+MAX_SKEW_DEGREES = 10       # larger angles are more likely layout than skew, leave them alone
+MIN_SKEW_DEGREES = 0.3
+MARGIN_PIXELS = 10          # white border kept around the cropped ink
+
+# Tesseract page segmentation modes
+PSM_AUTO = 3                # columns and mixed layouts
+PSM_BLOCK = 6               # one uniform block of text
+PSM_LINE = 7                # a single line
+PSM_SPARSE = 11             # scattered text, forms
+
+PageLayout = namedtuple('PageLayout', ['blank', 'text_height', 'skew', 'psm'])
+
+
+def to_gray(image) -> np.ndarray:
+    """PIL image or OpenCV array (BGR, BGRA or gray) -> uint8 gray array"""
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L'))
+    if image.ndim == 2:
+        return image
+    code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code)
+
+
+def is_blank(gray: np.ndarray) -> bool:
+    """A page is blank when almost no pixels are darker than mid-grey"""
+    histogram = cv2.calcHist([gray], [0], None, [2], [0, 256])
+    return histogram.ravel()[0] < BLANK_INK_FRACTION * gray.size
+
+
+def ink_mask(gray: np.ndarray) -> np.ndarray:
+    """Otsu binarization with text as 255 on 0"""
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return mask
+
+
+def text_height(mask: np.ndarray) -> Optional[float]:
+    """Median height of the glyph-sized connected components, None without enough of them"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Drop specks, rules and images: glyphs are a few pixels to a fraction of the page high, and not very wide
+    glyphs = (heights >= 3) & (heights < mask.shape[0] / 10) & (widths < heights * 5)
+    if glyphs.sum() < 10:
+        return None
+    return float(np.median(heights[glyphs]))
+
+
+def skew_angle(mask: np.ndarray) -> float:
+    """Rotation of the text in degrees, from the minimum area rectangle around all ink"""
+    points = cv2.findNonZero(mask)
+    if points is None:
+        return 0.0
+    angle = cv2.minAreaRect(points)[2]
+    # OpenCV reports angles in (0, 90] or [-90, 0) depending on the version
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    return angle if MIN_SKEW_DEGREES <= abs(angle) <= MAX_SKEW_DEGREES else 0.0
+
+
+def deskew(gray: np.ndarray, angle: float) -> np.ndarray:
+    if not angle:
+        return gray
+    height, width = gray.shape
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, rotation, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+
+def crop_to_ink(gray: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    points = cv2.findNonZero(mask)
+    if points is None:
+        return gray
+    x, y, width, height = cv2.boundingRect(points)
+    top, left = max(y - MARGIN_PIXELS, 0), max(x - MARGIN_PIXELS, 0)
+    return gray[top:y + height + MARGIN_PIXELS, left:x + width + MARGIN_PIXELS]
+
+
+def segmentation_mode(mask: np.ndarray, glyph_height: float) -> int:
+    """Tesseract --psm for the layout of a deskewed page cropped to its ink, from its row and column ink profiles"""
+    rows = mask.any(axis=1)
+    # Text lines are runs of rows with ink
+    lines = int(np.count_nonzero(rows[1:] & ~rows[:-1]) + rows[0])
+    if lines <= 1:
+        return PSM_LINE
+
+    # A blank vertical band in the middle half, wider than a few characters, separates columns
+    columns = mask.any(axis=0)
+    width = mask.shape[1]
+    middle = ~columns[width // 4:3 * width // 4]
+    if middle.any():
+        gaps = np.diff(np.flatnonzero(np.diff(np.concatenate(([0], middle.view(np.int8), [0])))))[::2]
+        if gaps.size and gaps.max() > 3 * glyph_height:
+            return PSM_AUTO
+
+    # Little of the text area covered by ink: scattered fields, not running text
+    coverage = np.count_nonzero(mask) / mask.size
+    if coverage < 0.05:
+        return PSM_SPARSE
+    return PSM_BLOCK
+
+
+def analyze(gray: np.ndarray) -> PageLayout:
+    """How a page should be OCRed, from a (low resolution) gray rendering"""
+    if is_blank(gray):
+        return PageLayout(True, None, 0.0, None)
+    mask = ink_mask(gray)
+    height = text_height(mask)
+    angle = skew_angle(mask)
+    if angle:
+        mask = ink_mask(deskew(gray, angle))
+    mask = crop_to_ink(mask, mask)
+    return PageLayout(False, height, angle, segmentation_mode(mask, height or TARGET_TEXT_HEIGHT))
+
+
+def choose_dpi(layout: PageLayout, rendered_dpi: int) -> int:
+    """Resolution at which the page's text is about TARGET_TEXT_HEIGHT pixels high"""
+    if not layout.text_height:
+        return MAX_DPI
+    dpi = rendered_dpi * TARGET_TEXT_HEIGHT / layout.text_height
+    return int(min(max(round(dpi / DPI_STEP) * DPI_STEP, MIN_DPI), MAX_DPI))
+
+
+def prepare(gray: np.ndarray, layout: PageLayout) -> np.ndarray:
+    """Deskewed, cropped and binarized page, ready for tesseract"""
+    gray = deskew(gray, layout.skew)
+    mask = ink_mask(gray)
+    cropped = crop_to_ink(gray, mask)
+    _, binary = cv2.threshold(cropped, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return binary
+
+
+def recognize(binary: np.ndarray, psm: int, lang: str = 'eng') -> OcrResult:
+    return ocr_service.recognize(binary, psm, lang)
+
+
+def ocr_image(image, lang: str = 'eng') -> OcrResult:
+    """OCR an image file's pixels; small text is scaled up since the image cannot be rendered again"""
+    gray = to_gray(image)
+    layout = analyze(gray)
+    if layout.blank:
+        return EMPTY_RESULT
+    if layout.text_height and layout.text_height < TARGET_TEXT_HEIGHT * 0.75:
+        scale = min(TARGET_TEXT_HEIGHT / layout.text_height, MAX_DPI / MIN_DPI)
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    return recognize(prepare(gray, layout), layout.psm, lang)
+
+
+def ocr_pdf_page(file_path: str, page_number: int, dpi: Optional[int] = None, lang: str = 'eng') -> OcrResult:
+    """
+    OCR one page (1-based) of a PDF. With dpi None the page is first rendered at
+    PROBE_DPI, blank pages stop there, and the rest are rendered again at the DPI
+    their text height calls for.
+    """
+    from pdf2image import convert_from_path
+
+    probe_dpi = dpi or PROBE_DPI
+    probe = to_gray(convert_from_path(file_path, probe_dpi, first_page=page_number, last_page=page_number)[0])
+    layout = analyze(probe)
+    if layout.blank:
+        logger.debug(f"Page {page_number} of {file_path} is blank, skipping OCR")
+        return EMPTY_RESULT
+
+    gray = probe
+    if dpi is None:
+        dpi = choose_dpi(layout, probe_dpi)
+        gray = to_gray(convert_from_path(file_path, dpi, first_page=page_number, last_page=page_number,
+                                         grayscale=True)[0])
+    logger.debug(f"OCR of page {page_number} of {file_path} at {dpi} DPI, psm {layout.psm}, skew {layout.skew:.1f}")
+    return recognize(prepare(gray, layout), layout.psm, lang)
@@ -0,0 +1,412 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+from importlib.util import find_spec
+from multiprocessing import connection, resource_tracker, shared_memory
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = os.cpu_count() or 1
+DEFAULT_LANG = 'eng'
+TASK_TIMEOUT = 300          # seconds a worker may spend on one image before it is replaced
+RESULT_TIMEOUT = 900        # seconds recognize() waits, queueing included
+
+# Workers are started from threaded code, and replaced from the collector thread; forking then could
+# copy a lock another thread holds into the child, so they come from a fork server (spawn on Windows)
+_context = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+Word = namedtuple('Word', ['text', 'confidence', 'left', 'top', 'right', 'bottom'])
+OcrResult = namedtuple('OcrResult', ['text', 'words'])
+OcrResult.__doc__ = "Recognized text and its words, with boxes in the coordinates of the image passed to OCR"
+
+EMPTY_RESULT = OcrResult('', [])
+
+
+def mean_confidence(result: OcrResult) -> float:
+    confidences = [word.confidence for word in result.words if word.confidence >= 0]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+_warned_no_tesserocr = False
+
+
+def warn_if_no_tesserocr():
+    """Log once per process that tesseract is started for every image, since tesserocr is missing"""
+    global _warned_no_tesserocr
+    if not _warned_no_tesserocr and find_spec('tesserocr') is None:
+        logger.warning("tesserocr is not installed (pip install tesserocr): OCR falls back to pytesseract, "
+                       "which starts the tesseract binary for every image")
+        _warned_no_tesserocr = True
+
+
+class TesseractEngine:
+    """
+    One tesseract instance kept loaded for the life of a process. Uses the
+    tesseract C API through tesserocr when it is installed; otherwise falls
+    back to running the tesseract binary once per image through pytesseract.
+    """
+
+    def __init__(self, lang: str = DEFAULT_LANG):
+        self.lang = lang
+        try:
+            import tesserocr
+        except ImportError:
+            self.tesserocr = None
+            self.api = None
+        else:
+            self.tesserocr = tesserocr
+            self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def recognize(self, image: np.ndarray, psm: int) -> OcrResult:
+        """OCR a uint8 gray image"""
+        image = np.ascontiguousarray(image)
+        if self.api is None:
+            return self._recognize_with_binary(image, psm)
+
+        height, width = image.shape
+        self.api.SetPageSegMode(psm)
+        self.api.SetImageBytes(image.tobytes(), width, height, 1, width)
+        self.api.Recognize()
+        text = self.api.GetUTF8Text()
+
+        words = []
+        level = self.tesserocr.RIL.WORD
+        iterator = self.api.GetIterator()
+        if iterator is not None:
+            for word in self.tesserocr.iterate_level(iterator, level):
+                value = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if value and box:
+                    words.append(Word(value, word.Confidence(level), *box))
+        self.api.Clear()
+        return OcrResult(text, words)
+
+    def _recognize_with_binary(self, image: np.ndarray, psm: int) -> OcrResult:
+        data = pytesseract.image_to_data(Image.fromarray(image), lang=self.lang, config=f'--oem 3 --psm {psm}',
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        for i, value in enumerate(data['text']):
+            if not value.strip():
+                continue
+            left, top = data['left'][i], data['top'][i]
+            words.append(Word(value, float(data['conf'][i]), left, top,
+                              left + data['width'][i], top + data['height'][i]))
+            lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(value)
+
+        # Rebuild the text as tesseract prints it: words of a line joined, blank line between paragraphs
+        text = []
+        previous = None
+        for (block, paragraph, _), line in lines.items():
+            if previous is not None and previous != (block, paragraph):
+                text.append('')
+            text.append(' '.join(line))
+            previous = (block, paragraph)
+        return OcrResult('\n'.join(text) + '\n' if text else '', words)
+
+
+_engine = None
+_local_engine_only = False
+
+
+def use_local_engine():
+    """Make OCR in this process use its own engine, for processes that are themselves long-lived workers"""
+    global _local_engine_only
+    _local_engine_only = True
+
+
+def local_engine(lang: str = DEFAULT_LANG) -> TesseractEngine:
+    global _engine
+    if _engine is None or _engine.lang != lang:
+        _engine = TesseractEngine(lang)
+    return _engine
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block created by the service, which alone unlinks it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block again, with the tracker shared with
+        # the service, so it is still unlinked once
+        return shared_memory.SharedMemory(name=name)
+
+
+def _serve(conn, lang: str):
+    # Each worker is one tesseract, parallelism comes from the number of workers
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    use_local_engine()
+    engine = local_engine(lang)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        task_id, name, shape, psm = task
+        try:
+            block = _attach(name)
+            try:
+                image = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+                result = engine.recognize(image, psm)
+                del image
+            finally:
+                block.close()
+            conn.send((task_id, result, None))
+        except Exception as e:
+            conn.send((task_id, None, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """One OCR process, its end of the pipe and the task it is working on"""
+
+    def __init__(self, index: int, lang: str):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_serve, args=(child_conn, lang), name=f'ocr-{index}', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.index = index
+        self.task_id = None
+        self.started = 0.0
+        self.answered = 0
+        self.reaped = False
+
+
+class OcrService:
+    """
+    Long-lived OCR worker processes, each holding a loaded TesseractEngine.
+
+    submit() copies the image once into a shared memory block and sends a
+    worker only its name and shape; results come back with word boxes and
+    confidences. Safe to use from any number of threads.
+
+    Each worker gets one task at a time, so a worker that dies (tesseract
+    crashing, the OOM killer) or takes longer than TASK_TIMEOUT on one image
+    fails exactly that task, and is replaced.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, lang: str = DEFAULT_LANG):
+        self.lang = lang
+        warn_if_no_tesserocr()
+        # Workers must inherit this process's resource tracker, or each would start its own
+        # and warn about or unlink the blocks it attached to when it exits
+        resource_tracker.ensure_running()
+        self.lock = threading.Lock()
+        self.closing = False
+        self.broken: Optional[str] = None
+        self.ids = itertools.count()
+        self.pending: Dict[int, Tuple[Future, shared_memory.SharedMemory]] = {}
+        self.waiting: Deque[Tuple[int, str, Tuple[int, ...], int]] = deque()
+        self.workers = [_Worker(i, lang) for i in range(workers)]
+        self.idle = list(self.workers)
+        self.restarts = 0
+        # Wakes the collector when submit() starts a task, so its TASK_TIMEOUT deadline is watched
+        self.wakeup_reader, self.wakeup_writer = _context.Pipe(duplex=False)
+        self.collector = threading.Thread(target=self._collect, name='ocr-results', daemon=True)
+        self.collector.start()
+
+    def submit(self, image: np.ndarray, psm: int) -> Future:
+        """OCR a uint8 gray image in a worker process"""
+        if image.ndim != 2 or image.dtype != np.uint8:
+            raise ValueError("OcrService expects a 2-D uint8 gray image")
+        block = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        np.ndarray(image.shape, dtype=np.uint8, buffer=block.buf)[:] = image
+
+        future = Future()
+        with self.lock:
+            if self.closing or self.broken:
+                self._release(block)
+                raise RuntimeError(self.broken or "OcrService is closed")
+            task_id = next(self.ids)
+            self.pending[task_id] = (future, block)
+            self.waiting.append((task_id, block.name, image.shape, psm))
+            if self._dispatch():
+                self.wakeup_writer.send_bytes(b'')
+        return future
+
+    def recognize(self, image: np.ndarray, psm: int, timeout: Optional[float] = RESULT_TIMEOUT) -> OcrResult:
+        future = self.submit(image, psm)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Drops the task if no worker has it yet; one that is running is stopped at TASK_TIMEOUT
+            future.cancel()
+            raise
+
+    @staticmethod
+    def _release(block: shared_memory.SharedMemory):
+        block.close()
+        block.unlink()
+
+    def _dispatch(self) -> int:
+        """Hand waiting tasks to idle workers, called with the lock held. Returns the number handed out"""
+        dispatched = 0
+        while self.waiting and self.idle:
+            task = self.waiting.popleft()
+            future, block = self.pending[task[0]]
+            if not future.set_running_or_notify_cancel():
+                del self.pending[task[0]]
+                self._release(block)
+                continue
+            worker = self.idle.pop()
+            worker.task_id = task[0]
+            worker.started = time.monotonic()
+            dispatched += 1
+            try:
+                worker.conn.send(task)
+            except OSError:
+                # The worker is gone, the collector fails the task and replaces it
+                pass
+        return dispatched
+
+    def _finish(self, task_id: int, result: Optional[OcrResult], error: Optional[BaseException]):
+        """Resolve a task's future and free its image, called with the lock held"""
+        future, block = self.pending.pop(task_id)
+        self._release(block)
+        try:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        except InvalidStateError:
+            pass  # cancelled by a recognize() that timed out
+
+    def _fail_all(self, reason: str):
+        """Fail every waiting task and refuse new ones, called with the lock held"""
+        logger.error(reason)
+        self.broken = reason
+        for task_id, *_ in self.waiting:
+            self._finish(task_id, None, RuntimeError(reason))
+        self.waiting.clear()
+
+    def _collect(self):
+        while True:
+            with self.lock:
+                if (self.closing or self.broken) and all(worker.reaped for worker in self.workers):
+                    return
+                live = [worker for worker in self.workers if not worker.reaped]
+                by_conn = {worker.conn: worker for worker in live}
+                by_sentinel = {worker.process.sentinel: worker for worker in live}
+                deadlines = [worker.started + TASK_TIMEOUT for worker in self.workers if worker.task_id is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = connection.wait(list(by_conn) + list(by_sentinel) + [self.wakeup_reader], timeout)
+
+            with self.lock:
+                while self.wakeup_reader.poll():
+                    self.wakeup_reader.recv_bytes()
+                for handle in ready:
+                    worker = by_conn.get(handle)
+                    if worker is None or worker.task_id is None:
+                        continue
+                    try:
+                        task_id, result, error = worker.conn.recv()
+                    except (EOFError, OSError):
+                        continue  # died while answering, handled with its sentinel
+                    worker.task_id = None
+                    worker.answered += 1
+                    self._finish(task_id, result, None if error is None else RuntimeError(f"OCR failed: {error}"))
+                    self.idle.append(worker)
+
+                now = time.monotonic()
+                for worker in self.workers:
+                    if worker.task_id is not None and now - worker.started > TASK_TIMEOUT and worker.process.is_alive():
+                        logger.error(f"OCR worker {worker.process.name} took over {TASK_TIMEOUT}s on one image, "
+                                     f"stopping it")
+                        worker.process.kill()
+                        worker.process.join()
+
+                for i, worker in enumerate(self.workers):
+                    if worker.reaped or worker.process.is_alive():
+                        continue
+                    worker.reaped = True
+                    worker.process.join()
+                    worker.conn.close()
+                    if worker in self.idle:
+                        self.idle.remove(worker)
+                    if self.closing:
+                        continue
+                    exitcode = worker.process.exitcode
+                    if worker.task_id is not None:
+                        self._finish(worker.task_id, None, RuntimeError(
+                            f"OCR worker {worker.process.name} exited with code {exitcode}"))
+                    elif not worker.answered:
+                        # Died before its first task: it cannot start (tesseract data missing...),
+                        # replacing it would only fail again
+                        self._fail_all(f"OCR worker {worker.process.name} could not start (exit code {exitcode})")
+                    else:
+                        logger.warning(f"OCR worker {worker.process.name} exited with code {exitcode}")
+                    if self.broken:
+                        continue
+                    self.workers[i] = _Worker(worker.index, self.lang)
+                    self.idle.append(self.workers[i])
+                    self.restarts += 1
+
+                self._dispatch()
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+            for worker in self.workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        for worker in self.workers:
+            worker.process.join(TASK_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+        self.collector.join()
+        with self.lock:
+            for task_id in list(self.pending):
+                self._finish(task_id, None, RuntimeError("OcrService was closed"))
+            self.waiting.clear()
+            for worker in self.workers:
+                worker.conn.close()
+            self.wakeup_reader.close()
+            self.wakeup_writer.close()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_ocr_service(lang: str = DEFAULT_LANG) -> OcrService:
+    """OCR service shared by everything in this process"""
+    global _service
+    with _service_lock:
+        if _service is None or _service.lang != lang:
+            if _service is not None:
+                _service.close()
+            _service = OcrService(lang=lang)
+        return _service
+
+
+def shutdown_ocr_service():
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
+
+
+def recognize(image: np.ndarray, psm: int, lang: str = DEFAULT_LANG) -> OcrResult:
+    """
+    OCR a uint8 gray image with a loaded engine: this process's own engine in
+    worker processes, the shared OcrService everywhere else.
+    """
+    if _local_engine_only or multiprocessing.current_process().daemon:
+        return local_engine(lang).recognize(image, psm)
+    return get_ocr_service(lang).recognize(image, psm)
@@ -0,0 +1,111 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Tuple, Optional
+
+import pdfplumber
+
+from extraction.ocr import ocr_pdf_page
+from extraction.ocr_service import use_local_engine, warn_if_no_tesserocr
+
+logger = logging.getLogger(__name__)
+
+OCR_DPI = None          # None picks the DPI of each OCRed page from its text height
+MIN_TEXT_CHARS = 20     # pages with less text layer than this are OCRed
+PAGES_PER_TASK = 4      # small tasks keep the load balanced when only some pages need OCR
+PAGE_WORKERS = os.cpu_count() or 1
+
+_page_pool = None
+
+
+def _init_page_worker():
+    # The pool already uses every core, keep tesseract to one thread per process
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    # Pages are rendered here, OCR them with this worker's own engine instead of sending them on
+    use_local_engine()
+
+
+def get_page_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all documents of a run"""
+    global _page_pool
+    if _page_pool is None:
+        warn_if_no_tesserocr()
+        _page_pool = ProcessPoolExecutor(max_workers=PAGE_WORKERS, initializer=_init_page_worker)
+    return _page_pool
+
+
+def shutdown_page_pool():
+    global _page_pool
+    if _page_pool is not None:
+        _page_pool.shutdown(wait=True)
+        _page_pool = None
+
+
+def ocr_page(file_path: str, page_number: int, dpi: Optional[int] = OCR_DPI) -> str:
+    """Rasterize and OCR a single page (1-based), see extraction.ocr"""
+    return ocr_pdf_page(file_path, page_number, dpi).text
+
+
+def extract_page_range(file_path: str, first_page: int, last_page: int, dpi: Optional[int] = OCR_DPI,
+                       min_text_chars: int = MIN_TEXT_CHARS, force_ocr: bool = False) -> List[Tuple[int, str, str]]:
+    """
+    Extract pages first_page..last_page (1-based, inclusive).
+    Pages without a usable text layer are rasterized one at a time and OCRed.
+    :return: [(page number, text, 'text' or 'ocr')]
+    """
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_number in range(first_page, last_page + 1):
+            text = '' if force_ocr else (pdf.pages[page_number - 1].extract_text() or '')
+            method = 'text'
+            if force_ocr or len(text.strip()) < min_text_chars:
+                try:
+                    ocr_text = ocr_page(file_path, page_number, dpi)
+                except Exception as e:
+                    logger.error(f"Error performing OCR on page {page_number} of {file_path}: {str(e)}")
+                    ocr_text = ''
+                if len(ocr_text.strip()) > len(text.strip()):
+                    text, method = ocr_text, 'ocr'
+            results.append((page_number, text, method))
+    return results
+
+
+def page_count(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(file_path: str, workers: Optional[int] = None, dpi: Optional[int] = OCR_DPI,
+                      min_text_chars: int = MIN_TEXT_CHARS, force_ocr: bool = False) -> List[Tuple[int, str, str]]:
+    """
+    Extract all pages of a PDF in parallel, deciding text layer versus OCR per page.
+    Results are merged in page order.
+    :param workers: None uses the shared pool, 1 runs in this process, otherwise a dedicated pool
+    """
+    total = page_count(file_path)
+    ranges = [(first, min(first + PAGES_PER_TASK - 1, total)) for first in range(1, total + 1, PAGES_PER_TASK)]
+    options = (dpi, min_text_chars, force_ocr)
+
+    if workers == 1 or len(ranges) <= 1:
+        results = [extract_page_range(file_path, first, last, *options) for first, last in ranges]
+    else:
+        firsts, lasts = zip(*ranges)
+        args = [repeat(file_path), firsts, lasts] + [repeat(option) for option in options]
+        if workers is None:
+            results = list(get_page_pool().map(extract_page_range, *args))
+        else:
+            warn_if_no_tesserocr()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker) as pool:
+                results = list(pool.map(extract_page_range, *args))
+
+    pages = [page for result in results for page in result]
+    ocr_pages = sum(1 for _, _, method in pages if method == 'ocr')
+    if ocr_pages:
+        logger.info(f"OCR applied to {ocr_pages} of {total} pages in {file_path}")
+    return pages
+
+
+def extract_pdf_text(file_path: str, **options) -> str:
+    """Text of all pages of a PDF, see extract_pdf_pages"""
+    return '\n'.join(text for _, text, _ in extract_pdf_pages(file_path, **options) if text)
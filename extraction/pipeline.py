@@ -0,0 +1,152 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 64     # items waiting in front of each stage before its producers block
+
+_DONE = object()
+
+
+def parse_stage_workers(value: str) -> Dict[str, int]:
+    """'extract=4,llm=16' -> {'extract': 4, 'llm': 16}"""
+    workers = {}
+    for part in value.split(','):
+        name, _, count = part.partition('=')
+        if not name.strip() or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid stage setting '{part}', expected name=workers")
+        workers[name.strip()] = int(count)
+    return workers
+
+
+class Stage:
+    """
+    One step of a Pipeline. func takes an item and returns the items for the next
+    stage (any iterable, or None for none), so a stage can drop or fan out items.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Optional[Iterable[Any]]], workers: int = 1,
+                 queue_size: int = QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.lock = threading.Lock()
+        self.running_workers = 0
+        self.items = 0
+        self.outputs = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            wall = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+            return {
+                'stage': self.name,
+                'workers': self.workers,
+                'items': self.items,
+                'outputs': self.outputs,
+                'errors': self.errors,
+                'busy_seconds': round(self.busy_seconds, 2),
+                # Time spent waiting for room in the next stage's queue
+                'blocked_seconds': round(self.blocked_seconds, 2),
+                'wall_seconds': round(wall, 2),
+                'items_per_second': round(self.items / wall, 2) if wall else None,
+                'utilization': round(self.busy_seconds / (wall * self.workers), 2) if wall else None,
+            }
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues, each stage with its
+    own worker threads. A full queue blocks the stage feeding it, so a slow stage
+    holds back the ones before it instead of letting work pile up in memory.
+
+    Stage functions are expected to turn failures of their items into outputs.
+    An exception that escapes one is a fault of the pipeline itself: it drops
+    that item, the pipeline still drains, and run() re-raises the first such
+    exception at the end.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.error = None
+        self.error_lock = threading.Lock()
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+
+            started = time.perf_counter()
+            try:
+                outputs = list(stage.func(item) or ())
+                failed = False
+            except Exception as e:
+                logger.error(f"Error in pipeline stage {stage.name}: {str(e)}")
+                with self.error_lock:
+                    self.error = self.error or e
+                outputs = []
+                failed = True
+            busy = time.perf_counter() - started
+
+            blocked = 0.0
+            if downstream is not None:
+                for output in outputs:
+                    waiting = time.perf_counter()
+                    downstream.queue.put(output)
+                    blocked += time.perf_counter() - waiting
+
+            with stage.lock:
+                stage.items += 1
+                stage.outputs += len(outputs)
+                stage.errors += failed
+                stage.busy_seconds += busy
+                stage.blocked_seconds += blocked
+
+        # The last worker of a stage to finish tells the next stage there is no more input
+        with stage.lock:
+            stage.running_workers -= 1
+            last = stage.running_workers == 0
+            if last:
+                stage.finished = time.perf_counter()
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                downstream.queue.put(_DONE)
+
+    def run(self, items: Iterable[Any]):
+        """Feed items through all stages and wait until the last one is done"""
+        threads = []
+        started = time.perf_counter()
+        for index, stage in enumerate(self.stages):
+            stage.started = started
+            stage.running_workers = stage.workers
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f'{stage.name}-{worker}', daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        for item in items:
+            first.queue.put(item)
+        for _ in range(first.workers):
+            first.queue.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [stage.stats() for stage in self.stages]
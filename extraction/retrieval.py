@@ -0,0 +1,121 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, List, Optional
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP_WORDS = 30
+CONTEXT_TOKENS = 512        # budget for document text in a prompt
+MAX_CACHED_INDEXES = 256
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def approximate_tokens(text: str) -> int:
+    """Rough LLM token count when no tokenizer is available"""
+    return int(len(text.split()) * 1.3) + 1
+
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Split text into overlapping chunks of chunk_words words"""
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [' '.join(words)] if words else []
+    step = chunk_words - overlap_words
+    return [' '.join(words[start:start + chunk_words]) for start in range(0, len(words) - overlap_words, step)]
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one document"""
+
+    def __init__(self, chunks: List[str]):
+        self.chunks = chunks
+        self.term_counts = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.average_length) if self.average_length else BM25_K1
+            scores.append(sum(
+                self.idf[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+                for term in terms if term in counts
+            ))
+        return scores
+
+
+class ContextRetriever:
+    """
+    Picks the parts of a document that matter for an element.
+
+    Documents that fit the token budget are passed whole. Longer ones are split
+    into overlapping chunks, ranked with BM25 against the element name and
+    instructions, and the best chunks that fit the budget are returned in
+    document order. Indexes are cached per document text, so every element
+    asked of the same document reuses one index.
+    """
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None, budget_tokens: int = CONTEXT_TOKENS):
+        self.count_tokens = count_tokens or approximate_tokens
+        self.budget_tokens = budget_tokens
+        self.indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def index_for(self, document_text: str) -> BM25Index:
+        key = hashlib.sha1(document_text.encode('utf-8')).hexdigest()
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                return index
+
+        index = BM25Index(chunk_text(document_text))
+        with self.lock:
+            self.indexes[key] = index
+            while len(self.indexes) > MAX_CACHED_INDEXES:
+                self.indexes.popitem(last=False)
+        return index
+
+    def prepare(self, document_text: str):
+        """Build the index of a document ahead of its select() calls, if it is over budget"""
+        if self.count_tokens(document_text) > self.budget_tokens:
+            self.index_for(document_text)
+
+    def select(self, document_text: str, query: str) -> str:
+        """The most relevant text of document_text for query, within the token budget"""
+        if self.count_tokens(document_text) <= self.budget_tokens:
+            return document_text
+
+        index = self.index_for(document_text)
+        scores = index.scores(query)
+        ranked = sorted(range(len(index.chunks)), key=lambda i: (-scores[i], i))
+
+        selected = []
+        used = 0
+        for i in ranked:
+            tokens = self.count_tokens(index.chunks[i])
+            if used + tokens > self.budget_tokens:
+                if selected:
+                    continue
+                # Even the best chunk is over budget, keep its beginning
+                return ' '.join(index.chunks[i].split()[:self.budget_tokens * 3 // 4])
+            selected.append(i)
+            used += tokens
+
+        return '\n...\n'.join(index.chunks[i] for i in sorted(selected))
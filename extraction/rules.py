@@ -0,0 +1,239 @@
+import logging
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RULES_SHEET = 'Rules'
+CONFIDENCE_LABELS = {'high': 0.9, 'medium': 0.6, 'low': 0.3}
+
+
+def confidence_label(confidence: float) -> str:
+    """Numeric rule confidence -> the High/Medium/Low labels used in the results"""
+    if confidence >= 0.8:
+        return "High"
+    if confidence >= 0.5:
+        return "Medium"
+    return "Low"
+
+
+def clean_element_name(element_name: str) -> str:
+    return str(element_name).lower().replace(' ', '_')
+
+
+LEADING_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+# Escapes are matched whole so an escaped parenthesis is not read as the start of a group
+GROUP_REFERENCE = re.compile(r'\\(?:([1-9])|.)|\(\?P=|\(\?\(')
+NAMED_GROUP = re.compile(r'\\.|\(\?P?<(?![=!])\w+>')
+
+
+def embeddable_pattern(pattern: str) -> str:
+    """
+    Rewrite a rule pattern so it can be one branch of an element's alternation:
+    leading global flags such as (?i) become a scoped (?i:...) group, and named
+    groups become plain groups so rules may reuse names. Backreferences and
+    conditionals would point at the wrong group once wrapped and are rejected
+    with ValueError.
+    """
+    flags = ''
+    match = LEADING_FLAGS.match(pattern)
+    while match:
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+        match = LEADING_FLAGS.match(pattern)
+
+    for match in GROUP_REFERENCE.finditer(pattern):
+        if match.group(1) or not match.group(0).startswith('\\'):
+            raise ValueError(f"references to other groups are not supported in rule patterns: {match.group(0)}")
+
+    pattern = NAMED_GROUP.sub(lambda match: match.group(0) if match.group(0).startswith('\\') else '(', pattern)
+    if flags:
+        if 'x' in flags:
+            # A verbose pattern may end in a comment, which would swallow the closing parenthesis
+            pattern += '\n'
+        pattern = f"(?{''.join(sorted(set(flags)))}:{pattern})"
+    return pattern
+
+
+class ExtractionRule:
+    """
+    One way of finding an element without the LLM: either a regex, whose first
+    capture group (or whole match) is the value, or a list of keywords, where
+    the matched keyword is the value.
+    """
+
+    def __init__(self, element: str, pattern: Optional[str] = None, keywords: Optional[List[str]] = None,
+                 confidence: float = 0.9, normalize: Optional[str] = None, min_length: int = 1,
+                 explanation: Optional[str] = None):
+        if not pattern and not keywords:
+            raise ValueError(f"Rule for '{element}' needs a pattern or keywords")
+        self.element = clean_element_name(element)
+        self.keywords = keywords or []
+        if keywords:
+            # Longest first so "Cayman Islands" wins over "Cayman"
+            alternatives = sorted({keyword.strip() for keyword in keywords if keyword.strip()}, key=len, reverse=True)
+            pattern = r'\b(' + '|'.join(re.escape(keyword) for keyword in alternatives) + r')\b'
+        pattern = embeddable_pattern(pattern)
+        self.pattern = pattern
+        self.groups = re.compile(pattern, re.IGNORECASE).groups
+        self.confidence = confidence
+        self.normalize = normalize
+        self.min_length = min_length
+        self.explanation = explanation or (
+            "Found using keyword matching" if keywords else "Found using pattern matching"
+        )
+
+    def clean_value(self, value: str) -> Optional[str]:
+        if self.normalize == 'digits':
+            value = re.sub(r'[^\d]', '', value)
+        elif self.keywords:
+            # Report the keyword as configured, not as written in the document
+            value = next((keyword for keyword in self.keywords if keyword.lower() == value.lower()), value)
+        value = value.strip()
+        return value if len(value) >= self.min_length else None
+
+
+# Built-in rules, tried in order before any rules from the Excel file
+DEFAULT_RULES = [
+    ExtractionRule(
+        'account_id',
+        r'(?:account|acct)(?:\s+|\:|\.|\#)?\s*(?:number|num|no|id|code)?(?:\s+|\:|\.|\#)?\s*(\d[\d\-]{5,})',
+        confidence=0.9, normalize='digits', min_length=5,
+        explanation="Found using pattern matching for account ID format"
+    ),
+    ExtractionRule(
+        'account_id', r'(?:a/c|a/n)(?:\s+|\:|\.|\#)?\s*(\d[\d\-]{5,})',
+        confidence=0.9, normalize='digits', min_length=5,
+        explanation="Found using pattern matching for account ID format"
+    ),
+    ExtractionRule(
+        'account_id', r'(?<!\S)(\d{5,})(?!\S)',  # Any 5+ digit number that stands alone
+        confidence=0.5, normalize='digits', min_length=5,
+        explanation="Found using pattern matching for account ID format"
+    ),
+]
+
+
+class RuleEngine:
+    """
+    Regex-first extraction. All rules of an element are compiled once into a
+    single alternation, so each document is scanned once per element. Among the
+    matches, the rule listed first wins, then the earliest position.
+    """
+
+    def __init__(self, rules: List[ExtractionRule]):
+        self.rules: Dict[str, List[ExtractionRule]] = {}
+        for rule in rules:
+            self.rules.setdefault(rule.element, []).append(rule)
+
+        self.compiled = {}
+        for element, element_rules in self.rules.items():
+            try:
+                self.compiled[element] = self._compile(element_rules)
+            except re.error:
+                # Find the rules that do not work as a branch of the alternation and drop them
+                kept = []
+                for rule in element_rules:
+                    try:
+                        self._compile(kept + [rule])
+                        kept.append(rule)
+                    except re.error as e:
+                        logger.error(f"Skipping rule for '{element}' that cannot be combined "
+                                     f"with the others: {rule.pattern}: {str(e)}")
+                self.rules[element] = kept
+                if kept:
+                    self.compiled[element] = self._compile(kept)
+                else:
+                    del self.rules[element]
+
+        self.lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+
+    @staticmethod
+    def _compile(element_rules: List[ExtractionRule]):
+        pattern = '|'.join(f'(?P<r{i}>{rule.pattern})' for i, rule in enumerate(element_rules))
+        return re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+
+    @classmethod
+    def from_excel(cls, excel_path: str) -> 'RuleEngine':
+        """
+        Built-in rules plus the optional 'Rules' sheet of the instructions workbook, with columns
+        Element name, Pattern, Keywords (comma-separated), Confidence (0-1 or High/Medium/Low) and Normalize.
+        """
+        rules = list(DEFAULT_RULES)
+        try:
+            sheet = pd.read_excel(excel_path, sheet_name=RULES_SHEET)
+        except ValueError:
+            # No rules sheet
+            return cls(rules)
+
+        def cell(row, column):
+            value = row.get(column)
+            return None if pd.isna(value) or str(value).strip() == '' else str(value).strip()
+
+        for _, row in sheet.iterrows():
+            element = cell(row, 'Element name')
+            if element is None:
+                continue
+            confidence = cell(row, 'Confidence') or 'high'
+            keywords = cell(row, 'Keywords')
+            try:
+                confidence = CONFIDENCE_LABELS.get(confidence.lower()) or float(confidence)
+                rules.append(ExtractionRule(
+                    element,
+                    pattern=cell(row, 'Pattern'),
+                    keywords=[keyword.strip() for keyword in keywords.split(',')] if keywords else None,
+                    confidence=confidence,
+                    normalize=cell(row, 'Normalize')
+                ))
+            except (ValueError, re.error) as e:
+                logger.error(f"Skipping invalid rule for '{element}': {str(e)}")
+
+        logger.info(f"Loaded {len(rules)} extraction rules")
+        return cls(rules)
+
+    def _best_match(self, element: str, document_text: str):
+        """(rule index, cleaned value) of the best match, None if no rule matches"""
+        pattern = self.compiled.get(element)
+        if pattern is None:
+            return None
+
+        element_rules = self.rules[element]
+        best = None
+        for match in pattern.finditer(document_text):
+            index = int(match.lastgroup[1:])
+            if best is not None and index >= best[0]:
+                continue
+            rule = element_rules[index]
+            start = pattern.groupindex[match.lastgroup]
+            value = rule.clean_value(match.group(start + 1 if rule.groups else start) or '')
+            if value is not None:
+                best = (index, value)
+                if index == 0:
+                    break
+        return best
+
+    def extract(self, element_name: str, document_text: str) -> Optional[Dict[str, Any]]:
+        """Result of the best matching rule, or None if the LLM has to be asked"""
+        element = clean_element_name(element_name)
+        best = self._best_match(element, document_text)
+
+        with self.lock:
+            self.attempts += 1
+            if best is not None:
+                self.hits += 1
+        if best is None:
+            return None
+
+        rule = self.rules[element][best[0]]
+        return {
+            "found": True,
+            "value": best[1],
+            "confidence": confidence_label(rule.confidence),
+            "confidence_score": rule.confidence,
+            "explanation": rule.explanation
+        }
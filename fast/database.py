@@ -1,17 +1,153 @@
+import asyncio
 import sqlite3
 import json
+import queue
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+from functools import partial
+from typing import Optional, List, Dict, Any, Callable
 from contextlib import contextmanager
+from itertools import islice, product
 
 DATABASE_URL = "cardholder_management.db"
+INSERT_CHUNK_SIZE = 5000
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+# Applied to every pooled connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+]
+
+# Insert order used by the bulk upload path
+CARDHOLDER_COLUMNS = [
+    'record_id', 'upload_id', 'quarter_id', 'certifier_id', 'area_owner_sid', 'area_owner_name',
+    'area_name', 'employee_sid', 'employee_name', 'team', 'access_to_area_allowed', 'region',
+    'country_name', 'city', 'access_type', 'access_from_date', 'access_to_date',
+    'public_private_designation', 'cost_center_code_department_id', 'cost_center_name_department_name',
+    'csh_level_5_name', 'csh_level_6_name', 'csh_level_7_name', 'csh_level_8_name',
+    'csh_level_9_name', 'csh_level_10_name', 'process_owner_status', 'area_owner_status',
+    'certifier_status', 'history'
+]
+
+STATUS_COLUMNS = ['process_owner_status', 'area_owner_status', 'certifier_status']
+
+_STATUS_INSERTS = "\n".join(
+    f"INSERT OR IGNORE INTO record_status (status, quarter_id, certifier_id, record_id) "
+    f"SELECT NEW.{column}, NEW.quarter_id, NEW.certifier_id, NEW.record_id WHERE NEW.{column} IS NOT NULL;"
+    for column in STATUS_COLUMNS
+)
+
+RECORD_STATUS_TRIGGERS = [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_record_status_insert AFTER INSERT ON cardholder_data
+        BEGIN
+            {_STATUS_INSERTS}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_record_status_update
+        AFTER UPDATE OF quarter_id, certifier_id, {', '.join(STATUS_COLUMNS)} ON cardholder_data
+        BEGIN
+            DELETE FROM record_status WHERE record_id = OLD.record_id;
+            {_STATUS_INSERTS}
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS trg_record_status_delete AFTER DELETE ON cardholder_data
+        BEGIN
+            DELETE FROM record_status WHERE record_id = OLD.record_id;
+        END
+    ''',
+]
+
+# /status response key -> cardholder_data column
+STATUS_ROLES = {
+    'process_owner': 'process_owner_status',
+    'area_owner': 'area_owner_status',
+    'certifier': 'certifier_status',
+}
+
+def _summary_changes(row: str, delta: int) -> str:
+    return "\n".join(
+        f"INSERT INTO status_summary (quarter_id, role, status, record_count) "
+        f"SELECT {row}.quarter_id, '{role}', {row}.{column}, {delta} WHERE {row}.{column} IS NOT NULL "
+        f"ON CONFLICT (quarter_id, role, status) DO UPDATE SET record_count = record_count + ({delta});"
+        for role, column in STATUS_ROLES.items()
+    )
+
+# Keep status_summary in step with cardholder_data inside the writing transaction
+STATUS_SUMMARY_TRIGGERS = [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_summary_insert AFTER INSERT ON cardholder_data
+        BEGIN
+            {_summary_changes('NEW', 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_summary_update
+        AFTER UPDATE OF quarter_id, {', '.join(STATUS_COLUMNS)} ON cardholder_data
+        WHEN OLD.quarter_id IS NOT NEW.quarter_id
+            {' '.join(f'OR OLD.{column} IS NOT NEW.{column}' for column in STATUS_COLUMNS)}
+        BEGIN
+            {_summary_changes('OLD', -1)}
+            {_summary_changes('NEW', 1)}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_status_summary_delete AFTER DELETE ON cardholder_data
+        BEGIN
+            {_summary_changes('OLD', -1)}
+        END
+    ''',
+]
+
+def rebuild_status_summary(cursor: sqlite3.Cursor):
+    """Recompute status_summary from cardholder_data with one GROUP BY per role"""
+    cursor.execute("DELETE FROM status_summary")
+    for role, column in STATUS_ROLES.items():
+        cursor.execute(f'''
+            INSERT INTO status_summary (quarter_id, role, status, record_count)
+            SELECT quarter_id, ?, {column}, COUNT(*) FROM cardholder_data
+            WHERE {column} IS NOT NULL
+            GROUP BY quarter_id, {column}
+        ''', (role,))
+
+# Columns a save request may not overwrite
+NON_UPDATABLE_FIELDS = {'record_id', 'upload_id', 'history', 'created_at', 'updated_at'}
+
+# Stay well below SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK = 500
+
+def to_db_value(value: Any) -> Any:
+    """Convert API values to the form SQLite stores, so diffs compare like with like"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def bump_data_version(cursor: sqlite3.Cursor, table: str):
+    """Advance the version of table inside the caller's transaction"""
+    cursor.execute('''
+        INSERT INTO data_versions (table_name, version) VALUES (?, 1)
+        ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+    ''', (table,))
 
 def init_database():
     """Initialize the database with required tables"""
     conn = sqlite3.connect(DATABASE_URL)
     cursor = conn.cursor()
     
+    # WAL is persistent in the database file, readers no longer block on writers
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # Create ROLE_DELEGATIONS table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS role_delegations (
@@ -83,25 +219,170 @@ def init_database():
         )
     ''')
     
-    # Create indexes for better performance
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_quarter ON cardholder_data(quarter_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_certifier ON cardholder_data(certifier_id)')
+    # Create UPLOAD_ERRORS table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_errors (
+            upload_id TEXT NOT NULL,
+            row_number INTEGER,
+            error TEXT NOT NULL
+        )
+    ''')
+    
+    # Create DATA_VERSIONS table: a counter per table, bumped by every write path, used
+    # as the cache key component for anything derived from that table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    
+    # Create CARDHOLDER_HISTORY table: append-only change log, one row per save
+    # with the changes stored as a JSON patch instead of a growing JSON column
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cardholder_history (
+            history_id INTEGER PRIMARY KEY,
+            record_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            changed_by TEXT NOT NULL,
+            changed_at TIMESTAMP NOT NULL,
+            patch TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_record ON cardholder_history(record_id, history_id)')
+    
+    # Create RECORD_STATUS table: one row per distinct status a record is in, so the
+    # three-way status filter becomes a single index lookup. Maintained by triggers.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'record_status'")
+    backfill_status = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS record_status (
+            status TEXT NOT NULL,
+            quarter_id TEXT NOT NULL,
+            certifier_id TEXT NOT NULL,
+            record_id TEXT NOT NULL,
+            PRIMARY KEY (status, record_id)
+        ) WITHOUT ROWID
+    ''')
+    for statement in RECORD_STATUS_TRIGGERS:
+        cursor.execute(statement)
+    if backfill_status:
+        for column in STATUS_COLUMNS:
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO record_status (status, quarter_id, certifier_id, record_id)
+                SELECT {column}, quarter_id, certifier_id, record_id FROM cardholder_data
+                WHERE {column} IS NOT NULL
+            ''')
+    
+    # Create STATUS_SUMMARY table: per-quarter status counts for /status, maintained
+    # by triggers so reading it costs O(statuses) instead of O(records)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'status_summary'")
+    backfill_summary = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS status_summary (
+            quarter_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            status TEXT NOT NULL,
+            record_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quarter_id, role, status)
+        ) WITHOUT ROWID
+    ''')
+    for statement in STATUS_SUMMARY_TRIGGERS:
+        cursor.execute(statement)
+    if backfill_summary:
+        rebuild_status_summary(cursor)
+    
+    # Create indexes for better performance. Every /records filter combination has an
+    # index ending in record_id, so keyset pages are served in order without a sort.
+    cursor.execute('DROP INDEX IF EXISTS idx_cardholder_quarter')
+    cursor.execute('DROP INDEX IF EXISTS idx_cardholder_certifier')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_quarter_record ON cardholder_data(quarter_id, record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_certifier_record ON cardholder_data(certifier_id, record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_quarter_certifier_record '
+                   'ON cardholder_data(quarter_id, certifier_id, record_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_cardholder_upload ON cardholder_data(upload_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_record ON record_status(record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_quarter ON record_status(status, quarter_id, record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_certifier ON record_status(status, certifier_id, record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_quarter_certifier '
+                   'ON record_status(status, quarter_id, certifier_id, record_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_errors_upload ON upload_errors(upload_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_delegations_active ON role_delegations(is_active)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_delegations_role ON role_delegations(role_id)')
     
     conn.commit()
     conn.close()
 
+class ConnectionPool:
+    """
+    Fixed-size pool of long-lived SQLite connections.
+    
+    Connections are opened lazily up to size, so importing this module in a
+    worker process does not open anything. Every connection gets the WAL and
+    cache pragmas once instead of paying the connect cost on each query.
+    """
+    
+    def __init__(self, database: str, size: int = POOL_SIZE):
+        self.database = database
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self.created -= 1
+                    raise
+        return self.idle.get()
+    
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self.idle.put(conn)
+    
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.created -= 1
+
+pool = ConnectionPool(DATABASE_URL)
+
+# Bounded to the pool size so queued queries wait for a thread, not for a connection
+db_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row  # This allows dict-like access to rows
+    """Context manager borrowing a connection from the pool"""
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+async def run_db(func: Callable, *args, **kwargs):
+    """Run a blocking DatabaseManager call on the DB threadpool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args, **kwargs))
 
 class DatabaseManager:
     @staticmethod
@@ -124,10 +405,20 @@ class DatabaseManager:
                 delegation_data['effective_to'],
                 delegation_data.get('is_active', True)
             ))
+            bump_data_version(cursor, 'role_delegations')
             conn.commit()
         
         return delegation_id
     
+    @staticmethod
+    def get_role_delegation(delegation_id: str) -> Optional[Dict]:
+        """Fetch a single role delegation by id"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM role_delegations WHERE delegation_id = ?", (delegation_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
     @staticmethod
     def get_role_delegations(is_active: Optional[bool] = None, role_id: Optional[str] = None) -> List[Dict]:
         """Fetch role delegations with optional filters"""
@@ -173,6 +464,16 @@ class DatabaseManager:
         
         return upload_id
     
+    @staticmethod
+    def get_unfinished_uploads() -> List[Dict]:
+        """Uploads still queued or processing, oldest first"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM data_uploads WHERE upload_status IN ('queued', 'processing') ORDER BY uploaded_at"
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
     @staticmethod
     def update_upload_status(upload_id: str, status: str, records_count: int):
         """Update upload status and record count"""
@@ -218,83 +519,325 @@ class DatabaseManager:
                 record_data.get('certifier_status', 'pending_review'),
                 record_data.get('history')
             ))
+            bump_data_version(cursor, 'cardholder_data')
             conn.commit()
         
         return record_id
     
     @staticmethod
-    def get_cardholder_records(quarter_id: Optional[str] = None, certifier_id: Optional[str] = None, 
-                              status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
-        """Fetch cardholder records with optional filters"""
+    def bulk_create_cardholder_records(rows, chunk_size: int = INSERT_CHUNK_SIZE,
+                                       on_chunk: Optional[Callable[[int], None]] = None,
+                                       errors: Optional[List] = None) -> int:
+        """
+        Insert an iterable of CARDHOLDER_COLUMNS-ordered tuples in one transaction.
+        
+        When errors is a list, a chunk that fails is retried row by row and each bad
+        row is appended as (position, message) instead of aborting the whole upload.
+        on_chunk is called with the running count of inserted rows after every chunk.
+        """
+        query = f"INSERT INTO cardholder_data ({', '.join(CARDHOLDER_COLUMNS)}) " \
+                f"VALUES ({', '.join('?' * len(CARDHOLDER_COLUMNS))})"
+        rows = iter(rows)
+        inserted = 0
+        position = 0
+        
+        with get_db_connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                while True:
+                    chunk = list(islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    cursor.execute("SAVEPOINT chunk")
+                    try:
+                        cursor.executemany(query, chunk)
+                        inserted += len(chunk)
+                    except sqlite3.Error:
+                        cursor.execute("ROLLBACK TO chunk")
+                        if errors is None:
+                            raise
+                        for offset, row in enumerate(chunk):
+                            try:
+                                cursor.execute(query, row)
+                                inserted += 1
+                            except sqlite3.Error as e:
+                                errors.append((position + offset, str(e)))
+                    cursor.execute("RELEASE chunk")
+                    position += len(chunk)
+                    if on_chunk:
+                        on_chunk(inserted)
+                bump_data_version(cursor, 'cardholder_data')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        return inserted
+    
+    @staticmethod
+    def record_upload_errors(upload_id: str, errors: List[tuple]):
+        """Store (row_number, message) errors for an upload"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO upload_errors (upload_id, row_number, error) VALUES (?, ?, ?)",
+                [(upload_id, row_number, message) for row_number, message in errors]
+            )
+            conn.commit()
+    
+    @staticmethod
+    def get_upload(upload_id: str, error_limit: int = 100) -> Optional[Dict]:
+        """Fetch an upload record together with its first error_limit row errors"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM data_uploads WHERE upload_id = ?", (upload_id,))
+            upload = cursor.fetchone()
+            if upload is None:
+                return None
             
+            cursor.execute("SELECT COUNT(*) FROM upload_errors WHERE upload_id = ?", (upload_id,))
+            error_count = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT row_number, error FROM upload_errors WHERE upload_id = ? ORDER BY row_number LIMIT ?",
+                (upload_id, error_limit)
+            )
+            result = dict(upload)
+            result['error_count'] = error_count
+            result['errors'] = [dict(row) for row in cursor.fetchall()]
+            return result
+    
+    @staticmethod
+    def build_records_query(quarter_id: Optional[str] = None, certifier_id: Optional[str] = None,
+                            status: Optional[str] = None, after: Optional[str] = None,
+                            limit: int = 100, offset: int = 0):
+        """
+        Build the /records query ordered by record_id.
+        
+        A status filter is answered from record_status, which holds one row per status
+        a record is in, instead of OR-ing the three status columns. after is the last
+        record_id of the previous page (keyset pagination); offset is kept for old clients.
+        """
+        if status:
+            query = ("SELECT c.* FROM record_status s "
+                     "JOIN cardholder_data c ON c.record_id = s.record_id WHERE s.status = ?")
+            params = [status]
+            prefix = "s."
+        else:
             query = "SELECT * FROM cardholder_data WHERE 1=1"
             params = []
-            
-            if quarter_id:
-                query += " AND quarter_id = ?"
-                params.append(quarter_id)
-            
-            if certifier_id:
-                query += " AND certifier_id = ?"
-                params.append(certifier_id)
-            
-            if status:
-                query += " AND (process_owner_status = ? OR area_owner_status = ? OR certifier_status = ?)"
-                params.extend([status, status, status])
-            
-            query += " LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            
+            prefix = ""
+        
+        if quarter_id:
+            query += f" AND {prefix}quarter_id = ?"
+            params.append(quarter_id)
+        
+        if certifier_id:
+            query += f" AND {prefix}certifier_id = ?"
+            params.append(certifier_id)
+        
+        if after:
+            query += f" AND {prefix}record_id > ?"
+            params.append(after)
+        
+        query += f" ORDER BY {prefix}record_id LIMIT ?"
+        params.append(limit)
+        if offset:
+            query += " OFFSET ?"
+            params.append(offset)
+        
+        return query, params
+    
+    @staticmethod
+    def get_cardholder_records(quarter_id: Optional[str] = None, certifier_id: Optional[str] = None, 
+                              status: Optional[str] = None, limit: int = 100, offset: int = 0,
+                              after: Optional[str] = None) -> List[Dict]:
+        """Fetch cardholder records with optional filters"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            query, params = DatabaseManager.build_records_query(
+                quarter_id=quarter_id, certifier_id=certifier_id, status=status,
+                after=after, limit=limit, offset=offset
+            )
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    @staticmethod
+    def find_full_scans() -> List[Dict]:
+        """
+        EXPLAIN every /records filter combination and return the plans that scan a
+        whole table or need a temporary sort. An empty list means all are indexed.
+        """
+        offenders = []
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for quarter_id, certifier_id, status, after in product(*[[None, 'x']] * 4):
+                query, params = DatabaseManager.build_records_query(
+                    quarter_id=quarter_id, certifier_id=certifier_id, status=status, after=after
+                )
+                cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                plan = [row['detail'] for row in cursor.fetchall()]
+                bad = [step for step in plan
+                       if (step.startswith('SCAN') and 'INDEX' not in step) or 'TEMP B-TREE' in step]
+                if bad:
+                    offenders.append({'query': query, 'plan': plan})
+        return offenders
+    
     @staticmethod
     def update_cardholder_record(record_id: str, update_data: Dict[str, Any], updated_by: str):
         """Update a cardholder record"""
+        updated, _ = DatabaseManager.update_cardholder_records([(record_id, update_data)], updated_by)
+        return updated > 0
+    
+    @staticmethod
+    def update_cardholder_records(updates: List[tuple], updated_by: str):
+        """
+        Apply many (record_id, update_data) pairs in one transaction.
+        
+        All target rows are fetched with IN (...) queries and diffed in memory. Records
+        that change the same set of fields share one executemany, and every change is
+        appended to cardholder_history as a JSON patch.
+        :return: (number of records changed, record_ids that do not exist)
+        """
+        if not updates:
+            return 0, []
+        
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            # First, get the current record to track changes
-            cursor.execute("SELECT * FROM cardholder_data WHERE record_id = ?", (record_id,))
-            current_record = dict(cursor.fetchone())
+            record_ids = list(dict.fromkeys(record_id for record_id, _ in updates))
+            current = {}
+            for start in range(0, len(record_ids), IN_CLAUSE_CHUNK):
+                chunk = record_ids[start:start + IN_CLAUSE_CHUNK]
+                cursor.execute(
+                    f"SELECT * FROM cardholder_data WHERE record_id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                current.update((row['record_id'], dict(row)) for row in cursor.fetchall())
             
-            # Build update query dynamically
-            update_fields = []
-            params = []
-            changes = {}
-            
-            for field, new_value in update_data.items():
-                if field != 'record_id' and field in current_record:
-                    old_value = current_record[field]
-                    if old_value != new_value:
-                        update_fields.append(f"{field} = ?")
-                        params.append(new_value)
-                        changes[field] = {"old": old_value, "new": new_value}
+            missing = [record_id for record_id in record_ids if record_id not in current]
+            timestamp = datetime.now().isoformat()
+            changed_fields: Dict[str, set] = {}
+            history_rows = []
             
-            if update_fields:
-                # Update history
-                history = json.loads(current_record['history']) if current_record['history'] else []
-                history.append({
-                    "action": "updated",
-                    "timestamp": datetime.now().isoformat(),
-                    "user": updated_by,
-                    "changes": changes
-                })
+            for record_id, update_data in updates:
+                record = current.get(record_id)
+                if record is None:
+                    continue
                 
-                update_fields.append("history = ?")
-                update_fields.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(json.dumps(history))
-                params.append(record_id)
+                patch = []
+                for field, new_value in update_data.items():
+                    if field in NON_UPDATABLE_FIELDS or field not in record:
+                        continue
+                    new_value = to_db_value(new_value)
+                    old_value = record[field]
+                    if old_value != new_value:
+                        patch.append({"op": "test", "path": f"/{field}", "value": old_value})
+                        patch.append({"op": "replace", "path": f"/{field}", "value": new_value})
+                        record[field] = new_value
+                        changed_fields.setdefault(record_id, set()).add(field)
                 
-                query = f"UPDATE cardholder_data SET {', '.join(update_fields)} WHERE record_id = ?"
-                cursor.execute(query, params)
+                if patch:
+                    history_rows.append((record_id, "updated", updated_by, timestamp, json.dumps(patch)))
+            
+            # Repeated updates of one record collapse into its final state
+            by_fields: Dict[tuple, List[list]] = {}
+            for record_id, fields in changed_fields.items():
+                fields = tuple(sorted(fields))
+                by_fields.setdefault(fields, []).append(
+                    [current[record_id][field] for field in fields] + [record_id]
+                )
+            
+            try:
+                for fields, params in by_fields.items():
+                    assignments = ', '.join(f"{field} = ?" for field in fields)
+                    cursor.executemany(
+                        f"UPDATE cardholder_data SET {assignments}, updated_at = CURRENT_TIMESTAMP "
+                        f"WHERE record_id = ?", params
+                    )
+                cursor.executemany('''
+                    INSERT INTO cardholder_history (record_id, action, changed_by, changed_at, patch)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', history_rows)
+                if changed_fields:
+                    bump_data_version(cursor, 'cardholder_data')
                 conn.commit()
-                
-                return True
+            except Exception:
+                conn.rollback()
+                raise
+            
+            return len(changed_fields), missing
+    
+    @staticmethod
+    def get_record_history(record_id: str) -> List[Dict]:
+        """Creation entry from the legacy history column followed by the change log"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT history FROM cardholder_data WHERE record_id = ?", (record_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return []
+            history = json.loads(row['history']) if row['history'] else []
             
-            return False
+            cursor.execute('''
+                SELECT action, changed_by, changed_at, patch FROM cardholder_history
+                WHERE record_id = ? ORDER BY history_id
+            ''', (record_id,))
+            for entry in cursor.fetchall():
+                history.append({
+                    "action": entry['action'],
+                    "timestamp": entry['changed_at'],
+                    "user": entry['changed_by'],
+                    "patch": json.loads(entry['patch'])
+                })
+            return history
+    
+    @staticmethod
+    def get_data_version(table: str) -> int:
+        """Current write version of table, 0 if it was never written through the API"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM data_versions WHERE table_name = ?", (table,))
+            row = cursor.fetchone()
+            return row['version'] if row else 0
+    
+    @staticmethod
+    def get_data_versions(tables: List[str]) -> Dict[str, int]:
+        """Current write versions of several tables in one query"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" * len(tables))
+            cursor.execute(
+                f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})", tables
+            )
+            versions = {row['table_name']: row['version'] for row in cursor.fetchall()}
+            return {table: versions.get(table, 0) for table in tables}
+    
+    @staticmethod
+    def build_report_query(start_date: date, end_date: date, quarter_id: Optional[str] = None,
+                           status_filter: Optional[str] = None, certifier_id: Optional[str] = None,
+                           columns: Optional[List[str]] = None):
+        """Build the report query; the status filter goes through record_status like /records"""
+        select = ', '.join(f"c.{column}" for column in columns) if columns else "c.*"
+        if status_filter:
+            query = (f"SELECT {select} FROM record_status s "
+                     f"JOIN cardholder_data c ON c.record_id = s.record_id WHERE s.status = ?")
+            params = [status_filter]
+        else:
+            query = f"SELECT {select} FROM cardholder_data c WHERE 1=1"
+            params = []
+        
+        query += " AND c.created_at BETWEEN ? AND ?"
+        params.extend([start_date.isoformat(), end_date.isoformat()])
+        
+        if quarter_id:
+            query += " AND c.quarter_id = ?"
+            params.append(quarter_id)
+        
+        if certifier_id:
+            query += " AND c.certifier_id = ?"
+            params.append(certifier_id)
+        
+        return query, params
     
     @staticmethod
     def get_records_for_report(start_date: date, end_date: date, quarter_id: Optional[str] = None,
@@ -302,63 +845,59 @@ class DatabaseManager:
         """Get records for report generation"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            query = "SELECT * FROM cardholder_data WHERE created_at BETWEEN ? AND ?"
-            params = [start_date, end_date]
-            
-            if quarter_id:
-                query += " AND quarter_id = ?"
-                params.append(quarter_id)
-            
-            if certifier_id:
-                query += " AND certifier_id = ?"
-                params.append(certifier_id)
-            
-            if status_filter:
-                query += " AND (process_owner_status = ? OR area_owner_status = ? OR certifier_status = ?)"
-                params.extend([status_filter, status_filter, status_filter])
-            
+            query, params = DatabaseManager.build_report_query(
+                start_date, end_date, quarter_id=quarter_id, status_filter=status_filter, certifier_id=certifier_id
+            )
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    @staticmethod
+    def iter_records_for_report(start_date: date, end_date: date, columns: List[str],
+                                quarter_id: Optional[str] = None, status_filter: Optional[str] = None,
+                                certifier_id: Optional[str] = None, chunk_size: int = INSERT_CHUNK_SIZE):
+        """Yield report rows as lists of tuples in columns order, chunk_size rows at a time"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            query, params = DatabaseManager.build_report_query(
+                start_date, end_date, quarter_id=quarter_id, status_filter=status_filter,
+                certifier_id=certifier_id, columns=columns
+            )
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+    
     @staticmethod
     def get_status_counts(quarter_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
-        """Get status counts for all status types"""
+        """Get status counts for all status types from the materialized summary"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            query = "SELECT process_owner_status, area_owner_status, certifier_status FROM cardholder_data"
+            query = "SELECT role, status, SUM(record_count) AS total FROM status_summary"
             params = []
             
             if quarter_id:
                 query += " WHERE quarter_id = ?"
                 params.append(quarter_id)
             
+            query += " GROUP BY role, status HAVING total > 0"
             cursor.execute(query, params)
-            records = cursor.fetchall()
             
-            process_owner_counts = {}
-            area_owner_counts = {}
-            certifier_counts = {}
+            counts = {role: {} for role in STATUS_ROLES}
+            for row in cursor.fetchall():
+                counts[row['role']][row['status']] = row['total']
             
-            for record in records:
-                # Process Owner Status
-                po_status = record['process_owner_status']
-                process_owner_counts[po_status] = process_owner_counts.get(po_status, 0) + 1
-                
-                # Area Owner Status
-                ao_status = record['area_owner_status']
-                area_owner_counts[ao_status] = area_owner_counts.get(ao_status, 0) + 1
-                
-                # Certifier Status
-                cert_status = record['certifier_status']
-                certifier_counts[cert_status] = certifier_counts.get(cert_status, 0) + 1
-            
-            return {
-                "process_owner": process_owner_counts,
-                "area_owner": area_owner_counts,
-                "certifier": certifier_counts
-            }
+            return counts
+    
+    @staticmethod
+    def refresh_status_summary():
+        """Rebuild status_summary from scratch, e.g. after editing cardholder_data outside the API"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            rebuild_status_summary(cursor)
+            conn.commit()
 
 # Initialize database on import
 init_database()
@@ -0,0 +1,155 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import List, Tuple
+
+import pandas as pd
+
+from database import CARDHOLDER_COLUMNS
+
+# Excel header -> cardholder_data column
+EXCEL_COLUMN_MAP = {
+    'certifier_id': 'certifier_id',
+    'Area_Owner_SID': 'area_owner_sid',
+    'Area_Owner_Name': 'area_owner_name',
+    'Area_Name': 'area_name',
+    'Employee_SID': 'employee_sid',
+    'Employee_Name': 'employee_name',
+    'Team': 'team',
+    'Access_to_Area_allowed_(Y-N)': 'access_to_area_allowed',
+    'Region': 'region',
+    'Country_Name': 'country_name',
+    'City': 'city',
+    'Access_Type': 'access_type',
+    'Access_FROM_Date': 'access_from_date',
+    'Access_TO_Date': 'access_to_date',
+    'Public-Private_Designation': 'public_private_designation',
+    'Cost_Center_Code-Department_Id': 'cost_center_code_department_id',
+    'Cost_Center_Name-Department_Name': 'cost_center_name_department_name',
+    'CSH_Level_5_Name': 'csh_level_5_name',
+    'CSH_Level_6_Name': 'csh_level_6_name',
+    'CSH_Level_7_Name': 'csh_level_7_name',
+    'CSH_Level_8_Name': 'csh_level_8_name',
+    'CSH_Level_9_Name': 'csh_level_9_name',
+    'CSH_Level_10_Name': 'csh_level_10_name',
+}
+
+DATE_COLUMNS = ['access_from_date', 'access_to_date']
+BOOL_COLUMNS = ['access_to_area_allowed']
+TRUE_VALUES = {'y', 'yes', 'true', '1'}
+FALSE_VALUES = {'n', 'no', 'false', '0'}
+
+
+def read_cardholder_excel(file_path: str) -> pd.DataFrame:
+    """Read an uploaded Excel file, keeping only the columns we store"""
+    header = pd.read_excel(file_path, nrows=0).columns
+    usecols = [column for column in header if column in EXCEL_COLUMN_MAP]
+    return pd.read_excel(file_path, usecols=usecols)
+
+
+def generate_uuids(count: int) -> List[str]:
+    """Generate count random UUID4 strings from a single urandom call"""
+    raw = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
+
+
+def _coerce_text(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), None).map(lambda value: value if value is None else str(value))
+
+
+def _coerce_bool(series: pd.Series) -> pd.Series:
+    def to_bool(value):
+        if value is None:
+            return None
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        return bool(value)
+    return series.astype(object).where(series.notna(), None).map(to_bool)
+
+
+def _coerce_date(series: pd.Series) -> pd.Series:
+    # Uploads mix date formats within a column, so each value is parsed on its own
+    dates = pd.to_datetime(series, errors='coerce', format='mixed')
+    return dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), None)
+
+
+def _is_blank(series: pd.Series) -> pd.Series:
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+def invalid_dates(df: pd.DataFrame, records: pd.DataFrame) -> List[Tuple[int, str]]:
+    """(index, error) for every date cell that has a value which could not be parsed"""
+    errors = []
+    for excel_column, column in EXCEL_COLUMN_MAP.items():
+        if column not in DATE_COLUMNS or excel_column not in df:
+            continue
+        unparsed = ~_is_blank(df[excel_column]) & records[column].isna()
+        errors.extend(
+            (index, f"Invalid {excel_column}: {df.at[index, excel_column]!r}")
+            for index in df.index[unparsed]
+        )
+    return errors
+
+
+def prepare_cardholder_frame(df: pd.DataFrame, upload_id: str, quarter_id: str, uploaded_by: str) -> pd.DataFrame:
+    """
+    Convert a raw upload into cardholder_data rows, column by column.
+    The result has exactly CARDHOLDER_COLUMNS in insert order.
+    """
+    df = df.rename(columns=EXCEL_COLUMN_MAP)
+    out = pd.DataFrame(index=df.index)
+
+    out['record_id'] = generate_uuids(len(df))
+    out['upload_id'] = upload_id
+    out['quarter_id'] = quarter_id
+    out['certifier_id'] = df['certifier_id'].fillna('').astype(str) if 'certifier_id' in df else ''
+
+    for column in EXCEL_COLUMN_MAP.values():
+        if column == 'certifier_id':
+            continue
+        if column not in df:
+            out[column] = None
+        elif column in DATE_COLUMNS:
+            out[column] = _coerce_date(df[column])
+        elif column in BOOL_COLUMNS:
+            out[column] = _coerce_bool(df[column])
+        else:
+            out[column] = _coerce_text(df[column])
+
+    out['process_owner_status'] = 'pending_review'
+    out['area_owner_status'] = 'pending_confirmation'
+    out['certifier_status'] = 'pending_review'
+    out['history'] = json.dumps([{
+        "action": "created",
+        "timestamp": datetime.now().isoformat(),
+        "user": uploaded_by
+    }])
+    return out[CARDHOLDER_COLUMNS]
+
+
+def excel_row_number(index) -> int:
+    """DataFrame index -> 1-based Excel row, accounting for the header row"""
+    return int(index) + 2
+
+
+def parse_upload(file_path: str, upload_id: str, quarter_id: str, uploaded_by: str):
+    """
+    Read and convert an upload, splitting off rows that cannot be stored:
+    rows without a certifier_id and rows with a date that cannot be parsed.
+    Runs in a worker process, so it only takes and returns picklable values.
+    :return: (records frame, total row count, [(excel row number, error)])
+    """
+    df = read_cardholder_excel(file_path)
+    records = prepare_cardholder_frame(df, upload_id, quarter_id, uploaded_by)
+
+    missing_certifier = records['certifier_id'].str.strip() == ''
+    errors = [(index, "Missing certifier_id") for index in records.index[missing_certifier]]
+    errors.extend(invalid_dates(df, records))
+    errors.sort(key=lambda error: error[0])
+
+    rejected = records.index.isin([index for index, _ in errors])
+    return records[~rejected], len(df), [(excel_row_number(index), error) for index, error in errors]
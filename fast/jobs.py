@@ -0,0 +1,167 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any
+
+from database import DatabaseManager
+from ingest import parse_upload, excel_row_number
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+FINISHED_JOBS_KEPT = 256    # finished jobs whose row totals and throughput are still reported
+
+
+class UploadJobQueue:
+    """
+    Runs cardholder uploads in the background.
+
+    Excel parsing and column conversion happen in a process pool so several
+    uploads can be parsed at once without holding the GIL. All SQLite writes go
+    through one writer thread, which avoids "database is locked" contention.
+    Live progress is kept in memory, final state is stored in data_uploads.
+    Once a job's final state is stored it leaves the live progress; the last
+    FINISHED_JOBS_KEPT finished jobs keep their row totals and throughput, older
+    ones are reported from data_uploads alone.
+    """
+
+    def __init__(self, parse_workers: int = PARSE_WORKERS):
+        self.parse_workers = parse_workers
+        self.executor = None
+        self.write_queue = queue.Queue()
+        self.writer = None
+        self.progress: Dict[str, Dict[str, Any]] = {}
+        self.finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self.writer = threading.Thread(target=self._write_loop, name="upload-writer", daemon=True)
+        self.writer.start()
+        self._recover_unfinished()
+
+    def shutdown(self):
+        # Parses still running finish first, so the writer stores their results before it stops
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.write_queue.put(None)
+        if self.writer:
+            self.writer.join()
+
+    def _recover_unfinished(self):
+        """
+        Deal with uploads an earlier process left unfinished: queued ones had no rows
+        written yet and are parsed again, processing ones may have been partly
+        inserted and are marked failed.
+        """
+        for upload in DatabaseManager.get_unfinished_uploads():
+            upload_id = upload['upload_id']
+            if upload['upload_status'] == 'queued' and os.path.exists(upload['file_path']):
+                logger.info(f"Requeueing upload {upload_id} left queued by an earlier run")
+                self.submit(upload_id, upload['file_path'], upload['quarter_id'], upload['uploaded_by'])
+                continue
+
+            if upload['upload_status'] == 'queued':
+                reason = "Upload was interrupted by a server restart and its file is no longer available"
+            else:
+                reason = ("Upload was interrupted by a server restart while rows were being inserted, "
+                          "upload the file again")
+            logger.warning(f"Marking upload {upload_id} failed: {reason}")
+            DatabaseManager.record_upload_errors(upload_id, [(None, reason)])
+            DatabaseManager.update_upload_status(upload_id, "failed", upload['records_count'] or 0)
+
+    def submit(self, upload_id: str, file_path: str, quarter_id: str, uploaded_by: str):
+        """Queue an upload that has already been saved to disk and registered in data_uploads"""
+        with self.lock:
+            self.progress[upload_id] = {
+                'state': 'queued',
+                'rows_total': None,
+                'rows_processed': 0,
+                'started_at': None,
+                'finished_at': None,
+            }
+        future = self.executor.submit(parse_upload, file_path, upload_id, quarter_id, uploaded_by)
+        future.add_done_callback(lambda done: self.write_queue.put((upload_id, done)))
+
+    def _update(self, upload_id: str, **values):
+        with self.lock:
+            self.progress[upload_id].update(values)
+
+    def _retire(self, upload_id: str):
+        """Move a job whose final state is stored out of the live progress"""
+        with self.lock:
+            live = self.progress.pop(upload_id, None)
+            if live is not None:
+                self.finished[upload_id] = live
+                while len(self.finished) > FINISHED_JOBS_KEPT:
+                    self.finished.popitem(last=False)
+
+    def _write_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            upload_id, future = item
+            try:
+                self._write_upload(upload_id, future)
+            except Exception as e:
+                logger.exception(f"Error writing upload {upload_id}: {e}")
+                self._update(upload_id, state='failed', finished_at=time.time())
+                try:
+                    DatabaseManager.record_upload_errors(upload_id, [(None, str(e))])
+                    DatabaseManager.update_upload_status(upload_id, "failed", 0)
+                except Exception as db_error:
+                    logger.error(f"Error recording failure of upload {upload_id}: {db_error}")
+            finally:
+                self._retire(upload_id)
+
+    def _write_upload(self, upload_id: str, future):
+        records, total_rows, errors = future.result()
+        self._update(upload_id, state='processing', rows_total=total_rows, started_at=time.time())
+        DatabaseManager.update_upload_status(upload_id, "processing", 0)
+
+        insert_errors = []
+        inserted = DatabaseManager.bulk_create_cardholder_records(
+            records.itertuples(index=False, name=None),
+            on_chunk=lambda count: self._update(upload_id, rows_processed=count),
+            errors=insert_errors
+        )
+        errors += [(excel_row_number(records.index[position]), message) for position, message in insert_errors]
+        if errors:
+            DatabaseManager.record_upload_errors(upload_id, errors)
+
+        status = "completed_with_errors" if errors else "completed"
+        self._update(upload_id, state=status, rows_processed=inserted, finished_at=time.time())
+        DatabaseManager.update_upload_status(upload_id, status, inserted)
+
+    def status(self, upload_id: str, error_limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Combine the stored upload record with live progress and throughput"""
+        upload = DatabaseManager.get_upload(upload_id, error_limit=error_limit)
+        if upload is None:
+            return None
+
+        with self.lock:
+            live = dict(self.progress.get(upload_id) or self.finished.get(upload_id) or {})
+
+        rows_processed = live.get('rows_processed', upload['records_count'])
+        throughput = None
+        if live.get('started_at'):
+            elapsed = (live.get('finished_at') or time.time()) - live['started_at']
+            throughput = round(rows_processed / elapsed, 1) if elapsed > 0 else None
+
+        return {
+            'upload_id': upload_id,
+            'status': live.get('state', upload['upload_status']),
+            'file_name': upload['file_name'],
+            'rows_total': live.get('rows_total'),
+            'rows_processed': rows_processed,
+            'rows_per_second': throughput,
+            'error_count': upload['error_count'],
+            'errors': upload['errors'],
+            'uploaded_at': upload['uploaded_at'],
+            'processed_at': upload['processed_at'],
+        }
@@ -0,0 +1,118 @@
+"""
+Load test for the read endpoints of the cardholder API.
+
+Starts N concurrent clients against a running server, each issuing M requests,
+and reports throughput with p50/p90/p99 latency. Optionally seeds the database
+with synthetic records first so the numbers are taken against a realistic table.
+
+    python loadtest.py --seed 100000 --clients 50 --requests 200
+    python loadtest.py --url http://localhost:8000 --path "/records?quarter_id=Q1-2024&limit=100"
+    python loadtest.py --check-plans
+
+--check-plans runs EXPLAIN QUERY PLAN over every /records filter combination and
+exits non-zero if any of them scans a whole table, so it can gate schema changes.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+
+
+def seed_records(count: int, quarter_id: str):
+    """Insert count synthetic cardholder records through the bulk insert path"""
+    from database import DatabaseManager, CARDHOLDER_COLUMNS
+    from ingest import generate_uuids
+
+    upload_id = DatabaseManager.create_data_upload({
+        'quarter_id': quarter_id,
+        'uploaded_by': 'loadtest',
+        'file_name': 'loadtest.xlsx',
+        'file_path': '',
+        'file_size': 0,
+        'upload_status': 'completed',
+        'records_count': count
+    })
+    statuses = ['pending_review', 'approved', 'rejected']
+    template = dict.fromkeys(CARDHOLDER_COLUMNS)
+
+    def rows():
+        for i, record_id in enumerate(generate_uuids(count)):
+            row = dict(template,
+                       record_id=record_id, upload_id=upload_id, quarter_id=quarter_id,
+                       certifier_id=f"C{i % 200:04d}", employee_sid=f"E{i:07d}",
+                       process_owner_status=statuses[i % 3], area_owner_status='pending_confirmation',
+                       certifier_status=statuses[(i // 3) % 3])
+            yield tuple(row[column] for column in CARDHOLDER_COLUMNS)
+
+    DatabaseManager.bulk_create_cardholder_records(rows())
+
+
+def timed_get(url: str):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def run_client(url: str, requests: int):
+    return [timed_get(url) for _ in range(requests)]
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load_test(url: str, clients: int, requests: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = [item for batch in executor.map(run_client, [url] * clients, [requests] * clients)
+                   for item in batch]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, status in results if status >= 400)
+    return {
+        'url': url,
+        'clients': clients,
+        'requests': len(results),
+        'failures': failures,
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent latency test for the cardholder API")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--path', default='/records?limit=100')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=100, help="requests per client")
+    parser.add_argument('--seed', type=int, default=0, help="insert this many synthetic records first")
+    parser.add_argument('--quarter-id', default='Q1-2024')
+    parser.add_argument('--check-plans', action='store_true', help="fail if a /records query does a full scan")
+    args = parser.parse_args()
+
+    if args.check_plans:
+        from database import DatabaseManager
+        offenders = DatabaseManager.find_full_scans()
+        for offender in offenders:
+            print(f"FULL SCAN: {offender['query']}\n    " + "\n    ".join(offender['plan']))
+        print(f"{len(offenders)} /records query plan(s) with a full scan")
+        sys.exit(1 if offenders else 0)
+
+    if args.seed:
+        seed_records(args.seed, args.quarter_id)
+
+    print(json.dumps(run_load_test(args.url + args.path, args.clients, args.requests), indent=2))
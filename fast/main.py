@@ -1,131 +1,155 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional, Dict
 from datetime import datetime, date
 import pandas as pd
 import json
 import os
+import shutil
 import uuid
 from io import BytesIO
 
-from database import DatabaseManager
+from database import DatabaseManager, run_db, db_executor, pool
+from cache import ResponseCache, response_key, etag_for, etag_matches
+from jobs import UploadJobQueue
+from reports import (
+    REPORT_DB_COLUMNS, REPORT_CHUNK_SIZE, MEDIA_TYPES, FILE_WRITERS,
+    report_key, report_path, cached_report, cleanup_reports, stream_csv
+)
 from schemas import (
     RoleDelegationCreate, RoleDelegationResponse, CardholderDataResponse,
     CardholderDataUpdate, StatusResponse, ReportRequest
 )
 
 app = FastAPI(title="Cardholder Management API", version="1.0.0")
+upload_jobs = UploadJobQueue()
+response_cache = ResponseCache()
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("reports", exist_ok=True)
 
-@app.post("/upload-excel")
+@app.on_event("startup")
+def start_upload_jobs():
+    upload_jobs.start()
+
+@app.on_event("shutdown")
+def stop_upload_jobs():
+    upload_jobs.shutdown()
+    db_executor.shutdown(wait=True)
+    pool.close()
+
+def save_upload(file: UploadFile, quarter_id: str, uploaded_by: str) -> str:
+    """Stream the upload to disk and register it, returns the new upload_id"""
+    file_path = f"uploads/{uuid.uuid4()}_{file.filename}"
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    
+    upload_data = {
+        'quarter_id': quarter_id,
+        'uploaded_by': uploaded_by,
+        'file_name': file.filename,
+        'file_path': file_path,
+        'file_size': os.path.getsize(file_path),
+        'upload_status': 'queued',
+        'records_count': 0
+    }
+    upload_id = DatabaseManager.create_data_upload(upload_data)
+    upload_jobs.submit(upload_id, file_path, quarter_id, uploaded_by)
+    return upload_id
+
+async def cached_json(request: Request, endpoint: str, params: Dict, tables: List[str], load) -> Response:
+    """
+    Serve a read endpoint from response_cache. The ETag is the cache key, which
+    changes whenever one of tables is written, so a matching If-None-Match is
+    answered with 304 without touching the data.
+    load() runs on the DB executor and returns (data, extra response headers).
+    """
+    versions = await run_db(DatabaseManager.get_data_versions, tables)
+    key = response_key(endpoint, params, versions)
+    etag = etag_for(key)
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    cached = response_cache.get(key)
+    if cached is None:
+        data, headers = await run_db(load)
+        body = json.dumps(jsonable_encoder(data)).encode()
+        response_cache.put(key, body, headers)
+        cached = (body, headers)
+    
+    body, headers = cached
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, "ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+@app.post("/upload-excel", status_code=202)
 async def upload_excel(
     file: UploadFile = File(...),
     quarter_id: str = Query(...),
     uploaded_by: str = Query(...),
 ):
-    """Upload Excel file with cardholder data and save to database"""
+    """Upload Excel file with cardholder data and queue it for processing"""
     try:
         # Validate file type
         if not file.filename.endswith(('.xlsx', '.xls')):
             raise HTTPException(status_code=400, detail="Only Excel files are allowed")
         
-        # Save uploaded file
-        file_path = f"uploads/{uuid.uuid4()}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        # Create data upload record
-        upload_data = {
-            'quarter_id': quarter_id,
-            'uploaded_by': uploaded_by,
-            'file_name': file.filename,
-            'file_path': file_path,
-            'file_size': len(content),
-            'upload_status': 'processing',
-            'records_count': len(df)
-        }
-        upload_id = DatabaseManager.create_data_upload(upload_data)
-        
-        # Process each row and create cardholder data records
-        records_created = 0
-        for _, row in df.iterrows():
-            try:
-                record_data = {
-                    'upload_id': upload_id,
-                    'quarter_id': quarter_id,
-                    'certifier_id': str(row.get('certifier_id', '')),
-                    'area_owner_sid': str(row.get('Area_Owner_SID', '')) if pd.notna(row.get('Area_Owner_SID')) else None,
-                    'area_owner_name': str(row.get('Area_Owner_Name', '')) if pd.notna(row.get('Area_Owner_Name')) else None,
-                    'area_name': str(row.get('Area_Name', '')) if pd.notna(row.get('Area_Name')) else None,
-                    'employee_sid': str(row.get('Employee_SID', '')) if pd.notna(row.get('Employee_SID')) else None,
-                    'employee_name': str(row.get('Employee_Name', '')) if pd.notna(row.get('Employee_Name')) else None,
-                    'team': str(row.get('Team', '')) if pd.notna(row.get('Team')) else None,
-                    'access_to_area_allowed': bool(row.get('Access_to_Area_allowed_(Y-N)', False)) if pd.notna(row.get('Access_to_Area_allowed_(Y-N)')) else None,
-                    'region': str(row.get('Region', '')) if pd.notna(row.get('Region')) else None,
-                    'country_name': str(row.get('Country_Name', '')) if pd.notna(row.get('Country_Name')) else None,
-                    'city': str(row.get('City', '')) if pd.notna(row.get('City')) else None,
-                    'access_type': str(row.get('Access_Type', '')) if pd.notna(row.get('Access_Type')) else None,
-                    'access_from_date': pd.to_datetime(row.get('Access_FROM_Date')).date() if pd.notna(row.get('Access_FROM_Date')) else None,
-                    'access_to_date': pd.to_datetime(row.get('Access_TO_Date')).date() if pd.notna(row.get('Access_TO_Date')) else None,
-                    'public_private_designation': str(row.get('Public-Private_Designation', '')) if pd.notna(row.get('Public-Private_Designation')) else None,
-                    'cost_center_code_department_id': str(row.get('Cost_Center_Code-Department_Id', '')) if pd.notna(row.get('Cost_Center_Code-Department_Id')) else None,
-                    'cost_center_name_department_name': str(row.get('Cost_Center_Name-Department_Name', '')) if pd.notna(row.get('Cost_Center_Name-Department_Name')) else None,
-                    'csh_level_5_name': str(row.get('CSH_Level_5_Name', '')) if pd.notna(row.get('CSH_Level_5_Name')) else None,
-                    'csh_level_6_name': str(row.get('CSH_Level_6_Name', '')) if pd.notna(row.get('CSH_Level_6_Name')) else None,
-                    'csh_level_7_name': str(row.get('CSH_Level_7_Name', '')) if pd.notna(row.get('CSH_Level_7_Name')) else None,
-                    'csh_level_8_name': str(row.get('CSH_Level_8_Name', '')) if pd.notna(row.get('CSH_Level_8_Name')) else None,
-                    'csh_level_9_name': str(row.get('CSH_Level_9_Name', '')) if pd.notna(row.get('CSH_Level_9_Name')) else None,
-                    'csh_level_10_name': str(row.get('CSH_Level_10_Name', '')) if pd.notna(row.get('CSH_Level_10_Name')) else None,
-                    'history': json.dumps([{
-                        "action": "created",
-                        "timestamp": datetime.now().isoformat(),
-                        "user": uploaded_by
-                    }])
-                }
-                DatabaseManager.create_cardholder_record(record_data)
-                records_created += 1
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
-        
-        # Update upload status
-        DatabaseManager.update_upload_status(upload_id, "completed", records_created)
+        # Disk and SQLite work is blocking, keep it off the event loop
+        upload_id = await run_db(save_upload, file, quarter_id, uploaded_by)
         
         return {
-            "message": "File uploaded successfully",
+            "message": "File uploaded, processing started",
             "upload_id": upload_id,
-            "records_processed": records_created,
-            "total_rows": len(df)
+            "status_url": f"/uploads/{upload_id}"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@app.get("/uploads/{upload_id}")
+async def get_upload_status(upload_id: str, error_limit: int = Query(100, le=10000)):
+    """Report progress, throughput and row errors of an upload job"""
+    status = await run_db(upload_jobs.status, upload_id, error_limit)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return status
+
 @app.get("/records")
 async def fetch_records(
+    request: Request,
     quarter_id: Optional[str] = Query(None),
     certifier_id: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     limit: int = Query(100, le=1000),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None, description="record_id from X-Next-Cursor of the previous page"),
 ):
-    """Fetch records from cardholder_data table"""
+    """Fetch records from cardholder_data table, ordered by record_id"""
+    params = {
+        'quarter_id': quarter_id,
+        'certifier_id': certifier_id,
+        'status': status,
+        'limit': limit,
+        'offset': offset,
+        'after': cursor,
+    }
+    
+    def load():
+        records = DatabaseManager.get_cardholder_records(**params)
+        headers = {"X-Next-Cursor": records[-1]['record_id']} if len(records) == limit else {}
+        return records, headers
+    
     try:
-        records = DatabaseManager.get_cardholder_records(
-            quarter_id=quarter_id,
-            certifier_id=certifier_id,
-            status=status,
-            limit=limit,
-            offset=offset
-        )
-        return records
+        return await cached_json(request, "records", params, ['cardholder_data'], load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching records: {str(e)}")
 
@@ -136,31 +160,40 @@ async def save_records(
 ):
     """Save modified records back to database"""
     try:
-        updated_count = 0
+        updates = []
         for record_update in records:
             update_data = record_update.dict(exclude_unset=True)
             record_id = update_data.pop('record_id')
-            
-            if DatabaseManager.update_cardholder_record(record_id, update_data, updated_by):
-                updated_count += 1
+            updates.append((record_id, update_data))
         
-        return {"message": f"Successfully updated {updated_count} records"}
+        updated_count, not_found = await run_db(DatabaseManager.update_cardholder_records, updates, updated_by)
+        
+        return {"message": f"Successfully updated {updated_count} records", "not_found": not_found}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving records: {str(e)}")
 
+@app.get("/records/{record_id}/history")
+async def fetch_record_history(record_id: str):
+    """Fetch the change history of a cardholder record"""
+    try:
+        return await run_db(DatabaseManager.get_record_history, record_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
+
 @app.get("/delegates")
 async def fetch_delegates(
+    request: Request,
     is_active: Optional[bool] = Query(None),
     role_id: Optional[str] = Query(None),
 ):
     """Fetch records from role_delegations table"""
+    params = {'is_active': is_active, 'role_id': role_id}
     try:
-        delegations = DatabaseManager.get_role_delegations(
-            is_active=is_active,
-            role_id=role_id
+        return await cached_json(
+            request, "delegates", params, ['role_delegations'],
+            lambda: (DatabaseManager.get_role_delegations(**params), {})
         )
-        return delegations
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching delegates: {str(e)}")
 
@@ -169,13 +202,10 @@ async def make_delegate(delegation: RoleDelegationCreate):
     """Create a new role delegation record"""
     try:
         delegation_data = delegation.dict()
-        delegation_id = DatabaseManager.create_role_delegation(delegation_data)
+        delegation_id = await run_db(DatabaseManager.create_role_delegation, delegation_data)
         
         # Return the created delegation
-        delegations = DatabaseManager.get_role_delegations()
-        created_delegation = next((d for d in delegations if d['delegation_id'] == delegation_id), None)
-        
-        return created_delegation
+        return await run_db(DatabaseManager.get_role_delegation, delegation_id)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating delegation: {str(e)}")
@@ -187,84 +217,63 @@ async def generate_report(
     quarter_id: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None),
     certifier_id: Optional[str] = Query(None),
+    format: str = Query("xlsx", pattern="^(xlsx|csv|parquet)$"),
 ):
-    """Generate Excel report with date range and filters"""
+    """Generate a report with date range and filters as Excel, CSV or Parquet"""
     try:
-        records = DatabaseManager.get_records_for_report(
-            start_date=start_date,
-            end_date=end_date,
-            quarter_id=quarter_id,
-            status_filter=status_filter,
-            certifier_id=certifier_id
-        )
-        
-        # Convert to DataFrame
-        data = []
-        for record in records:
-            data.append({
-                'Record ID': record['record_id'],
-                'Upload ID': record['upload_id'],
-                'Quarter ID': record['quarter_id'],
-                'Certifier ID': record['certifier_id'],
-                'Area Owner SID': record['area_owner_sid'],
-                'Area Owner Name': record['area_owner_name'],
-                'Area Name': record['area_name'],
-                'Employee SID': record['employee_sid'],
-                'Employee Name': record['employee_name'],
-                'Team': record['team'],
-                'Access to Area Allowed': record['access_to_area_allowed'],
-                'Region': record['region'],
-                'Country Name': record['country_name'],
-                'City': record['city'],
-                'Access Type': record['access_type'],
-                'Access From Date': record['access_from_date'],
-                'Access To Date': record['access_to_date'],
-                'Public Private Designation': record['public_private_designation'],
-                'Cost Center Code Department ID': record['cost_center_code_department_id'],
-                'Cost Center Name Department Name': record['cost_center_name_department_name'],
-                'CSH Level 5 Name': record['csh_level_5_name'],
-                'CSH Level 6 Name': record['csh_level_6_name'],
-                'CSH Level 7 Name': record['csh_level_7_name'],
-                'CSH Level 8 Name': record['csh_level_8_name'],
-                'CSH Level 9 Name': record['csh_level_9_name'],
-                'CSH Level 10 Name': record['csh_level_10_name'],
-                'Process Owner Status': record['process_owner_status'],
-                'Area Owner Status': record['area_owner_status'],
-                'Certifier Status': record['certifier_status'],
-                'Process Owner Comment': record['process_owner_comment'],
-                'Area Owner Comment': record['area_owner_comment'],
-                'Certifier Comment': record['certifier_comment'],
-                'Created At': record['created_at'],
-                'Updated At': record['updated_at']
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Generate report file
-        report_filename = f"cardholder_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        report_path = f"reports/{report_filename}"
+        params = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'quarter_id': quarter_id,
+            'status_filter': status_filter,
+            'certifier_id': certifier_id,
+        }
+        version = await run_db(DatabaseManager.get_data_version, 'cardholder_data')
+        key = report_key(params, version, format)
+        download_name = f"cardholder_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
         
-        df.to_excel(report_path, index=False)
+        path = await run_in_threadpool(cached_report, key, format)
+        if path is None:
+            await run_in_threadpool(cleanup_reports)
+            path = report_path(key, format)
+            chunks = DatabaseManager.iter_records_for_report(
+                columns=REPORT_DB_COLUMNS, chunk_size=REPORT_CHUNK_SIZE, **params
+            )
+            if format == 'csv':
+                # Stream straight from the cursor; the file is cached once the stream completes
+                return StreamingResponse(
+                    stream_csv(chunks, path),
+                    media_type=MEDIA_TYPES[format],
+                    headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+                )
+            await run_db(FILE_WRITERS[format], chunks, path)
         
         return FileResponse(
-            path=report_path,
-            filename=report_filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            path=path,
+            filename=download_name,
+            media_type=MEDIA_TYPES[format]
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
 @app.get("/status")
-async def get_status_counts(quarter_id: Optional[str] = Query(None)):
+async def get_status_counts(request: Request, quarter_id: Optional[str] = Query(None)):
     """Get count of different statuses"""
     try:
-        status_counts = DatabaseManager.get_status_counts(quarter_id=quarter_id)
-        return status_counts
+        return await cached_json(
+            request, "status", {'quarter_id': quarter_id}, ['cardholder_data'],
+            lambda: (DatabaseManager.get_status_counts(quarter_id=quarter_id), {})
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting status counts: {str(e)}")
 
+@app.get("/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters of the read endpoint response cache"""
+    return response_cache.stats()
+
 @app.get("/")
 async def root():
     return {"message": "Cardholder Management API", "version": "1.0.0"}
@@ -0,0 +1,190 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from typing import Dict, Any, Iterable, List, Optional
+
+REPORT_DIR = "reports"
+MAX_CACHED_REPORTS = 50
+MAX_REPORT_AGE_SECONDS = 24 * 60 * 60
+REPORT_CHUNK_SIZE = 5000
+
+# cardholder_data column -> report header, in report order
+REPORT_COLUMNS = [
+    ('record_id', 'Record ID'),
+    ('upload_id', 'Upload ID'),
+    ('quarter_id', 'Quarter ID'),
+    ('certifier_id', 'Certifier ID'),
+    ('area_owner_sid', 'Area Owner SID'),
+    ('area_owner_name', 'Area Owner Name'),
+    ('area_name', 'Area Name'),
+    ('employee_sid', 'Employee SID'),
+    ('employee_name', 'Employee Name'),
+    ('team', 'Team'),
+    ('access_to_area_allowed', 'Access to Area Allowed'),
+    ('region', 'Region'),
+    ('country_name', 'Country Name'),
+    ('city', 'City'),
+    ('access_type', 'Access Type'),
+    ('access_from_date', 'Access From Date'),
+    ('access_to_date', 'Access To Date'),
+    ('public_private_designation', 'Public Private Designation'),
+    ('cost_center_code_department_id', 'Cost Center Code Department ID'),
+    ('cost_center_name_department_name', 'Cost Center Name Department Name'),
+    ('csh_level_5_name', 'CSH Level 5 Name'),
+    ('csh_level_6_name', 'CSH Level 6 Name'),
+    ('csh_level_7_name', 'CSH Level 7 Name'),
+    ('csh_level_8_name', 'CSH Level 8 Name'),
+    ('csh_level_9_name', 'CSH Level 9 Name'),
+    ('csh_level_10_name', 'CSH Level 10 Name'),
+    ('process_owner_status', 'Process Owner Status'),
+    ('area_owner_status', 'Area Owner Status'),
+    ('certifier_status', 'Certifier Status'),
+    ('process_owner_comment', 'Process Owner Comment'),
+    ('area_owner_comment', 'Area Owner Comment'),
+    ('certifier_comment', 'Certifier Comment'),
+    ('created_at', 'Created At'),
+    ('updated_at', 'Updated At'),
+]
+REPORT_DB_COLUMNS = [column for column, _ in REPORT_COLUMNS]
+REPORT_HEADERS = [header for _, header in REPORT_COLUMNS]
+BOOL_REPORT_COLUMNS = {'access_to_area_allowed'}
+
+MEDIA_TYPES = {
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv",
+    'parquet': "application/vnd.apache.parquet",
+}
+
+
+def report_key(params: Dict[str, Any], version: int, fmt: str) -> str:
+    """Cache key from the normalized request parameters and the table version"""
+    payload = json.dumps({'params': params, 'version': version, 'format': fmt}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def report_path(key: str, fmt: str) -> str:
+    return os.path.join(REPORT_DIR, f"report_{key}.{fmt}")
+
+
+def cached_report(key: str, fmt: str) -> Optional[str]:
+    """Return the cached report file for key, refreshing its mtime for LRU eviction"""
+    path = report_path(key, fmt)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    return None
+
+
+def cleanup_reports():
+    """Drop reports older than MAX_REPORT_AGE_SECONDS and keep at most MAX_CACHED_REPORTS"""
+    now = time.time()
+    entries = []
+    for entry in os.scandir(REPORT_DIR):
+        if not entry.is_file():
+            continue
+        mtime = entry.stat().st_mtime
+        if now - mtime > MAX_REPORT_AGE_SECONDS:
+            _remove(entry.path)
+        elif not entry.name.startswith('.tmp'):
+            entries.append((mtime, entry.path))
+    entries.sort(reverse=True)
+    for _, path in entries[MAX_CACHED_REPORTS:]:
+        _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _temp_path(fmt: str) -> str:
+    return os.path.join(REPORT_DIR, f".tmp_{uuid.uuid4().hex}.{fmt}")
+
+
+def write_xlsx(chunks: Iterable[List[tuple]], path: str):
+    """Write rows with openpyxl's write-only mode, which keeps memory flat"""
+    from openpyxl import Workbook
+
+    temp_path = _temp_path('xlsx')
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Report")
+        sheet.append(REPORT_HEADERS)
+        for rows in chunks:
+            for row in rows:
+                sheet.append(row)
+        workbook.save(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        _remove(temp_path)
+
+
+def write_parquet(chunks: Iterable[List[tuple]], path: str):
+    """Write one Parquet row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet reports require pyarrow to be installed")
+
+    schema = pa.schema([
+        (header, pa.bool_() if column in BOOL_REPORT_COLUMNS else pa.string())
+        for column, header in REPORT_COLUMNS
+    ])
+    temp_path = _temp_path('parquet')
+    try:
+        with pq.ParquetWriter(temp_path, schema) as writer:
+            for rows in chunks:
+                columns = list(zip(*rows))
+                arrays = [
+                    pa.array([None if value is None else bool(value) for value in values], pa.bool_())
+                    if column in BOOL_REPORT_COLUMNS else
+                    pa.array([None if value is None else str(value) for value in values], pa.string())
+                    for (column, _), values in zip(REPORT_COLUMNS, columns)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        os.replace(temp_path, path)
+    finally:
+        _remove(temp_path)
+
+
+def stream_csv(chunks: Iterable[List[tuple]], path: str):
+    """
+    Yield the report as CSV text chunk by chunk while copying it to path.
+    The copy only becomes visible as a cache entry once the stream completed.
+    """
+    temp_path = _temp_path('csv')
+    completed = False
+    try:
+        with open(temp_path, 'w', newline='', encoding='utf-8') as cache_file:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(REPORT_HEADERS)
+            for rows in chunks:
+                writer.writerows(rows)
+                text = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                cache_file.write(text)
+                yield text
+            text = buffer.getvalue()
+            if text:
+                cache_file.write(text)
+                yield text
+        os.replace(temp_path, path)
+        completed = True
+    finally:
+        if not completed:
+            _remove(temp_path)
+
+
+FILE_WRITERS = {
+    'xlsx': write_xlsx,
+    'parquet': write_parquet,
+}
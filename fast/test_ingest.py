@@ -0,0 +1,29 @@
+import pandas as pd
+
+from ingest import _coerce_date, parse_upload
+
+
+def test_coerce_date_mixed_formats():
+    series = pd.Series(['2024-01-05', '01/02/2024', '5 Mar 2024', None])
+    assert _coerce_date(series).tolist() == ['2024-01-05', '2024-01-02', '2024-03-05', None]
+
+
+def test_parse_upload_reports_unparseable_dates(tmp_path):
+    file_path = tmp_path / "upload.xlsx"
+    pd.DataFrame({
+        'certifier_id': ['C1', 'C2', 'C3', ''],
+        'Employee_Name': ['Ann', 'Bob', 'Cy', 'Di'],
+        'Access_FROM_Date': ['2024-01-05', '01/02/2024', 'not a date', '5 Mar 2024'],
+        'Access_TO_Date': ['5 Mar 2024', None, '2024-12-31', 'soon'],
+    }).to_excel(file_path, index=False)
+
+    records, total, errors = parse_upload(str(file_path), 'upload', 'Q1', 'tester')
+
+    assert total == 4
+    assert records['access_from_date'].tolist() == ['2024-01-05', '2024-01-02']
+    assert records['access_to_date'].tolist() == ['2024-03-05', None]
+    assert errors == [
+        (4, "Invalid Access_FROM_Date: 'not a date'"),
+        (5, "Missing certifier_id"),
+        (5, "Invalid Access_TO_Date: 'soon'"),
+    ]
@@ -0,0 +1,74 @@
+"""
+Benchmark of upload profiling on a generated wide CSV.
+
+    python benchmark_profiling.py --rows 1000000 --columns 50
+
+Reports the time to parse the file, to profile it cold and to profile it again
+from the content-hash cache.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from report_profiler import profile_dataframe, profile_file
+
+MONTHS = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                   'August', 'September', 'October', 'November', 'December'])
+
+
+def generate_csv(path, rows, columns, seed=42):
+    """Write a CSV mixing numeric, date, month, quarter and free text columns"""
+    rng = np.random.default_rng(seed)
+    kinds = ['numeric', 'integer', 'date', 'month', 'quarter', 'text']
+    data = {}
+    for i in range(columns):
+        kind = kinds[i % len(kinds)]
+        if kind == 'numeric':
+            data[f'amount_{i}'] = rng.normal(1000, 250, rows).round(2)
+        elif kind == 'integer':
+            data[f'count_{i}'] = rng.integers(0, 500, rows)
+        elif kind == 'date':
+            days = rng.integers(0, 3650, rows)
+            data[f'date_{i}'] = (np.datetime64('2015-01-01') + days).astype(str)
+        elif kind == 'month':
+            data[f'period_{i}'] = MONTHS[rng.integers(0, 12, rows)]
+        elif kind == 'quarter':
+            data[f'fiscal_{i}'] = np.char.add('Q', rng.integers(1, 5, rows).astype(str))
+        else:
+            data[f'label_{i}'] = np.char.add('item-', rng.integers(0, 10000, rows).astype(str))
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<28} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--columns', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'benchmark.csv')
+        timed(f"generate {args.rows}x{args.columns}", generate_csv, path, args.rows, args.columns)
+        print(f"{'file size':<28} {os.path.getsize(path) / 1e6:8.1f}MB")
+
+        df = timed("parse", pd.read_csv, path)
+        timed("profile dataframe", profile_dataframe, df)
+        profile = timed("profile file (cold)", profile_file, path, pd.read_csv)
+        timed("profile file (cached)", profile_file, path, pd.read_csv)
+
+    counts = pd.Series(profile['fieldTypes']).value_counts().to_dict()
+    print(f"field types: {counts}, time fields: {len(profile['timeFields'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import copy
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import joblib
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+FIELD_TYPES = ['date', 'numeric', 'text']
+MODEL_NAME = 'Field Type Classifier'
+MODEL_TYPE = 'IncrementalSGD'
+MIN_TRAINING_CONFIGS = 3    # Not enough data to train a meaningful model below this
+MODEL_FILES_KEPT = 3
+
+
+def new_vectorizer():
+    """Stateless character n-gram features, so new field names never require refitting"""
+    return HashingVectorizer(analyzer='char', ngram_range=(2, 5), n_features=2 ** 18, alternate_sign=False)
+
+
+def new_model():
+    return SGDClassifier(loss='log_loss', random_state=42)
+
+
+class FieldTypeModelRegistry:
+    """
+    Keeps the active field type model in memory.
+
+    Training examples are deduplicated in the training_examples table and learned
+    incrementally with partial_fit on a background thread. Every training run
+    registers a new version in ml_models and swaps it in; other processes pick the
+    new version up on their next prediction.
+    """
+
+    def __init__(self, db_path, models_folder):
+        self.db_path = db_path
+        self.models_folder = models_folder
+        self.vectorizer = new_vectorizer()
+        self.model = None
+        self.model_id = None
+        self.lock = threading.Lock()
+        self.trainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-trainer')
+
+    def _latest_model(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, model_path FROM ml_models WHERE model_type = ? ORDER BY created_at DESC LIMIT 1",
+            (MODEL_TYPE,)
+        )
+        result = cursor.fetchone()
+        conn.close()
+        return result
+
+    def refresh(self):
+        """Load the latest registered model if it is newer than the one in memory"""
+        latest = self._latest_model()
+        if not latest or latest[0] == self.model_id:
+            return
+        model_data = joblib.load(latest[1])
+        self._activate(latest[0], model_data['model'])
+
+    def _activate(self, model_id, model):
+        with self.lock:
+            self.model_id = model_id
+            self.model = model
+
+    def predict(self, field_names):
+        """Predict the types of field_names in one batch, None if no model is trained yet"""
+        self.refresh()
+        with self.lock:
+            model = self.model
+        if model is None or not field_names:
+            return None
+        X = self.vectorizer.transform([str(name) for name in field_names])
+        return list(model.predict(X))
+
+    def add_examples(self, configs):
+        """Record the field types of configurations as training examples, ignoring known ones"""
+        examples = {
+            (str(field), field_type)
+            for config in configs
+            for field, field_type in config.get('fieldTypes', {}).items()
+        }
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT OR IGNORE INTO training_examples (field_name, field_type) VALUES (?, ?)",
+            sorted(examples)
+        )
+        conn.commit()
+        conn.close()
+
+    def schedule_training(self):
+        """Train on new examples in the background"""
+        future = self.trainer.submit(self.train)
+        future.add_done_callback(self._report_training_error)
+
+    @staticmethod
+    def _report_training_error(future):
+        error = future.exception()
+        if error:
+            print(f"Field type model training failed: {error}")
+
+    def train(self):
+        """
+        Update a copy of the active model with untrained examples and register it.
+        The accuracy stored with it is progressive validation accuracy, that of the
+        previous version on the new examples.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM configurations")
+        if cursor.fetchone()[0] < MIN_TRAINING_CONFIGS:
+            conn.close()
+            return None
+
+        cursor.execute("SELECT rowid, field_name, field_type FROM training_examples WHERE trained = 0")
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            return None
+
+        self.refresh()
+        with self.lock:
+            model = copy.deepcopy(self.model) if self.model is not None else new_model()
+
+        X = self.vectorizer.transform([row[1] for row in rows])
+        y = [row[2] for row in rows]
+        # Progressive validation: the examples are scored before the model learns them, so the
+        # accuracy is measured on data it has not seen. The first version has nothing to score with
+        accuracy = float(model.score(X, y)) if hasattr(model, 'classes_') else None
+        model.partial_fit(X, y, classes=FIELD_TYPES)
+
+        model_id = str(uuid.uuid4())
+        model_path = os.path.join(self.models_folder, f"field_type_model_{model_id}.joblib")
+        joblib.dump({'model': model}, model_path)
+
+        cursor.execute(
+            "INSERT INTO ml_models (id, name, model_type, created_at, accuracy, model_path) VALUES (?, ?, ?, ?, ?, ?)",
+            (model_id, MODEL_NAME, MODEL_TYPE, datetime.now().isoformat(), accuracy, model_path)
+        )
+        cursor.executemany(
+            "UPDATE training_examples SET trained = 1 WHERE rowid = ?",
+            [(row[0],) for row in rows]
+        )
+        conn.commit()
+        self._prune(cursor)
+        conn.commit()
+        conn.close()
+
+        self._activate(model_id, model)
+        return model_id
+
+    def _prune(self, cursor):
+        """Delete model versions older than the last MODEL_FILES_KEPT"""
+        cursor.execute(
+            "SELECT id, model_path FROM ml_models WHERE model_type = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+            (MODEL_TYPE, MODEL_FILES_KEPT)
+        )
+        for model_id, model_path in cursor.fetchall():
+            if os.path.exists(model_path):
+                os.remove(model_path)
+            cursor.execute("DELETE FROM ml_models WHERE id = ?", (model_id,))
+
+    def shutdown(self):
+        self.trainer.shutdown(wait=True)
@@ -8,12 +8,14 @@ import json
 import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.preprocessing import LabelEncoder
 import re
 
+from report_profiler import profile_file
+from model_registry import FieldTypeModelRegistry
+from report_engine import (
+    PAGE_SIZE, MAX_PAGE_SIZE, MissingFieldsError, build_report_data, read_report_page
+)
+
 app = Flask(__name__, static_folder='../frontend/build')
 CORS(app)  # Enable CORS for all routes
 
@@ -30,6 +32,8 @@ os.makedirs(ML_MODELS_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+field_type_models = FieldTypeModelRegistry(DB_PATH, ML_MODELS_FOLDER)
+
 # Initialize database
 def init_db():
     conn = sqlite3.connect(DB_PATH)
@@ -66,13 +70,28 @@ def init_db():
         name TEXT NOT NULL,
         model_type TEXT NOT NULL,
         created_at TIMESTAMP NOT NULL,
-        accuracy REAL,
+        accuracy REAL,  -- progressive validation: previous version scored on this version's new examples
         model_path TEXT NOT NULL
     )
     ''')
     
+    # Create deduplicated training examples table for the field type model
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS training_examples (
+        field_name TEXT NOT NULL,
+        field_type TEXT NOT NULL,
+        trained INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (field_name, field_type)
+    )
+    ''')
+    
     conn.commit()
+    
+    # Make sure configurations saved before the table existed are learned too
+    cursor.execute("SELECT config_data FROM configurations")
+    configs = [json.loads(row[0]) for row in cursor.fetchall()]
     conn.close()
+    field_type_models.add_examples(configs)
 
 # Helper functions
 def allowed_file(filename):
@@ -89,96 +108,17 @@ def parse_file(file_path):
     else:
         raise ValueError(f"Unsupported file format: {file_ext}")
 
-def detect_field_types(df):
-    """Detect data types for each column in the DataFrame"""
-    field_types = {}
-    
-    for column in df.columns:
-        if pd.api.types.is_numeric_dtype(df[column]):
-            field_types[column] = 'numeric'
-        elif pd.api.types.is_datetime64_any_dtype(df[column]):
-            field_types[column] = 'date'
-        elif is_potential_date(df[column]):
-            field_types[column] = 'date'
-        else:
-            field_types[column] = 'text'
-    
-    return field_types
-
-def is_potential_date(series):
-    """Check if a column might contain dates"""
-    # Check a sample of the data
-    sample = series.dropna().head(10).astype(str)
-    
-    # Date patterns
-    date_patterns = [
-        r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}',  # 01/23/2020, 1-23-20
-        r'\d{4}[/-]\d{1,2}[/-]\d{1,2}',    # 2020/01/23, 2020-1-23
-        r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b',  # January 23, 2020
-        r'\b\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{4}\b',    # 23 January 2020
-    ]
-    
-    # Check if any of the patterns match the samples
-    for pattern in date_patterns:
-        if any(series.dropna().astype(str).str.match(pattern)):
-            return True
-    
-    # Check for month names
-    month_pattern = r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b'
-    if any(series.dropna().astype(str).str.contains(month_pattern, case=False)):
-        return True
-    
-    return False
-
-def detect_time_fields(df, field_types):
-    """Detect columns that might represent time periods"""
-    time_fields = []
-    
-    # Months, quarters, years patterns
-    month_names = ['january', 'february', 'march', 'april', 'may', 'june', 
-                  'july', 'august', 'september', 'october', 'november', 'december',
-                  'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
-    quarter_pattern = r'\bq[1-4]\b|\bquarter [1-4]\b'
-    year_pattern = r'\b20\d{2}\b|\b19\d{2}\b'  # Years like 2020, 1999 etc.
-    
-    for column in df.columns:
-        # Skip if already identified as date
-        if field_types.get(column) == 'date':
-            time_fields.append(column)
-            continue
-            
-        sample_values = df[column].dropna().astype(str).str.lower().tolist()
-        sample_values = sample_values[:100] if len(sample_values) > 100 else sample_values
-        
-        # Check for month names
-        if any(month in ' '.join(sample_values) for month in month_names):
-            time_fields.append(column)
-            continue
-            
-        # Check for quarters
-        if any(re.search(quarter_pattern, value) for value in sample_values):
-            time_fields.append(column)
-            continue
-            
-        # Check for years
-        if any(re.search(year_pattern, value) for value in sample_values):
-            time_fields.append(column)
-            continue
-    
-    return time_fields
-
-def analyze_report_structure(df, filename):
-    """Analyze the structure of the report and create a configuration"""
-    # Detect data types
-    field_types = detect_field_types(df)
+def analyze_report_structure(profile, filename):
+    """Create a configuration from the profile of an uploaded report"""
+    field_types = profile['fieldTypes']
     
     # Identify metrics (numeric fields) and dimensions (categorical fields)
     numeric_fields = [col for col, type_info in field_types.items() if type_info == 'numeric']
     categorical_fields = [col for col, type_info in field_types.items() if type_info == 'text']
     date_fields = [col for col, type_info in field_types.items() if type_info == 'date']
     
-    # Detect time-related fields
-    time_fields = detect_time_fields(df, field_types)
+    # Time-related fields
+    time_fields = profile['timeFields']
     
     # Identify potential aggregations
     potential_aggregations = {}
@@ -198,168 +138,74 @@ def analyze_report_structure(df, filename):
         'name': config_name,
         'sourceFileName': filename,
         'fileType': file_type,
-        'fields': list(df.columns),
+        'fields': profile['fields'],
         'fieldTypes': field_types,
         'numericFields': numeric_fields,
         'categoricalFields': categorical_fields,
         'dateFields': date_fields,
         'timeFields': time_fields,
         'potentialAggregations': potential_aggregations,
+        'contentHash': profile.get('contentHash'),
         'createdAt': datetime.now().isoformat()
     }
     
     return configuration
 
-def train_field_type_model(config_data_list):
-    """Train a machine learning model to predict field types based on features"""
-    if len(config_data_list) < 3:
-        return None  # Not enough data to train a meaningful model
-    
-    # Extract features and labels
-    field_names = []
-    field_types = []
-    
-    for config in config_data_list:
-        config_dict = json.loads(config) if isinstance(config, str) else config
-        for field, field_type in config_dict.get('fieldTypes', {}).items():
-            field_names.append(field)
-            field_types.append(field_type)
-    
-    # Vectorize field names
-    vectorizer = CountVectorizer(analyzer='char', ngram_range=(2, 5))
-    X = vectorizer.fit_transform(field_names)
-    
-    # Encode labels
-    label_encoder = LabelEncoder()
-    y = label_encoder.fit_transform(field_types)
-    
-    # Train a random forest classifier
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    
-    # Save model and encoders
-    model_id = str(uuid.uuid4())
-    model_path = os.path.join(ML_MODELS_FOLDER, f"field_type_model_{model_id}.joblib")
-    
-    joblib.dump({
-        'model': model,
-        'vectorizer': vectorizer,
-        'label_encoder': label_encoder
-    }, model_path)
-    
-    # Save model metadata to database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO ml_models (id, name, model_type, created_at, model_path) VALUES (?, ?, ?, ?, ?)",
-        (model_id, "Field Type Classifier", "RandomForest", datetime.now().isoformat(), model_path)
-    )
-    conn.commit()
-    conn.close()
-    
-    return model_id
-
-def apply_ml_to_config(df, file_name):
-    """Apply ML model to enhance configuration if available"""
-    # Get the latest field type model
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT model_path FROM ml_models WHERE model_type = 'RandomForest' ORDER BY created_at DESC LIMIT 1"
-    )
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
+def apply_ml_to_configs(uploads):
+    """Apply the field type model to the configurations of several uploaded files at once"""
+    configs = [analyze_report_structure(profile, file_name) for profile, file_name in uploads]
+    
+    # Predict all ambiguous fields across the upload in one batch
+    ambiguous_fields = [
+        (config, field) for config in configs
+        for field in config['fields'] if config['fieldTypes'][field] == 'text'
+    ]
+    predicted_types = field_type_models.predict([field for _, field in ambiguous_fields])
+    if predicted_types is None:
         # No model available, use rule-based approach only
-        return analyze_report_structure(df, file_name)
-    
-    # Load the model
-    model_data = joblib.load(result[0])
-    model = model_data['model']
-    vectorizer = model_data['vectorizer']
-    label_encoder = model_data['label_encoder']
-    
-    # Create basic configuration
-    config = analyze_report_structure(df, file_name)
+        return configs
     
-    # Enhance with ML predictions for ambiguous fields
-    ambiguous_fields = [col for col in df.columns if config['fieldTypes'][col] == 'text']
-    
-    if ambiguous_fields:
-        # Vectorize field names
-        X = vectorizer.transform(ambiguous_fields)
-        
-        # Predict field types
-        predictions = model.predict(X)
-        predicted_types = label_encoder.inverse_transform(predictions)
+    # Update configurations with ML predictions
+    for (config, field), predicted_type in zip(ambiguous_fields, predicted_types):
+        # Only override if ML is confident (can add confidence check here)
+        config['fieldTypes'][field] = predicted_type
         
-        # Update configuration with ML predictions
-        for field, predicted_type in zip(ambiguous_fields, predicted_types):
-            # Only override if ML is confident (can add confidence check here)
-            config['fieldTypes'][field] = predicted_type
-            
-            # Update related field lists
-            if predicted_type == 'numeric' and field not in config['numericFields']:
-                config['numericFields'].append(field)
-                config['categoricalFields'].remove(field)
-            elif predicted_type == 'date' and field not in config['dateFields']:
-                config['dateFields'].append(field)
-                config['categoricalFields'].remove(field)
-    
-    return config
+        # Update related field lists
+        if predicted_type == 'numeric' and field not in config['numericFields']:
+            config['numericFields'].append(field)
+            config['categoricalFields'].remove(field)
+        elif predicted_type == 'date' and field not in config['dateFields']:
+            config['dateFields'].append(field)
+            config['categoricalFields'].remove(field)
+    
+    return configs
+
+def apply_ml_to_config(profile, file_name):
+    """Apply ML model to enhance configuration if available"""
+    return apply_ml_to_configs([(profile, file_name)])[0]
 
-def generate_report(df, config):
-    """Generate a report based on the configuration and new data"""
+def generate_report(file_path, config, quantiles=()):
+    """Generate a report based on the configuration and new data, reading the file in chunks"""
     config_dict = json.loads(config) if isinstance(config, str) else config
     
-    # Extract required fields
-    field_types = config_dict.get('fieldTypes', {})
-    numeric_fields = config_dict.get('numericFields', [])
-    
-    # Basic validation - check if required fields exist
-    missing_fields = [field for field in config_dict.get('fields', []) if field not in df.columns]
-    if missing_fields:
-        return {"error": f"Missing fields in new data: {', '.join(missing_fields)}"}
-    
-    # Convert data types based on configuration
-    for field, field_type in field_types.items():
-        if field not in df.columns:
-            continue
-            
-        if field_type == 'numeric':
-            df[field] = pd.to_numeric(df[field], errors='coerce')
-        elif field_type == 'date':
-            try:
-                df[field] = pd.to_datetime(df[field], errors='coerce')
-            except:
-                pass  # Keep as is if conversion fails
-    
-    # Calculate aggregations for numeric fields
-    aggregations = {}
-    for field in numeric_fields:
-        if field in df.columns:
-            values = df[field].dropna()
-            if not values.empty:
-                aggregations[field] = {
-                    'sum': float(values.sum()),
-                    'avg': float(values.mean()),
-                    'min': float(values.min()),
-                    'max': float(values.max()),
-                    'count': int(values.count())
-                }
-    
-    # Create report
     report_id = str(uuid.uuid4())
+    record_count, aggregations, first_page = build_report_data(file_path, report_id, config_dict, quantiles)
+    
+    # Create report, rows are served page by page from the stored data
     report = {
         'id': report_id,
         'configId': config_dict.get('id'),
         'configName': config_dict.get('name'),
         'generatedAt': datetime.now().isoformat(),
-        'recordCount': len(df),
+        'recordCount': record_count,
         'aggregations': aggregations,
-        'data': df.to_dict(orient='records'),
-        'summary': f"Report generated using configuration '{config_dict.get('name')}' with {len(df)} records."
+        'data': first_page,
+        'dataPage': {
+            'url': f"/api/reports/{report_id}/data",
+            'pageSize': PAGE_SIZE,
+            'totalRecords': record_count
+        },
+        'summary': f"Report generated using configuration '{config_dict.get('name')}' with {record_count} records."
     }
     
     return report
@@ -367,50 +213,48 @@ def generate_report(df, config):
 # API Routes
 @app.route('/api/upload-report-file', methods=['POST'])
 def upload_report_file():
-    """Upload report files for learning"""
+    """Upload one or more report files for learning"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     
-    file = request.files['file']
-    if file.filename == '':
+    files = request.files.getlist('file')
+    if any(file.filename == '' for file in files):
         return jsonify({'error': 'No selected file'}), 400
     
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+    if not all(allowed_file(file.filename) for file in files):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    try:
+        # Profile files (cached by content hash)
+        uploads = []
+        for file in files:
+            filename = secure_filename(file.filename)
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            file.save(file_path)
+            uploads.append((profile_file(file_path, parse_file), filename))
         
-        try:
-            # Parse file and analyze structure
-            df = parse_file(file_path)
-            config = apply_ml_to_config(df, filename)
-            
-            # Save configuration to database
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO configurations (id, name, source_file_name, file_type, created_at, config_data) VALUES (?, ?, ?, ?, ?, ?)",
-                (config['id'], config['name'], filename, config['fileType'], config['createdAt'], json.dumps(config))
-            )
-            conn.commit()
-            conn.close()
-            
-            # Retrain ML model with new configuration data
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT config_data FROM configurations")
-            all_configs = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            
-            if len(all_configs) >= 3:
-                train_field_type_model(all_configs)
-            
-            return jsonify(config), 201
-            
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
-    
-    return jsonify({'error': 'File type not allowed'}), 400
+        # Analyze structure, with one batched model prediction for all files
+        configs = apply_ml_to_configs(uploads)
+        
+        # Save configurations to database
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO configurations (id, name, source_file_name, file_type, created_at, config_data) VALUES (?, ?, ?, ?, ?, ?)",
+            [(config['id'], config['name'], config['sourceFileName'], config['fileType'], config['createdAt'], json.dumps(config))
+             for config in configs]
+        )
+        conn.commit()
+        conn.close()
+        
+        # Learn from the new configurations without blocking the response
+        field_type_models.add_examples(configs)
+        field_type_models.schedule_training()
+        
+        return jsonify(configs[0] if len(configs) == 1 else configs), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/configurations', methods=['GET'])
 def get_configurations():
@@ -484,11 +328,16 @@ def create_report():
             
             config = json.loads(row['config_data'])
             
-            # Parse file
-            df = parse_file(file_path)
+            # Optional approximate quantiles, e.g. "0.5,0.9,0.99"
+            try:
+                quantiles = [float(q) for q in request.form.get('quantiles', '').split(',') if q.strip()]
+            except ValueError:
+                return jsonify({'error': 'Quantiles must be comma-separated numbers'}), 400
+            if any(not 0 <= q <= 1 for q in quantiles):
+                return jsonify({'error': 'Quantiles must be between 0 and 1'}), 400
             
             # Generate report
-            report = generate_report(df, config)
+            report = generate_report(file_path, config, quantiles)
             
             # Save report to database
             conn = sqlite3.connect(DB_PATH)
@@ -503,6 +352,8 @@ def create_report():
             
             return jsonify(report), 201
             
+        except MissingFieldsError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -548,6 +399,26 @@ def get_report(report_id):
     
     return jsonify(json.loads(row['report_data']))
 
+@app.route('/api/reports/<report_id>/data', methods=['GET'])
+def get_report_data(report_id):
+    """Get one page of a report's data records"""
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('pageSize', PAGE_SIZE, type=int)
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'page must be >= 1 and pageSize between 1 and {MAX_PAGE_SIZE}'}), 400
+    
+    result = read_report_page(report_id, page, page_size)
+    if result is None:
+        return jsonify({'error': 'Report data not found'}), 404
+    
+    total, records = result
+    return jsonify({
+        'page': page,
+        'pageSize': page_size,
+        'totalRecords': total,
+        'records': records
+    })
+
 # Serve React frontend in production
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
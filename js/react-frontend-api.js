@@ -73,11 +73,21 @@ export const getReport = async (reportId) => {
   }
 };
 
+export const getReportData = async (reportId, page = 1, pageSize = 100) => {
+  try {
+    const response = await api.get(`/reports/${reportId}/data`, { params: { page, pageSize } });
+    return response.data;
+  } catch (error) {
+    throw error.response ? error.response.data : new Error('Error fetching report data');
+  }
+};
+
 export default {
   uploadReportFile,
   getConfigurations,
   getConfiguration,
   generateReport,
   getReports,
-  getReport
+  getReport,
+  getReportData
 };
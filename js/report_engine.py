@@ -0,0 +1,238 @@
+import os
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Configuration
+REPORT_DATA_FOLDER = 'report_data'
+CHUNK_ROWS = 50000
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+QUANTILE_SAMPLE_SIZE = 10000    # values kept per field for approximate quantiles
+
+os.makedirs(REPORT_DATA_FOLDER, exist_ok=True)
+
+
+class MissingFieldsError(ValueError):
+    """The new data lacks fields of the configuration"""
+
+
+def iter_file_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    """Read a CSV or Excel file as a sequence of DataFrames of at most chunk_rows rows"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext == '.csv':
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+    elif file_ext == '.xlsx':
+        yield from _iter_xlsx_chunks(file_path, chunk_rows)
+    elif file_ext == '.xls':
+        # xlrd has no streaming mode, split the parsed sheet instead
+        df = pd.read_excel(file_path)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        raise ValueError(f"Unsupported file format: {file_ext}")
+
+
+def _iter_xlsx_chunks(file_path, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Same column names pandas.read_excel would produce
+        columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        while True:
+            batch = list(islice(rows, chunk_rows))
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+class RunningStats:
+    """
+    Count, sum, min, max and mean of a numeric field, updated chunk by chunk.
+    Approximate quantiles come from a uniform bottom-k sample: every value gets a
+    random key and the QUANTILE_SAMPLE_SIZE values with the smallest keys are kept.
+    """
+
+    def __init__(self, track_quantiles=False, seed=0):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.track_quantiles = track_quantiles
+        self.rng = np.random.default_rng(seed)
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+
+    def update(self, values):
+        values = values.dropna().to_numpy(dtype=float)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        chunk_min, chunk_max = float(values.min()), float(values.max())
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+        if self.track_quantiles:
+            sample = np.concatenate([self.sample, values])
+            keys = np.concatenate([self.sample_keys, self.rng.random(len(values))])
+            if len(sample) > QUANTILE_SAMPLE_SIZE:
+                keep = np.argpartition(keys, QUANTILE_SAMPLE_SIZE)[:QUANTILE_SAMPLE_SIZE]
+                sample, keys = sample[keep], keys[keep]
+            self.sample, self.sample_keys = sample, keys
+
+    def result(self, quantiles=()):
+        if not self.count:
+            return None
+        result = {
+            'sum': self.sum,
+            'avg': self.sum / self.count,
+            'min': self.min,
+            'max': self.max,
+            'count': self.count
+        }
+        if quantiles and len(self.sample):
+            result['quantiles'] = {
+                f"p{q * 100:g}": float(value)
+                for q, value in zip(quantiles, np.quantile(self.sample, quantiles))
+            }
+        return result
+
+
+def report_data_path(report_id):
+    return os.path.join(REPORT_DATA_FOLDER, f"{report_id}.parquet")
+
+
+def _report_schema(columns, field_types):
+    """Parquet schema from the configured field types, anything else is stored as text"""
+    types = {'numeric': pa.float64(), 'date': pa.timestamp('ns')}
+    return pa.schema([(str(column), types.get(field_types.get(column), pa.string())) for column in columns])
+
+
+def _convert_chunk(chunk, schema):
+    """Convert a raw chunk to the report schema"""
+    converted = {}
+    for column, field in zip(chunk.columns, schema):
+        values = chunk[column]
+        if field.type == pa.float64():
+            values = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif field.type == pa.timestamp('ns'):
+            values = pd.to_datetime(values, errors='coerce')
+        else:
+            values = values.astype(object).where(values.notna(), None).map(
+                lambda value: value if value is None else str(value)
+            )
+        converted[field.name] = values.reset_index(drop=True)
+    return pd.DataFrame(converted)
+
+
+def build_report_data(file_path, report_id, config, quantiles=()):
+    """
+    Stream file in chunks, keeping running aggregates of the numeric fields and
+    writing the converted rows to the report's Parquet file.
+    :return: (record count, aggregations, first page of rows)
+    :raises MissingFieldsError: if fields of the configuration are not in the file
+    """
+    field_types = config.get('fieldTypes', {})
+    numeric_fields = config.get('numericFields', [])
+
+    stats = {}
+    schema = None
+    writer = None
+    record_count = 0
+    preview = None
+    path = report_data_path(report_id)
+    temp_path = f"{path}.tmp"
+
+    try:
+        for chunk in iter_file_chunks(file_path):
+            if schema is None:
+                # Basic validation - check if required fields exist
+                missing_fields = [field for field in config.get('fields', []) if field not in chunk.columns]
+                if missing_fields:
+                    raise MissingFieldsError(f"Missing fields in new data: {', '.join(map(str, missing_fields))}")
+                schema = _report_schema(chunk.columns, field_types)
+                stats = {
+                    field: RunningStats(track_quantiles=bool(quantiles))
+                    for field in numeric_fields if field in chunk.columns
+                }
+                writer = pq.ParquetWriter(temp_path, schema)
+
+            data = _convert_chunk(chunk, schema)
+            for field, field_stats in stats.items():
+                field_stats.update(data[str(field)])
+
+            writer.write_table(pa.Table.from_pandas(data, schema=schema, preserve_index=False))
+            if preview is None:
+                preview = data.head(PAGE_SIZE)
+            record_count += len(data)
+
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(temp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    aggregations = {}
+    for field, field_stats in stats.items():
+        result = field_stats.result(quantiles)
+        if result is not None:
+            aggregations[field] = result
+
+    return record_count, aggregations, _to_records(preview) if preview is not None else []
+
+
+def _to_records(df):
+    """JSON-ready rows: dates as ISO strings and missing values as None"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].map(lambda value: value.isoformat() if pd.notna(value) else None)
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def read_report_page(report_id, page=1, page_size=PAGE_SIZE):
+    """
+    Read one page of a report's rows, only touching the row groups that overlap it.
+    :return: (total record count, rows) or None if the report has no stored data
+    """
+    path = report_data_path(report_id)
+    if not os.path.exists(path):
+        return None
+
+    parquet_file = pq.ParquetFile(path)
+    total = parquet_file.metadata.num_rows
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+
+    tables = []
+    group_start = 0
+    for group in range(parquet_file.num_row_groups):
+        group_rows = parquet_file.metadata.row_group(group).num_rows
+        group_end = group_start + group_rows
+        if group_end > start and group_start < end:
+            table = parquet_file.read_row_group(group)
+            tables.append(table.slice(max(start - group_start, 0), min(end, group_end) - max(start, group_start)))
+        group_start = group_end
+        if group_start >= end:
+            break
+
+    if not tables:
+        return total, []
+    return total, _to_records(pa.concat_tables(tables).to_pandas())
+
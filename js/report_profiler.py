@@ -0,0 +1,142 @@
+import copy
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+SAMPLE_ROWS = 10000         # rows inspected by the pattern checks, spread evenly over the file
+TIME_SAMPLE_VALUES = 100    # non-null values per column checked for time periods
+MAX_CACHED_PROFILES = 128
+HASH_BLOCK_SIZE = 1024 * 1024
+
+MONTH_ABBREVIATIONS = r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)'
+MONTH_NAMES = (
+    r'(?:January|February|March|April|May|June|July|August|September|October|November|December'
+    r'|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Oct|Nov|Dec)'
+)
+
+# A value looks like a date if it starts with one of the date formats or mentions a month anywhere
+DATE_REGEX = re.compile(
+    r'^(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'                          # 01/23/2020, 1-23-20
+    r'|\d{4}[/-]\d{1,2}[/-]\d{1,2}'                               # 2020/01/23, 2020-1-23
+    rf'|\b{MONTH_ABBREVIATIONS}[a-z]* \d{{1,2}},? \d{{4}}\b'      # January 23, 2020
+    rf'|\b\d{{1,2}} {MONTH_ABBREVIATIONS}[a-z]* \d{{4}}\b)'       # 23 January 2020
+    rf'|(?i:\b{MONTH_NAMES}\b)'
+)
+
+# Month names (as substrings), quarters and years
+TIME_REGEX = re.compile(
+    r'jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec'
+    r'|\bq[1-4]\b|\bquarter [1-4]\b'
+    r'|\b20\d{2}\b|\b19\d{2}\b',
+    re.IGNORECASE
+)
+
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+
+def file_digest(file_path):
+    """SHA-256 of the file content, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sample_rows(df, size=SAMPLE_ROWS):
+    """Deterministic sample of evenly spaced rows, so every part of the file is represented"""
+    if len(df) <= size:
+        return df
+    positions = np.linspace(0, len(df) - 1, size).astype(np.int64)
+    return df.iloc[positions]
+
+
+def _stack_columns(sample, columns):
+    """
+    Flatten the non-null values of columns into one string Series, column after column,
+    together with the position in columns that each value came from.
+    """
+    values = sample[columns].to_numpy(dtype=object).ravel(order='F')
+    owners = np.repeat(np.arange(len(columns)), len(sample))
+    present = pd.notna(values)
+    return pd.Series(values[present], dtype=object).astype(str), owners[present]
+
+
+def _matching_columns(columns, owners, matches):
+    """Columns with at least one matching value"""
+    hits = np.bincount(owners[matches.to_numpy(dtype=bool)], minlength=len(columns)) > 0
+    return {column for column, hit in zip(columns, hits) if hit}
+
+
+def profile_dataframe(df):
+    """
+    Infer field types and time fields for all columns at once.
+    Numeric and datetime columns are decided by dtype, the remaining columns are
+    checked with one regex pass over the stacked values of a row sample.
+    """
+    field_types = {}
+    text_columns = []
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            field_types[column] = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            field_types[column] = 'date'
+        else:
+            field_types[column] = 'text'
+            text_columns.append(column)
+
+    sample = sample_rows(df)
+
+    # Date detection for text columns
+    if text_columns:
+        values, owners = _stack_columns(sample, text_columns)
+        for column in _matching_columns(text_columns, owners, values.str.contains(DATE_REGEX)):
+            field_types[column] = 'date'
+
+    # Time period detection, dates always count as time fields
+    time_fields = {column for column, field_type in field_types.items() if field_type == 'date'}
+    other_columns = [column for column in df.columns if column not in time_fields]
+    if other_columns:
+        values, owners = _stack_columns(sample, other_columns)
+        # Only the first TIME_SAMPLE_VALUES values of each column; owners is sorted
+        positions = np.arange(len(owners)) - np.searchsorted(owners, owners)
+        head = positions < TIME_SAMPLE_VALUES
+        values, owners = values[head], owners[head]
+        time_fields |= _matching_columns(other_columns, owners, values.str.contains(TIME_REGEX))
+
+    return {
+        'fields': list(df.columns),
+        'fieldTypes': field_types,
+        'timeFields': [column for column in df.columns if column in time_fields],
+        'rowCount': len(df),
+    }
+
+
+def profile_file(file_path, parse):
+    """
+    Profile a file, reusing the cached profile of identical content.
+    parse(file_path) is only called on a cache miss.
+    """
+    content_hash = file_digest(file_path)
+
+    with _profile_cache_lock:
+        profile = _profile_cache.get(content_hash)
+        if profile is not None:
+            _profile_cache.move_to_end(content_hash)
+            return copy.deepcopy(profile)
+
+    profile = profile_dataframe(parse(file_path))
+    profile['contentHash'] = content_hash
+
+    with _profile_cache_lock:
+        _profile_cache[content_hash] = profile
+        while len(_profile_cache) > MAX_CACHED_PROFILES:
+            _profile_cache.popitem(last=False)
+
+    return copy.deepcopy(profile)
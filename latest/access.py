@@ -187,7 +187,9 @@ class VerificationWorker(QObject):
         """
         try:
             # Replace with your actual API endpoint
-            response = numpy.get_phonebook_data(user_id)
+            # The lookup is blocking, run it on the default executor so gather() overlaps the calls
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, numpy.get_phonebook_data, user_id)
             return user_id, response['standardID'] == user_id
         except:
             return user_id, False
@@ -218,6 +220,202 @@ def is_valid(text):
     return bool(text.strip())
 
 
+class AccessIndex:
+    """
+    In-memory bipartite index between solutions and the SIDs that can access them.
+
+    Both directions are kept as dicts of insertion-ordered dicts, so membership
+    checks, adds and removes are O(1) and "users of an app" / "apps of a SID" are
+    direct lookups. Edits only mark the solution dirty; pending_rows() coalesces
+    every edit on a solution into a single row for one UpdateListItems call.
+    """
+    SID_COLUMN = 'SIDs_For_SolutionAccess'
+    SEPARATOR = ';'
+
+    def __init__(self, df=None):
+        self.app_users = {}
+        self.user_apps = {}
+        self.app_rows = {}
+        self.dirty = set()
+        if df is not None:
+            self.build(df)
+
+    @staticmethod
+    def parse_sids(value):
+        """Parse a stored SID string, accepting both ';' and ',' separators"""
+        if not isinstance(value, str):
+            return []
+        return [sid.strip() for sid in re.split('[;,]', value) if sid.strip()]
+
+    def build(self, df):
+        """(Re)build the index from the solution DataFrame in one pass"""
+        self.app_users.clear()
+        self.user_apps.clear()
+        self.app_rows.clear()
+        self.dirty.clear()
+        if df is None or df.empty:
+            return
+        for idx, app_name, sids in zip(df.index, df['Solution_Name'], df[self.SID_COLUMN]):
+            self.app_rows[app_name] = idx
+            users = self.app_users.setdefault(app_name, {})
+            for sid in self.parse_sids(sids):
+                users[sid] = None
+                self.user_apps.setdefault(sid, {})[app_name] = None
+
+    def row_index(self, app_name):
+        return self.app_rows[app_name]
+
+    def users_for_app(self, app_name):
+        return list(self.app_users.get(app_name, {}))
+
+    def apps_for_user(self, sid):
+        return list(self.user_apps.get(sid.strip(), {}))
+
+    def has_access(self, app_name, sid):
+        return sid in self.app_users.get(app_name, {})
+
+    def add_users(self, app_name, sids):
+        """Grant access to sids, returns the SIDs that were actually added"""
+        users = self.app_users.setdefault(app_name, {})
+        added = []
+        for sid in sids:
+            sid = sid.strip()
+            if not sid or sid in users:
+                continue
+            users[sid] = None
+            self.user_apps.setdefault(sid, {})[app_name] = None
+            added.append(sid)
+        if added:
+            self.dirty.add(app_name)
+        return added
+
+    def remove_users(self, app_name, sids):
+        """Revoke access from sids, returns the SIDs that were actually removed"""
+        users = self.app_users.get(app_name, {})
+        removed = []
+        for sid in sids:
+            sid = sid.strip()
+            if sid not in users:
+                continue
+            del users[sid]
+            apps = self.user_apps.get(sid)
+            if apps is not None:
+                apps.pop(app_name, None)
+                if not apps:
+                    del self.user_apps[sid]
+            removed.append(sid)
+        if removed:
+            self.dirty.add(app_name)
+        return removed
+
+    def serialize(self, app_name):
+        return self.SEPARATOR.join(self.app_users.get(app_name, {}))
+
+    def sync_dataframe(self, df, app_names=None):
+        """Write the indexed SID strings back into the DataFrame for the given (or dirty) apps"""
+        for app_name in (self.dirty if app_names is None else app_names):
+            df.at[self.app_rows[app_name], self.SID_COLUMN] = self.serialize(app_name)
+
+    def build_row(self, df, app_name, sids):
+        """
+        Build the update row for one solution. Only the SharePoint ID and the
+        access column are sent when the list ID is known, otherwise the full row.
+        """
+        idx = self.app_rows[app_name]
+        value = self.SEPARATOR.join(sids)
+        if 'ID' in df.columns:
+            return {'ID': df.at[idx, 'ID'], self.SID_COLUMN: value}
+        row = df.loc[idx].to_dict()
+        row[self.SID_COLUMN] = value
+        return row
+
+    def pending_rows(self, df):
+        """Build one update row per dirty solution"""
+        return [self.build_row(df, app_name, self.app_users.get(app_name, {})) for app_name in self.dirty]
+
+    def mark_clean(self):
+        self.dirty.clear()
+
+    def snapshot(self, app_names):
+        """Copy the current SID lists of the given solutions so they can be restored later"""
+        return {app_name: list(self.app_users.get(app_name, {})) for app_name in app_names}
+
+    def restore(self, snapshot):
+        """Put the solutions in snapshot back to their recorded SID lists"""
+        for app_name, sids in snapshot.items():
+            self.remove_users(app_name, self.users_for_app(app_name))
+            self.add_users(app_name, sids)
+        self.dirty.difference_update(snapshot)
+
+    def plan_changes(self, matrix):
+        """
+        Reduce a (sid, app_name, action) matrix to the minimal per-solution change set.
+
+        Entries that would not change anything (adding an existing user, removing an
+        absent one, unknown solutions) are dropped; when the same pair is both added
+        and removed the last entry wins.
+        :param matrix: iterable of (sid, app_name, 'add' | 'remove')
+        :return: {app_name: {'add': [sids], 'remove': [sids]}}
+        """
+        wanted = {}
+        for sid, app_name, action in matrix:
+            sid = sid.strip()
+            if not sid or app_name not in self.app_rows:
+                continue
+            if action not in ('add', 'remove'):
+                raise ValueError(f"Unsupported access action '{action}'")
+            wanted[(app_name, sid)] = action
+
+        plan = {}
+        for (app_name, sid), action in wanted.items():
+            if (action == 'add') == self.has_access(app_name, sid):
+                continue
+            plan.setdefault(app_name, {'add': [], 'remove': []})[action].append(sid)
+        return plan
+
+
+class BulkProvisioningWorker(QObject):
+    """
+    Commits a prepared list of solution rows to SharePoint in batches.
+
+    If any batch fails, the batches that already went through and the failing
+    one, which SharePoint may have partly applied, are written back with their
+    original rows so SharePoint ends up where it started. Rows are whole
+    solution rows, so writing back one that was not applied changes nothing.
+    """
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, commit, rows, rollback_rows, batch_size=20):
+        super().__init__()
+        self.commit = commit
+        self.rows = rows
+        self.rollback_rows = rollback_rows
+        self.batch_size = batch_size
+
+    def run(self):
+        committed = 0
+        attempted = 0
+        try:
+            for start in range(0, len(self.rows), self.batch_size):
+                batch = self.rows[start:start + self.batch_size]
+                attempted = start + len(batch)
+                self.commit(batch)
+                committed = attempted
+                self.progress.emit(committed)
+        except Exception as e:
+            try:
+                self.commit(self.rollback_rows[:attempted])
+                self.failed.emit(f"Batch update failed, {attempted} change(s) were rolled back ({committed} "
+                                 f"committed, {attempted - committed} in the failed batch): {e}")
+            except Exception as rollback_error:
+                self.failed.emit(f"Batch update failed and rollback of {attempted} change(s) "
+                                 f"also failed: {rollback_error}")
+            return
+        self.finished.emit(committed)
+
+
 class AccessControlDialog(QDialog):
     def __init__(self, username, lob, parent=None):
         super().__init__(parent)
@@ -226,6 +424,7 @@ class AccessControlDialog(QDialog):
         self.existing_users_list = None
         self.progress_dialog = None
         self.workers = []  # Keep track of running threads
+        self.access_index = AccessIndex()
         self.setWindowTitle("Access Management")
         self.setMinimumSize(900, 600)
         self.refresh_data()
@@ -275,6 +474,7 @@ class AccessControlDialog(QDialog):
             self.df = df_all[df_all['LOB'].isin(self.lob)]
             self.df['Description'] = self.df['Description'].str.slice(0, 50)
             self.df.reset_index(inplace=True, drop=True)
+            self.access_index.build(self.df)
             return True
         except:
             QMessageBox.warning(self, "Refresh Failed",
@@ -761,6 +961,9 @@ class AccessControlDialog(QDialog):
 
     def update_app_list(self):
         self.app_list.clear()
+        self.bulk_apps_list.clear()
+        if hasattr(self, 'df') and not self.df.empty:
+            self.bulk_apps_list.addItems(self.df['Solution_Name'].tolist())
         if hasattr(self, 'df') and not self.df.empty:
             for _, row in self.df.iterrows():
                 item = QListWidgetItem(self.app_list)
@@ -908,6 +1111,123 @@ class AccessControlDialog(QDialog):
         sp_list = site.list(SHAREPOINT_LIST)
         sp_list.UpdateListItems(data=dictionary_as_list, kind=operation)
 
+    def flush_access_changes(self):
+        """
+        Push all pending access edits to SharePoint, one row per changed solution in a single call
+        :return:
+        """
+        rows = self.access_index.pending_rows(self.df)
+        if rows:
+            self.update_sharepoint_db(dictionary_as_list=rows, operation='Update')
+        self.access_index.sync_dataframe(self.df)
+        self.access_index.mark_clean()
+
+    def commit_access_rows(self, rows):
+        self.update_sharepoint_db(dictionary_as_list=rows, operation='Update')
+
+    def bulk_provision(self, matrix):
+        """
+        Apply a (sid, app_name, action) matrix across many solutions at once.
+        SIDs being added are verified together in a single worker run first.
+        :param matrix: iterable of (sid, app_name, 'add' | 'remove')
+        :return:
+        """
+        matrix = [(sid.strip(), app_name, action) for sid, app_name, action in matrix if sid.strip()]
+        if not matrix:
+            return
+
+        sids_to_verify = {sid for sid, _, action in matrix if action == 'add'}
+        if not sids_to_verify:
+            self.handle_bulk_verification_complete(matrix, {})
+            return
+
+        self.progress = QProgressDialog("Verifying user IDs...", None, 0, 0, self)
+        self.progress.setWindowTitle("Please Wait")
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress.show()
+
+        self.thread = QThread()
+        self.worker = VerificationWorker(sids_to_verify)
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(lambda results: self.handle_bulk_verification_complete(matrix, results))
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.start()
+
+    def handle_bulk_verification_complete(self, matrix, verification_results):
+        """
+        Drop unverified additions, apply the minimal change set to the index and
+        commit it with a single progress dialog
+        """
+        if getattr(self, 'progress', None):
+            self.progress.close()
+
+        invalid_ids = sorted(uid for uid, is_valid in verification_results.items() if not is_valid)
+        matrix = [(sid, app_name, action) for sid, app_name, action in matrix
+                  if action == 'remove' or verification_results.get(sid)]
+
+        plan = self.access_index.plan_changes(matrix)
+        if not plan:
+            self.show_bulk_result(0, invalid_ids)
+            return
+
+        self.bulk_snapshot = self.access_index.snapshot(plan)
+        rollback_rows = [self.access_index.build_row(self.df, app_name, sids)
+                         for app_name, sids in self.bulk_snapshot.items()]
+        for app_name, changes in plan.items():
+            self.access_index.add_users(app_name, changes['add'])
+            self.access_index.remove_users(app_name, changes['remove'])
+        rows = [self.access_index.build_row(self.df, app_name, self.access_index.users_for_app(app_name))
+                for app_name in self.bulk_snapshot]
+        self.bulk_invalid_ids = invalid_ids
+
+        self.progress = QProgressDialog("Updating application access...", None, 0, len(rows), self)
+        self.progress.setWindowTitle("Please Wait")
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress.setMinimumDuration(0)
+        self.progress.show()
+
+        self.bulk_thread = QThread()
+        self.bulk_worker = BulkProvisioningWorker(self.commit_access_rows, rows, rollback_rows)
+        self.bulk_worker.moveToThread(self.bulk_thread)
+
+        self.bulk_thread.started.connect(self.bulk_worker.run)
+        self.bulk_worker.progress.connect(self.progress.setValue)
+        self.bulk_worker.finished.connect(self.handle_bulk_commit_complete)
+        self.bulk_worker.failed.connect(self.handle_bulk_commit_failed)
+        for signal in (self.bulk_worker.finished, self.bulk_worker.failed):
+            signal.connect(self.bulk_thread.quit)
+            signal.connect(self.bulk_worker.deleteLater)
+        self.bulk_thread.finished.connect(self.bulk_thread.deleteLater)
+        self.bulk_thread.start()
+
+    def handle_bulk_commit_complete(self, updated_apps):
+        self.progress.close()
+        self.access_index.sync_dataframe(self.df)
+        self.access_index.mark_clean()
+        self.show_application_users(self.app_list.currentItem())
+        self.show_bulk_result(updated_apps, self.bulk_invalid_ids)
+
+    def handle_bulk_commit_failed(self, message):
+        self.progress.close()
+        self.access_index.restore(self.bulk_snapshot)
+        self.show_application_users(self.app_list.currentItem())
+        QMessageBox.warning(self, "Failure", message, QMessageBox.StandardButton.Ok)
+
+    def show_bulk_result(self, updated_apps, invalid_ids):
+        if updated_apps:
+            self.show_success_message(f"Access updated for {updated_apps} application(s)")
+        if invalid_ids:
+            QMessageBox.warning(
+                self,
+                "Invalid IDs Found",
+                "The following IDs could not be verified and were not added:\n\n" + '\n'.join(invalid_ids),
+                QMessageBox.StandardButton.Ok
+            )
+
     def toggle_update_mode(self):
         """
         Method created to handle toggle between Add or Update mode
@@ -1052,27 +1372,71 @@ class AccessControlDialog(QDialog):
         add_btn.clicked.connect(self.add_multiple_users)
         add_layout.addWidget(add_btn)
 
+        # Bulk Access Tab
+        bulk_tab = QWidget()
+        bulk_layout = QVBoxLayout(bulk_tab)
+
+        bulk_label = QLabel("Enter user SIDs and select the applications:")
+        bulk_label.setProperty("subheading", True)
+        bulk_layout.addWidget(bulk_label)
+
+        self.bulk_users_text = QTextEdit()
+        self.bulk_users_text.setPlaceholderText("Paste multiple IDs or enter one per line")
+        bulk_layout.addWidget(self.bulk_users_text)
+
+        self.bulk_apps_list = QListWidget()
+        self.bulk_apps_list.setSelectionMode(QListWidget.SelectionMode.MultiSelection)
+        bulk_layout.addWidget(self.bulk_apps_list)
+
+        bulk_buttons = QHBoxLayout()
+        bulk_remove_btn = QPushButton("Remove From Selected")
+        bulk_remove_btn.setObjectName("secondaryButton")
+        bulk_remove_btn.clicked.connect(lambda: self.submit_bulk_access('remove'))
+        bulk_add_btn = QPushButton("Add To Selected")
+        bulk_add_btn.setObjectName("actionButton")
+        bulk_add_btn.clicked.connect(lambda: self.submit_bulk_access('add'))
+        bulk_buttons.addStretch()
+        bulk_buttons.addWidget(bulk_remove_btn)
+        bulk_buttons.addWidget(bulk_add_btn)
+        bulk_layout.addLayout(bulk_buttons)
+
         # Add tabs to widget
         tab_widget.addTab(existing_users_tab, "Existing Users")
         tab_widget.addTab(add_users_tab, "Add Users")
+        tab_widget.addTab(bulk_tab, "Bulk Access")
         users_layout.addWidget(tab_widget)
 
-        def show_application_users(self, current_item):
-            if not current_item:
-                return
+    def show_application_users(self, current_item):
+        if not current_item:
+            return
 
-            self.existing_users_list.clear()
-            app_name = current_item.data(Qt.ItemDataRole.UserRole)
-            app_data = self.df[self.df['Solution_Name'] == app_name].iloc[0]
-            users = split_user(app_data['SIDs_For_SolutionAccess'])
+        self.existing_users_list.clear()
+        app_name = current_item.data(Qt.ItemDataRole.UserRole)
+        self.existing_users_list.addItems(self.access_index.users_for_app(app_name))
 
-            for user in users:
-                if user.strip():
-                    self.existing_users_list.addItem(user.strip())
+        # Ensure the item stays selected
+        self.app_list.setCurrentItem(current_item)
+        self.current_app_item = current_item
 
-            # Ensure the item stays selected
-            self.app_list.setCurrentItem(current_item)
-            self.current_app_item = current_item
+    def submit_bulk_access(self, action):
+        """
+        Build the SIDs x applications matrix from the bulk tab and provision it
+        :param action: 'add' or 'remove'
+        :return:
+        """
+        app_names = [item.text() for item in self.bulk_apps_list.selectedItems()]
+        sids = set()
+        for line in self.bulk_users_text.toPlainText().split('\n'):
+            sids.update(uid.strip() for uid in line.split(',') if uid.strip())
+
+        if not app_names or not sids:
+            QMessageBox.warning(self, "Nothing Selected",
+                                "Please enter at least one SID and select at least one application.",
+                                QMessageBox.StandardButton.Ok)
+            return
+
+        self.bulk_users_text.clear()
+        self.bulk_provision((sid, app_name, action) for sid in sids for app_name in app_names)
 
     def remove_selected_users(self):
         """
@@ -1108,21 +1472,18 @@ class AccessControlDialog(QDialog):
             self.progress.setWindowTitle("Please Wait")
             self.progress.setWindowModality(Qt.WindowModality.WindowModal)
             self.progress.show()
-            app_idx = self.df[self.df['Solution_Name'] == app_name].index[0]
-            current_sids = set(self.df.at[app_idx, 'SIDs_For_SolutionAccess'].split(','))
-            updated_sids = current_sids - set(users_to_remove)
+            removed = self.access_index.remove_users(app_name, users_to_remove)
             try:
                 # try removing the user sids
-                self.df.at[app_idx, 'SIDs_For_SolutionAccess'] = ','.join(updated_sids)
+                self.flush_access_changes()
                 self.show_application_users(self.app_list.currentItem())
-                data_dictionary = self.df.iloc[app_idx].to_dict()
-                self.update_sharepoint_db(dictionary_as_list=[data_dictionary], operation='Update')
                 # pslv_action_entry([{'SID': user_main, 'action': f'Removed users {users_to_remove} from {app_name}'}])
                 self.progress.close()
-                self.show_success_message(f"Successfully removed {len(users_to_remove)} user(s)")
+                self.show_success_message(f"Successfully removed {len(removed)} user(s)")
             except:
-                # on failure revert back the changes of DF
-                self.df.at[app_idx, 'SIDs_For_SolutionAccess'] = ','.join(current_sids)
+                # on failure revert back the changes of the index
+                self.access_index.add_users(app_name, removed)
+                self.access_index.mark_clean()
                 self.show_application_users(self.app_list.currentItem())
                 self.progress.close()
                 QMessageBox.warning(self, "Failure",
@@ -1187,22 +1548,21 @@ class AccessControlDialog(QDialog):
             # Add verified IDs to the DataFrame
             self.new_users_text.setPlainText(None)
             app_name = self.app_list.currentItem().data(Qt.ItemDataRole.UserRole)
-            app_idx = self.df[self.df['Solution_Name'] == app_name].index[0]
-            current_sids = set(split_user(self.df.at[app_idx, 'SIDs_For_SolutionAccess']))
-            updated_sids = current_sids.union(valid_ids)
-            self.df.at[app_idx, 'SIDs_For_SolutionAccess'] = ','.join(updated_sids)
+            added = self.access_index.add_users(app_name, valid_ids)
             try:
                 # try adding the user sids
                 # pslv_action_entry([{f'SID': user_main, 'action': f'Added users {valid_ids} to {app_name}'}])
-                data_dictionary = self.df.iloc[app_idx].to_dict()
-                self.update_sharepoint_db(dictionary_as_list=[data_dictionary], operation='Update')
+                self.flush_access_changes()
                 self.show_application_users(self.app_list.currentItem())
-                self.show_success_message(f"Successfully added {len(valid_ids)} verified user(s)")
+                message = f"Successfully added {len(added)} verified user(s)"
+                already_present = len(valid_ids) - len(added)
+                if already_present:
+                    message += f", {already_present} already had access"
+                self.show_success_message(message)
             except:
-                # on failure revert back the changes of DF
-                current_sids = set(split_user(self.df.at[app_idx, 'SIDs_For_SolutionAccess']))
-                reverted_sids = current_sids - valid_ids
-                self.df.at[app_idx, 'SIDs_For_SolutionAccess'] = ','.join(reverted_sids)
+                # on failure revert back the changes of the index
+                self.access_index.remove_users(app_name, added)
+                self.access_index.mark_clean()
                 self.show_application_users(self.app_list.currentItem())
                 self.show_success_message(f"Failed to add users, Please try again later... ")
 